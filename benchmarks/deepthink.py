@@ -0,0 +1,224 @@
+"""
+End-to-end benchmark of ``/speech/deepthink/`` against a local fake Gemini.
+
+Starts ``benchmarks/fake_gemini.py`` in-process, points the C++ thinker and the
+Gemini agent at it (``GEMINI_BASE_URL``) and measures:
+
+- latency: sequential deepthink requests, p50 and p95;
+- throughput: requests per second with ``--concurrency`` clients;
+- node overhead: mean time per thinker node spent outside its Gemini calls
+  (process spawn, pipes, parsing, validation), from the telemetry histograms;
+  not reported with ``KIEVAN_RUS_BATCH=1``, whose calls overlap;
+- memory: peak Python heap during one request and peak RSS of the process.
+  The thinker's own RSS is not reported: a child's ``ru_maxrss`` includes
+  the Python image it was forked from.
+
+The results are compared with ``benchmarks/baselines.json``; a metric worse than
+its baseline by more than ``--tolerance`` fails the run. Baselines only apply to
+the configuration they were recorded with.
+
+    python benchmarks/deepthink.py
+    python benchmarks/deepthink.py --update-baselines
+    python benchmarks/deepthink.py --latency-ms 50 --concurrency 8 --tolerance 0.5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / "baselines.json"
+
+sys.path.insert(0, str(ROOT))
+from benchmarks.fake_gemini import FakeGemini  # noqa: E402
+
+# Settings that change the thinker's behaviour, recorded with the baselines.
+THINKER_ENV = ["KIEVAN_RUS_BATCH", "KIEVAN_RUS_WORKERS", "KIEVAN_RUS_SUMMARY_MODE", "THINKING_MAX_WORKERS"]
+
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+PROMPT = "Plan a three-day trip to Kyiv on a student budget."
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _configure(base_url: str) -> None:
+    """Environment for Django, the thinker and the agent; must run before Django is imported."""
+    os.environ["GEMINI_BASE_URL"] = base_url
+    os.environ["GEMINI_API_KEY"] = "benchmark"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "providentia_network.settings")
+    os.environ.setdefault("SECRET_KEY", "deepthink-benchmark")
+    os.environ.setdefault("ALLOWED_HOSTS", "testserver,localhost")
+    # Every request must reach the thinker, and rendering is measured elsewhere.
+    os.environ["THINKER_CACHE_SIZE"] = "0"
+    os.environ["REASONING_STORE"] = "0"
+    os.environ.pop("THINKER_CACHE_REDIS_URL", None)
+    os.environ.setdefault("GRAPH_RENDER_WORKERS", "0")
+    os.environ.setdefault("TELEMETRY_LOG_LEVEL", "WARNING")
+
+
+class Bench:
+    def __init__(self, max_nodes: int):
+        from django.test import Client
+
+        self.client_class = Client
+        self.payload = {"prompt": PROMPT, "max_nodes": max_nodes}
+
+    def request(self, client=None) -> float:
+        client = client or self.client_class()
+        started = time.perf_counter()
+        response = client.post("/speech/deepthink/", self.payload, content_type="application/json")
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise SystemExit(f"deepthink returned HTTP {response.status_code}: {response.content[:500]!r}")
+        return elapsed
+
+    def latency(self, requests: int) -> dict:
+        client = self.client_class()
+        timings = [self.request(client) * 1000 for _ in range(requests)]
+        return {
+            "latency_p50_ms": statistics.median(timings),
+            "latency_p95_ms": _percentile(timings, 0.95),
+        }
+
+    def throughput(self, requests: int, concurrency: int) -> dict:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda _: self.request(), range(requests)))
+        return {"throughput_rps": requests / (time.perf_counter() - started)}
+
+    def memory(self) -> dict:
+        tracemalloc.start()
+        try:
+            self.request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results = {"python_peak_kb": peak / 1024}
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux (bytes on macOS).
+            scale = 1024 if sys.platform == "darwin" else 1
+            results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale / 1024
+        return results
+
+
+def node_overhead(snapshot: dict) -> dict:
+    count, thinker_total = snapshot.get(("thinker", "ok"), (0, 0.0))
+    if not count:
+        return {}
+    gemini_total = sum(total for (stage, outcome), (_, total) in snapshot.items()
+                       if stage.startswith("gemini_") and outcome == "ok")
+    return {"node_overhead_ms": max(0.0, thinker_total - gemini_total) / count * 1000}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    failures = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if name in HIGHER_IS_BETTER:
+            regressed = actual < expected * (1 - tolerance)
+        else:
+            regressed = actual > expected * (1 + tolerance)
+        if regressed:
+            failures.append(f"{name}: {actual:.1f} vs baseline {expected:.1f} (tolerance {tolerance:.0%})")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="fake Gemini latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake Gemini calls that fail")
+    parser.add_argument("--response-bytes", type=int, default=0, help="pad fake replies to about this size")
+    parser.add_argument("--max-nodes", type=int, default=7, help="node budget of each deepthink request")
+    parser.add_argument("--requests", type=int, default=5, help="sequential requests for the latency run")
+    parser.add_argument("--concurrency", type=int, default=4, help="clients in the throughput run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression against the baseline")
+    parser.add_argument("--update-baselines", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    fake = FakeGemini(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        response_bytes=args.response_bytes,
+    )
+    with fake:
+        _configure(fake.base_url)
+        import django
+
+        django.setup()
+        from providentia_network import telemetry
+
+        bench = Bench(args.max_nodes)
+        # ThinkingManager narrates to stdout; swapped once, since redirecting per request races across threads.
+        with contextlib.redirect_stdout(io.StringIO()):
+            bench.request()  # Warm-up: client construction, lazy imports, first connections.
+            telemetry.metrics.reset()
+
+            results = bench.latency(args.requests)
+            results.update(node_overhead(telemetry.metrics.snapshot()))
+            results.update(bench.throughput(args.requests * 2, args.concurrency))
+            results.update(bench.memory())
+        results = {name: round(value, 2) for name, value in results.items()}
+
+    config = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "response_bytes": args.response_bytes,
+        "max_nodes": args.max_nodes,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        **{name: os.environ.get(name, "") for name in THINKER_ENV},
+    }
+
+    if args.json:
+        print(json.dumps({"config": config, "results": results}, indent=2))
+    else:
+        print(f"deepthink benchmark ({fake.requests} fake Gemini calls, {fake.errors} injected failures)")
+        for name, value in results.items():
+            print(f"  {name:<22} {value:10.1f}")
+
+    if args.update_baselines:
+        BASELINES.write_text(json.dumps({"config": config, "metrics": results}, indent=2, sort_keys=True) + "\n")
+        print(f"Baselines written to {BASELINES.relative_to(ROOT)}.")
+        return 0
+
+    try:
+        stored = json.loads(BASELINES.read_text())
+    except FileNotFoundError:
+        print("No baselines stored; run with --update-baselines to record them.")
+        return 0
+    if stored.get("config") != config:
+        print("Baselines were recorded with a different configuration; not comparing.")
+        return 0
+
+    failures = compare(results, stored.get("metrics", {}), args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
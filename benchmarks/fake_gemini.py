@@ -0,0 +1,204 @@
+"""
+Local stand-in for the Gemini ``generateContent`` API.
+
+Answers ``:generateContent`` and ``:streamGenerateContent`` (SSE) for any
+model with canned text: a ContextStruct-shaped JSON object when the request
+asks for ``application/json``, plain text otherwise. Latency, jitter, error
+rate and response size are configurable, so benchmarks can exercise the
+thinker and the Gemini agent without network access or an API key.
+Point both at it with ``GEMINI_BASE_URL``.
+
+    python benchmarks/fake_gemini.py --port 8089 --latency-ms 200 --error-rate 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class FakeGemini:
+    """Threaded fake Gemini server; use as a context manager or call ``start``/``stop``."""
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        response_bytes: int = 0,
+        chunk_bytes: int = 0,
+        seed: Optional[int] = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.response_bytes = response_bytes
+        self.chunk_bytes = chunk_bytes
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 256
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGemini":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGemini":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _draw(self) -> tuple[float, bool]:
+        """The next response's delay in seconds and whether it fails."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return max(0.0, delay) / 1000, failed
+
+    def reply_text(self, request: dict) -> str:
+        config = request.get("generationConfig") or {}
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents") or ()
+            for part in content.get("parts") or ()
+        )
+        if config.get("responseMimeType") != "application/json":
+            return "I weighed the branches and settled on the plan. " + "." * max(0, self.response_bytes - 48)
+
+        # Scores are derived from the prompt so reruns build the same tree.
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        plan = "Break the request into steps and answer each one."
+        context = {
+            "user_enquiry": prompt[-120:],
+            "user_name": "benchmark",
+            "needs_command": False,
+            "client_platform": "benchmark",
+            "category": "general",
+            "steps_for_completion": plan + " " * max(0, self.response_bytes - len(plan)),
+            "possible_setbacks": "The fake server knows nothing.",
+            "probability_of_success": round(digest[0] / 255, 3),
+            "potential_score": round((digest[1] - 128) / 128, 3),
+            "is_done_thinking": False,
+            "regrets_choice": digest[2] < 32,
+            "thought_summary": "I split the problem and kept the most promising branch.",
+        }
+        return json.dumps(context)
+
+
+def _response_body(text: str, prompt_tokens: int) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": prompt_tokens + len(text) // 4,
+        },
+    }
+
+
+def _handler_for(fake: FakeGemini):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str = "application/json", headers=()) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for name, value in headers:
+                self.send_header(name, value)
+            if fake.chunk_bytes <= 0:
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            # Small chunks exercise the thinker's incremental response parser.
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(body), fake.chunk_bytes):
+                chunk = body[start:start + fake.chunk_bytes]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                request = {}
+            delay, failed = fake._draw()
+            time.sleep(delay)
+
+            if failed:
+                error = {"error": {"code": fake.error_status, "message": "Injected failure.", "status": "UNAVAILABLE"}}
+                self._send(fake.error_status, json.dumps(error).encode(), headers=[("Retry-After", "0")])
+                return
+
+            body = _response_body(fake.reply_text(request), prompt_tokens=length // 4)
+            if ":streamGenerateContent" in self.path:
+                self._send(200, f"data: {json.dumps(body)}\r\n\r\n".encode(), content_type="text/event-stream")
+            else:
+                self._send(200, json.dumps(body).encode())
+
+    return Handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--response-bytes", type=int, default=0, help="pad each reply to about this size")
+    parser.add_argument("--chunk-bytes", type=int, default=0, help="send bodies chunked in pieces of this size")
+    args = parser.parse_args()
+
+    fake = FakeGemini(
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        response_bytes=args.response_bytes,
+        chunk_bytes=args.chunk_bytes,
+        seed=None,
+    )
+    print(f"Fake Gemini listening on {fake.base_url} (GEMINI_BASE_URL={fake.base_url})", flush=True)
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+"""
+Cold-start import benchmark for the Django workers.
+
+Each run starts a fresh interpreter with ``-X importtime``, sets Django up and
+imports the URL modules the way a worker does, then reports the slowest
+imports and fails if a module that should be deferred was loaded at startup.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --max-ms 800 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["providentia_network.urls"]
+
+# Heavy dependencies that must only be imported on first use.
+DEFERRED_MODULES = ["matplotlib", "google.genai", "httpx", "redis", "numpy", "torch", "transformers"]
+
+_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed_ms": elapsed * 1000,
+    "loaded": [name for name in {deferred!r} if name in sys.modules],
+}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> dict[str, int]:
+    """Map each top-level import to its cumulative time in microseconds."""
+    cumulative: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line.split("|")
+        if name.startswith("  "):  # nested import, already counted by its parent
+            continue
+        cumulative[name.strip()] = int(total)
+    return cumulative
+
+
+def run_once(modules: list[str]) -> tuple[dict, dict[str, int]]:
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "providentia_network.settings")
+    env.setdefault("SECRET_KEY", "import-benchmark")
+    # Measure imports only, not the startup check of the C++ binary.
+    env["KIEVAN_RUS_BUILD_ON_STARTUP"] = "0"
+
+    snippet = _SNIPPET.format(modules=modules, deferred=DEFERRED_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet],
+        cwd=str(ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Import run failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result, _parse_importtime(completed.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", action="append", dest="modules",
+                        help=f"module to import after django.setup() (default: {DEFAULT_MODULES[0]})")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to run (median is reported)")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail when the median startup exceeds this")
+    args = parser.parse_args(argv)
+
+    modules = args.modules or DEFAULT_MODULES
+    timings = []
+    loaded: set[str] = set()
+    slowest: dict[str, int] = {}
+    for _ in range(max(1, args.repeat)):
+        result, cumulative = run_once(modules)
+        timings.append(result["elapsed_ms"])
+        loaded.update(result["loaded"])
+        slowest = cumulative
+
+    median = statistics.median(timings)
+    print(f"startup imports: median {median:.1f} ms over {len(timings)} runs "
+          f"(min {min(timings):.1f}, max {max(timings):.1f})")
+    print("slowest top-level imports (last run):")
+    for name, total in sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {total / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(sorted(loaded))}")
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median startup {median:.1f} ms exceeds {args.max_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Content-addressed storage for rendered thought graphs.
+
+A graph's key is a hash of the tree it shows, with the per-request node UUIDs
+replaced by their position, so identical trees share one file and are never
+rendered twice. Files live outside the source tree and are evicted by age and
+by the total size of the store.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+from .graphing import FORMATS, ThoughtNode, render_thought_graph
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _default_directory() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "providentia_network" / "graphs"
+
+
+def graph_key(nodes: Sequence[ThoughtNode], edges: Sequence[Tuple[str, str]]) -> str:
+    """Hash the tree's content; node IDs only matter through the edges they form."""
+    index = {node.id: position for position, node in enumerate(nodes)}
+    material = json.dumps(
+        {
+            "nodes": [{**asdict(node), "id": index[node.id]} for node in nodes],
+            "edges": [
+                [index[parent_id], index[child_id]]
+                for parent_id, child_id in edges
+                if parent_id in index and child_id in index
+            ],
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+def _env_float(name: str, default: float) -> float:
+    """``float(os.environ[name])``, or ``default`` when it is unset or malformed."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"[GraphStore] Ignoring {name}={value!r}: not a number; using {default}.")
+        return default
+
+
+class GraphStore:
+    def __init__(
+        self,
+        directory: Path,
+        output_format: str = "png",
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unsupported thought graph format '{output_format}'.")
+        self.directory = Path(directory)
+        self.output_format = output_format
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @classmethod
+    def from_env(cls) -> "GraphStore":
+        max_mb = _env_float("THOUGHT_GRAPH_MAX_MB", 256)
+        max_age = _env_float("THOUGHT_GRAPH_MAX_AGE", 7 * 24 * 3600)
+        return cls(
+            directory=Path(os.environ.get("THOUGHT_GRAPH_DIR") or _default_directory()),
+            output_format=os.environ.get("THOUGHT_GRAPH_FORMAT", "png").strip().lower() or "png",
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb > 0 else None,
+            max_age=max_age if max_age > 0 else None,
+        )
+
+    def path_for(self, key: str) -> Path:
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid graph key '{key}'.")
+        return self.directory / f"{key}.{self.output_format}"
+
+    def exists(self, key: str) -> bool:
+        """Whether ``key`` is stored; a hit refreshes its age so popular graphs stay."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return False
+        return True
+
+    def write(self, key: str, nodes: Sequence[ThoughtNode], edges: Sequence[Tuple[str, str]]) -> Path:
+        """Render ``nodes``/``edges`` under ``key`` (atomically), then evict old graphs."""
+        path = self.path_for(key)
+        staging = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            render_thought_graph(nodes, edges, staging, output_format=self.output_format)
+            os.replace(staging, path)
+        finally:
+            staging.unlink(missing_ok=True)
+        self.evict()
+        return path
+
+    def evict(self) -> int:
+        """Drop graphs older than ``max_age``, then the least recently used ones over ``max_bytes``."""
+        if self.max_bytes is None and self.max_age is None:
+            return 0
+        entries = []
+        for path in self.directory.glob(f"*.{self.output_format}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        cutoff = time.time() - self.max_age if self.max_age is not None else None
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+            expired = cutoff is not None and mtime < cutoff
+            oversized = self.max_bytes is not None and total > self.max_bytes
+            if not expired and not oversized:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+_store: Optional[GraphStore] = None
+
+
+def get_graph_store() -> GraphStore:
+    global _store
+    if _store is None:
+        _store = GraphStore.from_env()
+    return _store
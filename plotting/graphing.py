@@ -1,19 +1,31 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import json
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Iterable, Sequence, Tuple
+from typing import Iterable, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
 
-try:  
-    import matplotlib
+FORMATS = ("png", "svg", "json")
 
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-except ImportError as exc:  # pragma: no cover
-    plt = None
-    _MATPLOTLIB_ERROR = exc
-else:
-    _MATPLOTLIB_ERROR = None
+# SVG canvas units per layout unit, and the size of each node box.
+_SVG_X_SCALE = 260.0
+_SVG_Y_SCALE = 190.0
+_SVG_BOX_WIDTH = 240.0
+_SVG_LINE_HEIGHT = 14.0
+_SVG_MARGIN = 20.0
+
+
+def _load_pyplot():
+    """Import pyplot on first PNG render only; SVG and JSON output never need it."""
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError as exc:  # pragma: no cover
+        raise RuntimeError("matplotlib is required to render thought graphs as PNG") from exc
+    return plt
 
 
 @dataclass(frozen=True)
@@ -47,13 +59,112 @@ def _compute_layout(nodes: Sequence[ThoughtNode]) -> dict[str, Tuple[float, floa
     return positions
 
 
+def _node_colour(node: ThoughtNode) -> str:
+    if node.regrets:
+        return "#f8d7da"
+    if node.is_final:
+        return "#d4edda"
+    return "#e0ecff"
+
+
+def _node_lines(node: ThoughtNode) -> list[str]:
+    text_lines = [
+        node.branch_label,
+        node.label,
+        f"Prob: {node.probability:.2f}",
+        f"ΔPot: {node.potential_increment:+.2f}",
+        f"Cumulative: {node.cumulative_potential:.2f}",
+    ]
+    return "\n".join(filter(None, text_lines)).split("\n")
+
+
+def thought_graph_layout(
+    nodes: Sequence[ThoughtNode],
+    edges: Sequence[Tuple[str, str]],
+) -> dict:
+    """
+    JSON-ready description of the graph: node metadata with the layout
+    position from ``_compute_layout``, plus the edge list.
+    """
+    positions = _compute_layout(nodes)
+    return {
+        "nodes": [
+            {**asdict(node), "x": positions[node.id][0], "y": positions[node.id][1]}
+            for node in nodes
+        ],
+        "edges": [
+            {"source": parent_id, "target": child_id}
+            for parent_id, child_id in edges
+            if parent_id in positions and child_id in positions
+        ],
+    }
+
+
+def render_thought_graph_svg(
+    nodes: Sequence[ThoughtNode],
+    edges: Sequence[Tuple[str, str]],
+) -> str:
+    """Render the thought process as a standalone SVG document."""
+    if not nodes:
+        raise ValueError("No nodes provided for thought graph rendering.")
+
+    positions = _compute_layout(nodes)
+    lines = {node.id: _node_lines(node) for node in nodes}
+    box_height = max(len(node_lines) for node_lines in lines.values()) * _SVG_LINE_HEIGHT + 16.0
+
+    min_x = min(x for x, _ in positions.values())
+    max_x = max(x for x, _ in positions.values())
+    min_y = min(y for _, y in positions.values())
+    width = (max_x - min_x) * _SVG_X_SCALE + _SVG_BOX_WIDTH + 2 * _SVG_MARGIN
+    height = -min_y * _SVG_Y_SCALE + box_height + 2 * _SVG_MARGIN
+
+    def centre(node_id: str) -> Tuple[float, float]:
+        x_pos, y_pos = positions[node_id]
+        return (
+            (x_pos - min_x) * _SVG_X_SCALE + _SVG_BOX_WIDTH / 2 + _SVG_MARGIN,
+            -y_pos * _SVG_Y_SCALE + box_height / 2 + _SVG_MARGIN,
+        )
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="sans-serif" font-size="11">'
+    ]
+    for parent_id, child_id in edges:
+        if parent_id not in positions or child_id not in positions:
+            continue
+        (x1, y1), (x2, y2) = centre(parent_id), centre(child_id)
+        parts.append(
+            f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" '
+            f'stroke="#94a3b8" stroke-width="1.6"/>'
+        )
+
+    for node in nodes:
+        x_centre, y_centre = centre(node.id)
+        node_lines = lines[node.id]
+        parts.append(
+            f'<rect x="{x_centre - _SVG_BOX_WIDTH / 2:.1f}" y="{y_centre - box_height / 2:.1f}" '
+            f'width="{_SVG_BOX_WIDTH:.0f}" height="{box_height:.0f}" rx="8" '
+            f'fill="{_node_colour(node)}" stroke="#475569" stroke-width="0.8"/>'
+        )
+        first_line = y_centre - (len(node_lines) - 1) * _SVG_LINE_HEIGHT / 2
+        tspans = "".join(
+            f'<tspan x="{x_centre:.1f}" y="{first_line + index * _SVG_LINE_HEIGHT:.1f}">{escape(line)}</tspan>'
+            for index, line in enumerate(node_lines)
+        )
+        parts.append(f'<text text-anchor="middle" dominant-baseline="middle">{tspans}</text>')
+
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
 def render_thought_graph(
     nodes: Sequence[ThoughtNode],
     edges: Sequence[Tuple[str, str]],
     output_path: Path,
+    output_format: Optional[str] = None,
 ) -> Path:
     """
-    Render the thought process as a PNG image.
+    Render the thought process to ``output_path``.
 
     Parameters
     ----------
@@ -62,13 +173,28 @@ def render_thought_graph(
     edges:
         Directed edges represented as (parent_id, child_id) tuples.
     output_path:
-        Destination path for the PNG file.
+        Destination path for the rendered file.
+    output_format:
+        ``"png"`` (Matplotlib), ``"svg"`` or ``"json"``; defaults to the
+        suffix of ``output_path``. Only PNG output imports Matplotlib.
     """
-    if _MATPLOTLIB_ERROR is not None: 
-        raise RuntimeError("matplotlib is required to render thought graphs") from _MATPLOTLIB_ERROR
+    output_format = (output_format or output_path.suffix.lstrip(".") or "png").lower()
+    if output_format not in FORMATS:
+        raise ValueError(f"Unsupported thought graph format '{output_format}'.")
     if not nodes:
         raise ValueError("No nodes provided for thought graph rendering.")
 
+    if output_format == "svg":
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(render_thought_graph_svg(nodes, edges), encoding="utf-8")
+        return output_path
+    if output_format == "json":
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(json.dumps(thought_graph_layout(nodes, edges)), encoding="utf-8")
+        return output_path
+
+    plt = _load_pyplot()
+
     positions = _compute_layout(nodes)
     depth_levels = {node.depth for node in nodes}
     depth_count = len(depth_levels)
@@ -95,21 +221,8 @@ def render_thought_graph(
 
     for node in nodes:
         x_pos, y_pos = positions[node.id]
-        if node.regrets:
-            face_color = "#f8d7da"
-        elif node.is_final:
-            face_color = "#d4edda"
-        else:
-            face_color = "#e0ecff"
-
-        text_lines = [
-            node.branch_label,
-            node.label,
-            f"Prob: {node.probability:.2f}",
-            f"ΔPot: {node.potential_increment:+.2f}",
-            f"Cumulative: {node.cumulative_potential:.2f}",
-        ]
-        text = "\n".join(filter(None, text_lines))
+        face_color = _node_colour(node)
+        text = "\n".join(_node_lines(node))
 
         ax.text(
             x_pos,
@@ -124,6 +237,6 @@ def render_thought_graph(
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
     fig.tight_layout()
-    fig.savefig(output_path, dpi=200, bbox_inches="tight")
+    fig.savefig(output_path, dpi=200, bbox_inches="tight", format="png")
     plt.close(fig)
     return output_path
@@ -0,0 +1,140 @@
+"""
+Background rendering of thought graphs.
+
+Matplotlib is slow to import and to draw, so web workers never touch it:
+jobs carry plain node/edge lists to a small process pool, which writes
+them into a ``GraphStore``, and callers poll by graph key.
+``GRAPH_RENDER_WORKERS`` sizes the pool; ``0`` disables rendering.
+"""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from typing import Optional, Sequence, Tuple
+
+from providentia_network import telemetry
+
+from .graph_store import GraphStore
+from .graphing import ThoughtNode
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+def _env_workers() -> int:
+    try:
+        return max(0, int(os.environ.get("GRAPH_RENDER_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+
+RENDER_WORKERS = _env_workers()
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_jobs: dict[str, Future] = {}
+_jobs_lock = threading.Lock()
+
+
+def _render_job(store: GraphStore, key: str, nodes: list[dict], edges: list[Tuple[str, str]]) -> str:
+    # Runs in the pool process, the only place Matplotlib gets imported.
+    return str(store.write(key, [ThoughtNode(**node) for node in nodes], edges))
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers do not inherit the web worker's threads or locks.
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+        return _executor
+
+
+def _reset_executor() -> None:
+    """Drop a pool whose worker died so the next job starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        broken, _executor = _executor, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def enabled() -> bool:
+    return RENDER_WORKERS > 0
+
+
+def submit(
+    store: GraphStore,
+    key: str,
+    nodes: Sequence[ThoughtNode],
+    edges: Sequence[Tuple[str, str]],
+) -> bool:
+    """Queue a graph for rendering into ``store``. Returns False when rendering is disabled."""
+    if not enabled():
+        return False
+    with _jobs_lock:
+        running = _jobs.get(key)
+        if running is not None and not _failed(running):
+            return True
+        job = (store, key, [asdict(node) for node in nodes], [tuple(edge) for edge in edges])
+        try:
+            future = _get_executor().submit(_render_job, *job)
+        except BrokenProcessPool:
+            _reset_executor()
+            future = _get_executor().submit(_render_job, *job)
+        _jobs[key] = future
+    started = time.monotonic()
+    future.add_done_callback(lambda done: _record_render(key, started, done))
+    return True
+
+
+def _record_render(key: str, started: float, future: Future) -> None:
+    # Queue wait plus drawing, as seen from the web worker.
+    outcome = "cancelled" if future.cancelled() else "error" if future.exception() else "ok"
+    telemetry.record("render", time.monotonic() - started, outcome, graph_id=key)
+    if outcome == "ok":
+        # The store's file is the record of a finished graph, polled or not.
+        _forget(key, future)
+
+
+def _failed(future: Future) -> bool:
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+def _forget(key: str, future: Future) -> None:
+    with _jobs_lock:
+        if _jobs.get(key) is future:
+            del _jobs[key]
+
+
+def status(store: GraphStore, key: str) -> dict:
+    """
+    Report a job as ``pending``, ``ready``, ``failed`` or ``unknown``. Graphs
+    rendered by another process, or for an identical earlier tree, are found in the store.
+    """
+    with _jobs_lock:
+        future = _jobs.get(key)
+    if future is None:
+        return {"status": READY if store.path_for(key).exists() else UNKNOWN}
+    if not future.done():
+        return {"status": PENDING}
+
+    # Finished jobs are dropped once reported: a ready graph is tracked by its
+    # file from here on, and a failed one may be submitted again.
+    _forget(key, future)
+    if _failed(future):
+        return {"status": FAILED, "error": "cancelled" if future.cancelled() else str(future.exception())}
+    return {"status": READY}
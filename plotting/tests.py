@@ -1,3 +1,186 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from plotting import graphing, render_queue
+from plotting.graph_store import GraphStore, graph_key
+from plotting.graphing import ThoughtNode, render_thought_graph, render_thought_graph_svg
+from providentia_network import telemetry
+
+
+def _tree(root_id: str = "root", child_id: str = "child"):
+    nodes = [
+        ThoughtNode(id=root_id, depth=0, label="Plan", branch_label="Primary",
+                    probability=0.5, potential_increment=0.1, cumulative_potential=0.1),
+        ThoughtNode(id=child_id, depth=1, label="Step", branch_label="Primary-A",
+                    probability=0.7, potential_increment=0.2, cumulative_potential=0.3),
+    ]
+    return nodes, [(root_id, child_id)]
+
+
+class SvgRendererTests(SimpleTestCase):
+    SVG = "{http://www.w3.org/2000/svg}"
+
+    def render(self, nodes, edges):
+        return ElementTree.fromstring(render_thought_graph_svg(nodes, edges))
+
+    def test_nodes_become_boxes_joined_by_edges(self):
+        nodes, edges = _tree()
+
+        svg = self.render(nodes, edges + [("root", "missing")])
+
+        self.assertEqual(len(svg.findall(f"{self.SVG}rect")), 2)
+        [line] = svg.findall(f"{self.SVG}line")  # The edge to an unknown node is skipped.
+        self.assertLess(float(line.get("y1")), float(line.get("y2")))
+        texts = ["".join(text.itertext()) for text in svg.findall(f"{self.SVG}text")]
+        self.assertEqual(texts[1], "Primary-AStepProb: 0.70ΔPot: +0.20Cumulative: 0.30")
+
+    def test_labels_are_escaped_and_regrets_coloured(self):
+        [root, _], _ = _tree()
+        root = replace(root, label="<script>alert('&')</script>", regrets=True)
+
+        svg = self.render([root], [])
+
+        self.assertIn("<script>alert('&')</script>", "".join(svg.itertext()))
+        self.assertEqual(svg.find(f"{self.SVG}rect").get("fill"), "#f8d7da")
+
+    def test_svg_output_does_not_need_matplotlib(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "graph.svg"
+        self.enterContext(mock.patch.object(graphing, "_load_pyplot", side_effect=AssertionError("imported")))
+
+        render_thought_graph(*_tree(), path)
+
+        self.assertEqual(ElementTree.parse(path).getroot().tag, f"{self.SVG}svg")
+        with self.assertRaises(ValueError):
+            render_thought_graph([], [], path)
+
+
+class GraphStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def put(self, store: GraphStore, key: str, size: int, age: float) -> Path:
+        path = store.path_for(key)
+        path.write_bytes(b"x" * size)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_graph_key_ignores_node_ids(self):
+        self.assertEqual(graph_key(*_tree()), graph_key(*_tree("a1", "b2")))
+        nodes, _ = _tree()
+        self.assertNotEqual(graph_key(nodes, []), graph_key(*_tree()))
+
+    def test_keys_are_validated(self):
+        store = GraphStore(self.directory, output_format="json")
+        with self.assertRaises(ValueError):
+            store.path_for("../../etc/passwd")
+        with self.assertRaises(ValueError):
+            GraphStore(self.directory, output_format="gif")
+
+    def test_write_renders_the_tree(self):
+        store = GraphStore(self.directory, output_format="json")
+        key = graph_key(*_tree())
+
+        path = store.write(key, *_tree())
+
+        self.assertEqual(len(json.loads(path.read_text())["nodes"]), 2)
+        self.assertEqual(list(self.directory.glob(".*.tmp")), [])
+
+    def test_old_graphs_are_evicted(self):
+        store = GraphStore(self.directory, output_format="json", max_age=3600)
+        old = self.put(store, "a" * 32, 10, age=7200)
+        new = self.put(store, "b" * 32, 10, age=60)
+
+        self.assertEqual(store.evict(), 1)
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+    def test_least_recently_used_graphs_go_over_the_size_limit(self):
+        store = GraphStore(self.directory, output_format="json", max_bytes=25)
+        oldest = self.put(store, "a" * 32, 10, age=300)
+        used = self.put(store, "b" * 32, 10, age=200)
+        newest = self.put(store, "c" * 32, 10, age=100)
+        self.assertTrue(store.exists("a" * 32))  # A hit makes it the most recent.
+
+        self.assertEqual(store.evict(), 1)
+        self.assertTrue(oldest.exists())
+        self.assertFalse(used.exists())
+        self.assertTrue(newest.exists())
+
+    def test_malformed_limits_fall_back_to_the_defaults(self):
+        environ = {"THOUGHT_GRAPH_DIR": str(self.directory), "THOUGHT_GRAPH_MAX_MB": "lots", "THOUGHT_GRAPH_MAX_AGE": "1w"}
+        with mock.patch.dict(os.environ, environ), contextlib.redirect_stdout(io.StringIO()) as out:
+            store = GraphStore.from_env()
+
+        self.assertEqual(store.max_bytes, 256 * 1024 * 1024)
+        self.assertEqual(store.max_age, 7 * 24 * 3600)
+        self.assertIn("THOUGHT_GRAPH_MAX_MB='lots'", out.getvalue())
+
+    def test_unlimited_store_keeps_everything(self):
+        store = GraphStore(self.directory, output_format="json")
+        self.put(store, "a" * 32, 10, age=10 ** 8)
+
+        self.assertEqual(store.evict(), 0)
+
+
+class RenderQueueTests(SimpleTestCase):
+    def setUp(self):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.store = GraphStore(directory, output_format="json")
+        self.key = graph_key(*_tree())
+        self.enterContext(mock.patch.object(telemetry.logger, "disabled", True))
+        # A thread pool keeps the test in-process; jobs run the same code.
+        executor = self.enterContext(ThreadPoolExecutor(max_workers=1))
+        self.enterContext(mock.patch.object(render_queue, "_get_executor", return_value=executor))
+        self.enterContext(mock.patch.object(render_queue, "RENDER_WORKERS", 1))
+        self.enterContext(mock.patch.object(render_queue, "_jobs", {}))
+
+    def test_disabled_queue_refuses_jobs(self):
+        with mock.patch.object(render_queue, "RENDER_WORKERS", 0):
+            self.assertFalse(render_queue.submit(self.store, self.key, *_tree()))
+        self.assertEqual(render_queue.status(self.store, self.key), {"status": render_queue.UNKNOWN})
+
+    def test_submitted_graph_becomes_ready(self):
+        self.assertTrue(render_queue.submit(self.store, self.key, *_tree()))
+        deadline = time.monotonic() + 30
+        while (job := render_queue.status(self.store, self.key))["status"] == render_queue.PENDING:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+        self.assertEqual(job, {"status": render_queue.READY})
+        self.assertEqual(render_queue._jobs, {})
+        self.assertTrue(self.store.path_for(self.key).exists())
+
+    def test_pending_job_is_not_submitted_twice(self):
+        pending = Future()
+        render_queue._jobs[self.key] = pending
+
+        self.assertTrue(render_queue.submit(self.store, self.key, *_tree()))
+        self.assertIs(render_queue._jobs[self.key], pending)
+        self.assertEqual(render_queue.status(self.store, self.key), {"status": render_queue.PENDING})
+
+    def test_failed_job_is_reported_once_then_resubmitted(self):
+        failed = Future()
+        failed.set_exception(RuntimeError("renderer crashed"))
+        render_queue._jobs[self.key] = failed
+
+        self.assertEqual(
+            render_queue.status(self.store, self.key),
+            {"status": render_queue.FAILED, "error": "renderer crashed"},
+        )
+        self.assertEqual(render_queue.status(self.store, self.key), {"status": render_queue.UNKNOWN})
+
+        render_queue._jobs[self.key] = failed
+        self.assertTrue(render_queue.submit(self.store, self.key, *_tree()))
+        self.assertIsNot(render_queue._jobs[self.key], failed)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'providentia_network.settings')
 
 application = get_asgi_application()
+
+# Build or validate the C++ thinker before the first request arrives.
+from speech.apps import prepare_thinker  # noqa: E402
+
+prepare_thinker()
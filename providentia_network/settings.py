@@ -141,3 +141,43 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Server-side ceilings for /deepthink requests. A request may ask for tighter
+# limits but never looser ones; unset values are unbounded.
+
+def _optional_env(name, cast):
+    value = os.environ.get(name)
+    return cast(value) if value not in (None, "") else None
+
+
+DEEPTHINK_LIMITS = {
+    'max_nodes': int(os.environ.get('DEEPTHINK_MAX_NODES', '15')),
+    'deadline_seconds': float(os.environ.get('DEEPTHINK_DEADLINE_SECONDS', '120')),
+    'max_tokens': _optional_env('DEEPTHINK_MAX_TOKENS', int),
+    'good_enough_probability': _optional_env('DEEPTHINK_GOOD_ENOUGH_PROBABILITY', float),
+}
+
+# Clients that may scrape /metrics/ without a staff login, by REMOTE_ADDR.
+# Behind a reverse proxy this is the proxy's address; empty means staff only.
+METRICS_ALLOWED_IPS = [
+    address.strip()
+    for address in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if address.strip()
+]
+
+# Per-stage deepthink timings are logged as JSON lines on this logger (see
+# providentia_network/telemetry.py); TELEMETRY_LOG_LEVEL=WARNING silences them.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'providentia.telemetry': {
+            'handlers': ['console'],
+            'level': os.environ.get('TELEMETRY_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,235 @@
+"""
+Per-stage latency telemetry for the deepthink pipeline.
+
+``span(stage, **attributes)`` times a block and ``record`` takes a duration
+measured elsewhere (the thinker reports its Gemini call timings in the payload
+trailer). Attributes bound with ``bound`` (node ID, branch label) are added to
+every measurement taken in the same thread or asyncio task. Every measurement is:
+
+- logged as one JSON line on the ``providentia.telemetry`` logger;
+- added to an in-process histogram, served in the Prometheus text format
+  by ``metrics_view`` (``/metrics/``);
+- exported as an OpenTelemetry span when ``opentelemetry`` is installed.
+  Spans go to whatever tracer provider the process configured, which is a
+  no-op by default; ``configure_tracing`` installs a local in-memory exporter.
+
+Attributes such as node IDs and branch labels go to logs and spans only.
+Metrics are labelled by stage and outcome, so their cardinality stays fixed.
+Each process keeps its own histograms; scrape every worker.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+logger = logging.getLogger("providentia.telemetry")
+
+# Histogram bucket upper bounds in seconds: subprocess spawns and parses sit
+# at the bottom, Gemini calls and whole trees at the top.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_NAME = "deepthink_stage_duration_seconds"
+
+# Set TELEMETRY_OTEL=0 to skip OpenTelemetry even when it is installed.
+OTEL_ENABLED = os.environ.get("TELEMETRY_OTEL", "1").lower() not in {"0", "false", "no"}
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+
+class StageMetrics:
+    """Cumulative duration histograms keyed by ``(stage, outcome)``."""
+
+    def __init__(self) -> None:
+        self._series: dict[tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, outcome: str, seconds: float) -> None:
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._series.get((stage, outcome))
+            if series is None:
+                series = self._series[(stage, outcome)] = _Series()
+            if index < len(BUCKETS):
+                series.buckets[index] += 1
+            series.count += 1
+            series.total += seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> dict[tuple[str, str], tuple[int, float]]:
+        """``(count, total seconds)`` per ``(stage, outcome)``."""
+        with self._lock:
+            return {key: (series.count, series.total) for key, series in self._series.items()}
+
+    def render(self) -> str:
+        """The histograms in the Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            f"# HELP {METRIC_NAME} Wall time of each deepthink pipeline stage.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            items = sorted((key, list(s.buckets), s.count, s.total) for key, s in self._series.items())
+        for (stage, outcome), buckets, count, total in items:
+            labels = f'stage="{_escape_label(stage)}",outcome="{_escape_label(outcome)}"'
+            cumulative = 0
+            for upper, hits in zip(BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{upper:g}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{METRIC_NAME}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{METRIC_NAME}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = StageMetrics()
+
+_bound: ContextVar[dict[str, Any]] = ContextVar("telemetry_attributes", default={})
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _get_tracer():
+    """The OpenTelemetry tracer, or ``None`` when OpenTelemetry is off or not installed."""
+    global _tracer
+    if not OTEL_ENABLED:
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    from opentelemetry import trace
+                except ImportError:
+                    _tracer = False
+                else:
+                    _tracer = trace.get_tracer("providentia.telemetry")
+    return _tracer or None
+
+
+def configure_tracing(exporter: Any = None):
+    """
+    Install an OpenTelemetry SDK tracer provider that exports spans through
+    ``exporter``, by default an ``InMemorySpanExporter``, for tests and local
+    runs. Returns the exporter, or ``None`` when the SDK is not installed.
+    """
+    global _tracer
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    except ImportError:
+        return None
+
+    exporter = exporter if exporter is not None else InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    with _tracer_lock:
+        _tracer = provider.get_tracer("providentia.telemetry")
+    return exporter
+
+
+def _span_attributes(attributes: dict[str, Any]) -> dict[str, Any]:
+    # OpenTelemetry only takes primitives; None values are dropped.
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
+
+
+@contextmanager
+def bound(**attributes: Any) -> Iterator[None]:
+    """Attach ``attributes`` to every measurement taken inside the block."""
+    token = _bound.set({**_bound.get(), **attributes})
+    try:
+        yield
+    finally:
+        _bound.reset(token)
+
+
+def _emit(stage: str, seconds: float, outcome: str, attributes: dict[str, Any]) -> None:
+    metrics.observe(stage, outcome, seconds)
+    if logger.isEnabledFor(logging.INFO):
+        record = {"stage": stage, "duration_ms": round(seconds * 1000, 3), "outcome": outcome, **attributes}
+        logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+
+@contextmanager
+def span(stage: str, cancelled_by: tuple[type[BaseException], ...] = (), **attributes: Any) -> Iterator[dict[str, Any]]:
+    """
+    Time the block as ``stage``. Yields the attribute dict so the block can
+    add attributes it only learns while running. An exception marks the
+    stage as ``error``; cancellation (task cancellation, a closed generator,
+    or one of ``cancelled_by``) as ``cancelled``. Either is re-raised.
+    """
+    tracer = _get_tracer()
+    scope = tracer.start_as_current_span(stage) if tracer is not None else nullcontext()
+    outcome = "ok"
+    started = time.perf_counter()
+    with scope as otel_span:
+        try:
+            yield attributes
+        except cancelled_by:
+            outcome = "cancelled"
+            raise
+        except Exception as exc:
+            outcome = "error"
+            attributes.setdefault("error", type(exc).__name__)
+            raise
+        except BaseException:
+            outcome = "cancelled"
+            raise
+        finally:
+            merged = {**_bound.get(), **attributes}
+            _emit(stage, time.perf_counter() - started, outcome, merged)
+            if otel_span is not None:
+                otel_span.set_attributes(_span_attributes({**merged, "outcome": outcome}))
+
+
+def record(stage: str, seconds: float, outcome: str = "ok", **attributes: Any) -> None:
+    """Record a stage that was timed elsewhere and has just finished."""
+    attributes = {**_bound.get(), **attributes}
+    _emit(stage, seconds, outcome, attributes)
+    tracer = _get_tracer()
+    if tracer is not None:
+        end_ns = time.time_ns()
+        otel_span = tracer.start_span(
+            stage,
+            start_time=end_ns - int(seconds * 1e9),
+            attributes=_span_attributes({**attributes, "outcome": outcome}),
+        )
+        otel_span.end(end_time=end_ns)
+
+
+def metrics_view(request):
+    """
+    Serve the stage histograms for Prometheus to scrape: to staff users and
+    to clients listed in ``settings.METRICS_ALLOWED_IPS``, 403 for anyone else.
+    """
+    from django.conf import settings
+    from django.http import HttpResponse, HttpResponseForbidden
+
+    user = getattr(request, "user", None)
+    allowed = request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", ())
+    if not (allowed or (user is not None and user.is_staff)):
+        return HttpResponseForbidden("Metrics are not available to this client.")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from . import telemetry
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('speech/', include('speech.urls', namespace="speech"))
+    path('speech/', include('speech.urls', namespace="speech")),
+    path('metrics/', telemetry.metrics_view, name='metrics'),
 
 ]
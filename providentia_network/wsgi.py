@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'providentia_network.settings')
 
 application = get_wsgi_application()
+
+# Build or validate the C++ thinker before the first request arrives.
+from speech.apps import prepare_thinker  # noqa: E402
+
+prepare_thinker()
@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ReasoningNode, ReasoningRun
+
+
+@admin.register(ReasoningRun)
+class ReasoningRunAdmin(admin.ModelAdmin):
+    list_display = ("id", "strategy", "node_count", "tokens_used", "complete", "created_at")
+    list_filter = ("strategy", "complete")
+    search_fields = ("request_hash", "message")
+
+
+@admin.register(ReasoningNode)
+class ReasoningNodeAdmin(admin.ModelAdmin):
+    list_display = ("branch_label", "run", "depth", "probability", "cumulative_potential", "is_final")
+    list_filter = ("is_final", "regrets")
+    raw_id_fields = ("run", "parent")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from reasoning.models import ReasoningRun
+from speech.context_manager.warm_start import get_warm_start_index
+
+
+class Command(BaseCommand):
+    help = 'Delete stored thought trees so deepthink requests search again instead of reusing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, metavar='SECONDS',
+                            help='Only delete runs stored more than this many seconds ago')
+        parser.add_argument('--message', help='Only delete runs answering exactly this message')
+
+    def handle(self, *args, **options):
+        runs = ReasoningRun.objects.all()
+        if options['older_than'] is not None:
+            runs = runs.older_than(options['older_than'])
+        if options['message'] is not None:
+            runs = runs.filter(message=options['message'])
+        # Nodes go with their run (on_delete=CASCADE).
+        run_ids = [str(run_id) for run_id in runs.values_list('id', flat=True)]
+        runs.delete()
+        deleted = len(run_ids)
+        if run_ids:
+            # Deleted runs must not come back from a saved warm-start index.
+            get_warm_start_index().discard(run_ids)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} stored thought trees'))
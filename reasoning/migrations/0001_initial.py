@@ -0,0 +1,58 @@
+import uuid
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReasoningRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('request_hash', models.CharField(max_length=64)),
+                ('message', models.TextField()),
+                ('strategy', models.CharField(max_length=64)),
+                ('stop_reason', models.CharField(blank=True, default='', max_length=255)),
+                ('complete', models.BooleanField(default=True)),
+                ('node_count', models.PositiveIntegerField(default=0)),
+                ('tokens_used', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['request_hash', '-created_at'], name='reasoning_run_request_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReasoningNode',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('position', models.PositiveIntegerField()),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('branch_label', models.CharField(max_length=255)),
+                ('plan', models.TextField()),
+                ('setbacks', models.TextField(blank=True, default='')),
+                ('summary', models.TextField(blank=True, default='')),
+                ('probability', models.FloatField(default=0.0)),
+                ('potential_increment', models.FloatField(default=0.0)),
+                ('cumulative_potential', models.FloatField(default=0.0)),
+                ('is_final', models.BooleanField(default=False)),
+                ('regrets', models.BooleanField(default=False)),
+                ('tokens', models.PositiveIntegerField(default=0)),
+                ('context', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='reasoning.reasoningnode')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nodes', to='reasoning.reasoningrun')),
+            ],
+            options={
+                'ordering': ['run', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('run', 'position'), name='reasoning_node_position_unique')],
+            },
+        ),
+    ]
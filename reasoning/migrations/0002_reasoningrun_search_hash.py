@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reasoning', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reasoningrun',
+            name='search_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -1,3 +1,98 @@
-from django.db import models
+import uuid
+from datetime import timedelta
+from typing import Optional
 
-# Create your models here.
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+
+
+class ReasoningRunQuerySet(models.QuerySet):
+    def reusable(self, request_hash: str, max_age: Optional[float] = None):
+        """
+        Complete runs of the request with ``request_hash``, newest first; with
+        ``max_age``, only those stored at most that many seconds ago.
+        """
+        runs = self.filter(request_hash=request_hash, complete=True)
+        if max_age is not None:
+            runs = runs.recent(max_age)
+        return runs.order_by("-created_at")
+
+    def recent(self, seconds: float):
+        return self.filter(created_at__gte=timezone.now() - timedelta(seconds=seconds))
+
+    def older_than(self, seconds: float):
+        return self.filter(created_at__lt=timezone.now() - timedelta(seconds=seconds))
+
+
+class ReasoningRun(models.Model):
+    """One deepthink search: the request it answered and how it ended."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    request_hash = models.CharField(max_length=64)
+    # ``request_hash`` without the message, so warm starts only use trees
+    # searched with the same strategy, limits and thinker settings.
+    search_hash = models.CharField(max_length=64, blank=True, default="")
+    message = models.TextField()
+    strategy = models.CharField(max_length=64)
+    stop_reason = models.CharField(max_length=255, blank=True, default="")
+    # False when the deadline cut the search short or a node failed or was
+    # dropped; only complete runs are reused for repeated requests.
+    complete = models.BooleanField(default=True)
+    node_count = models.PositiveIntegerField(default=0)
+    tokens_used = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ReasoningRunQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["request_hash", "-created_at"], name="reasoning_run_request_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.strategy} run {self.id} ({self.node_count} nodes)"
+
+    def save_tree(self, nodes) -> "ReasoningRun":
+        """
+        Insert this run and its ``nodes`` in one transaction, the nodes with a
+        single ``bulk_create``. Node IDs are assigned before the insert, so
+        parents are set in the same statement; list parents before children.
+        """
+        with transaction.atomic():
+            self.save(force_insert=True)
+            ReasoningNode.objects.bulk_create(nodes, batch_size=500)
+        return self
+
+
+class ReasoningNode(models.Model):
+    """One evaluated thought of a run."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    run = models.ForeignKey(ReasoningRun, on_delete=models.CASCADE, related_name="nodes")
+    parent = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.CASCADE, related_name="children"
+    )
+    # Depth-first order within the run: a parent always precedes its children.
+    position = models.PositiveIntegerField()
+    depth = models.PositiveSmallIntegerField()
+    branch_label = models.CharField(max_length=255)
+    plan = models.TextField()
+    setbacks = models.TextField(blank=True, default="")
+    summary = models.TextField(blank=True, default="")
+    probability = models.FloatField(default=0.0)
+    potential_increment = models.FloatField(default=0.0)
+    cumulative_potential = models.FloatField(default=0.0)
+    is_final = models.BooleanField(default=False)
+    regrets = models.BooleanField(default=False)
+    tokens = models.PositiveIntegerField(default=0)
+    context = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ["run", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["run", "position"], name="reasoning_node_position_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.branch_label} ({self.run_id})"
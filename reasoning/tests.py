@@ -1,3 +1,180 @@
+import contextlib
+import io
+import tempfile
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from reasoning.models import ReasoningRun
+from speech.context_manager import ThinkingManager as thinking_manager
+from speech.context_manager import warm_start
+from speech.context_manager.limits import ThinkingLimits
+from speech.context_manager.search import get_strategy
+from speech.context_manager.ThinkingManager import ThinkingManager
+from speech.tests import PROMPT, FakeGeminiMixin
+
+
+def _age(run: ReasoningRun, seconds: float) -> None:
+    ReasoningRun.objects.filter(pk=run.pk).update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+
+class ReasoningRunQuerySetTests(TestCase):
+    def setUp(self):
+        self.fresh = ReasoningRun.objects.create(request_hash="a" * 64, message="m", strategy="bfs")
+        self.stale = ReasoningRun.objects.create(request_hash="a" * 64, message="m", strategy="bfs")
+        _age(self.stale, 7200)
+        ReasoningRun.objects.create(request_hash="a" * 64, message="m", strategy="bfs", complete=False)
+
+    def test_reusable_returns_complete_runs_newest_first(self):
+        self.assertEqual(list(ReasoningRun.objects.reusable("a" * 64)), [self.fresh, self.stale])
+        self.assertFalse(ReasoningRun.objects.reusable("b" * 64).exists())
+
+    def test_reusable_honours_max_age(self):
+        self.assertEqual(list(ReasoningRun.objects.reusable("a" * 64, max_age=3600)), [self.fresh])
+
+    def test_clear_reasoning_runs_deletes_old_runs(self):
+        out = io.StringIO()
+        call_command("clear_reasoning_runs", "--older-than", "3600", stdout=out)
+
+        self.assertIn("Deleted 1 stored thought trees", out.getvalue())
+        self.assertFalse(ReasoningRun.objects.filter(pk=self.stale.pk).exists())
+        self.assertEqual(ReasoningRun.objects.count(), 2)
+
+
+class ReasoningRunReuseTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(thinking_manager, "TREE_STORE", True))
+
+    def test_repeated_request_replays_the_stored_tree(self):
+        first = self.deepthink(max_nodes=3)
+        run = ReasoningRun.objects.get()
+        self.assertEqual(run.node_count, 3)
+        self.assertEqual(run.nodes.count(), 3)
+        requests = self.fake.requests
+
+        second = self.deepthink(max_nodes=3)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["response"], first.json()["response"])
+        self.assertEqual(self.fake.requests - requests, 1)  # Only the final answer.
+        self.assertEqual(ReasoningRun.objects.count(), 1)
+
+    def test_other_limits_search_again(self):
+        self.deepthink(max_nodes=3)
+        self.deepthink(max_nodes=5)
+
+        self.assertEqual(ReasoningRun.objects.count(), 2)
+
+    def test_runs_older_than_the_reuse_age_are_not_replayed(self):
+        self.deepthink(max_nodes=3)
+        _age(ReasoningRun.objects.get(), 7200)
+
+        manager = ThinkingManager(message=PROMPT, limits=ThinkingLimits(max_nodes=3))
+
+        self.assertIsNone(manager.reused_run_id)
+        self.assertEqual(ReasoningRun.objects.count(), 2)
+
+    def test_reuse_can_be_turned_off(self):
+        self.enterContext(mock.patch.object(thinking_manager, "REUSE_MAX_AGE", 0))
+        self.deepthink(max_nodes=3)
+        self.deepthink(max_nodes=3)
+
+        self.assertEqual(ReasoningRun.objects.count(), 2)
+
+    def test_interrupted_runs_are_stored_incomplete(self):
+        self.fake.latency_ms = 150
+        self.addCleanup(setattr, self.fake, "latency_ms", 0)
+        # Killed thinkers leave the fake server writing to closed sockets.
+        self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+
+        self.deepthink(deadline_seconds=0.5)
+
+        run = ReasoningRun.objects.get()
+        self.assertFalse(run.complete)
+        self.assertEqual(run.stop_reason, "deadline of 0.5s reached")
+
+
+class ConstantEncoder:
+    """Embeds every text as the same vector, so every stored run matches with similarity 1."""
+
+    def encode(self, texts):
+        import numpy as np
+
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class WarmStartTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(thinking_manager, "TREE_STORE", True))
+        self.enterContext(mock.patch.object(thinking_manager, "WARM_START", True))
+
+    def use_index(self, **thresholds):
+        index = warm_start.WarmStartIndex(encoder=ConstantEncoder(), **thresholds)
+        self.enterContext(mock.patch.object(warm_start, "_warm_start", index))
+        return index
+
+    def test_similar_question_reuses_a_recent_tree(self):
+        self.use_index()
+        first = ThinkingManager(message=PROMPT)
+
+        second = ThinkingManager(message="Plan a four-day trip to Kyiv on a student budget.")
+
+        self.assertEqual(second.reused_run_id, str(first.id))
+        self.assertEqual(second.node_count, first.node_count)
+
+    def test_similar_question_seeds_a_new_search(self):
+        # Similarity 1 stays below a reuse threshold above 1, so the tree is only seeded.
+        self.use_index(reuse_threshold=1.5)
+        first = ThinkingManager(message=PROMPT)
+        stored = {node.branch_label for node in ReasoningRun.objects.get(pk=first.id).nodes.filter(depth=1)}
+
+        second = ThinkingManager(message="Plan a four-day trip to Kyiv on a student budget.")
+
+        self.assertIsNone(second.reused_run_id)
+        self.assertEqual(second.seeded_from_run_id, str(first.id))
+        [branch] = second.root.children
+        self.assertIn(branch.branch_label, stored)
+        self.assertEqual(branch.context["user_enquiry"], second.root.context["user_enquiry"])
+        self.assertEqual(ReasoningRun.objects.count(), 2)
+
+    def test_deleted_run_falls_back_to_the_next_match(self):
+        index = self.use_index()
+        first = ThinkingManager(message=PROMPT)
+        deleted = str(uuid.uuid4())
+        index._index.add(deleted, ConstantEncoder().encode([""])[0])
+
+        second = ThinkingManager(message="Plan a four-day trip to Kyiv on a student budget.")
+
+        self.assertEqual(second.reused_run_id, str(first.id))
+        self.assertEqual(index._index.keys, [str(first.id)])
+
+    def test_trees_searched_with_other_settings_are_not_used(self):
+        self.use_index()
+        ThinkingManager(message=PROMPT, strategy=get_strategy("beam"), limits=ThinkingLimits(max_nodes=50))
+
+        second = ThinkingManager(
+            message="Plan a four-day trip to Kyiv on a student budget.", limits=ThinkingLimits(max_nodes=5)
+        )
+
+        self.assertIsNone(second.reused_run_id)
+        self.assertIsNone(second.seeded_from_run_id)
+        self.assertEqual(second.node_count, 5)
+
+    def test_clear_reasoning_runs_prunes_the_saved_index(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "warm_start"
+        index = self.use_index(path=path)
+        ThinkingManager(message=PROMPT)
+        self.assertTrue(path.with_suffix(".keys.json").exists())
+
+        call_command("clear_reasoning_runs", stdout=io.StringIO())
 
-# Create your tests here.
+        self.assertEqual(index._index.keys, [])
+        self.assertFalse(path.with_suffix(".keys.json").exists())
+        self.assertEqual(warm_start.WarmStartIndex(encoder=ConstantEncoder(), path=path).matches(PROMPT, list), [])
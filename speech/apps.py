@@ -1,6 +1,33 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def prepare_thinker():
+    """
+    Build (or validate) the C++ thinker once per server process so no request
+    ever pays for a compile. Set KIEVAN_RUS_BUILD_ON_STARTUP=0 to defer this
+    to `manage.py build_thinker` or the first deepthink request.
+    """
+    if os.environ.get("KIEVAN_RUS_BUILD_ON_STARTUP", "1").lower() in {"0", "false", "no"}:
+        return
+
+    from .context_manager.ThinkingManager import ThinkingProcessError, build_cpp_binary
+
+    try:
+        build_cpp_binary()
+    except ThinkingProcessError as exc:
+        print(f"[SpeechConfig] Unable to prepare C++ thinking engine: {exc}")
+
+
 class SpeechConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'speech'
+
+    def ready(self):
+        # Only servers build at startup: the WSGI/ASGI entry modules call
+        # prepare_thinker themselves, and other management commands (migrate,
+        # shell, check, ...) never need the binary.
+        if sys.argv[1:2] == ["runserver"]:
+            prepare_thinker()
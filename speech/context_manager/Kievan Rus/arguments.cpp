@@ -1,6 +1,10 @@
 #include "arguments.hpp"
 
+#include "environment.hpp"
+#include "json_value.hpp"
+
 #include <cstdlib>
+#include <exception>
 #include <iostream>
 #include <sstream>
 #include <stdexcept>
@@ -11,9 +15,31 @@ namespace kievan {
 namespace {
 
 void printUsage() {
-    std::cout << "Usage: thinker --message <text> --output <file> "
+    std::cout << "Usage: thinker --message <text> [--output <file>|-] "
                  "[--summary <text>] [--branch <label>] [--env <path>] "
-                 "[--model <model-name>] [--iteration <n>]\n";
+                 "[--model <model-name>] [--iteration <n>] "
+                 "[--summary-mode separate|inline|pipelined] [request options]\n"
+                 "       thinker --serve [--env <path>] [--model <model-name>] "
+                 "[--summary-mode separate|inline|pipelined] [request options]\n"
+                 "       thinker --batch [--env <path>] [--model <model-name>] "
+                 "[--summary-mode separate|inline|pipelined] [request options]\n"
+                 "Analysis options: [--response-schema <json>] [--schema-retries <n>]\n"
+                 "Request options: [--base-url <url>] [--connect-timeout-ms <n>] [--timeout-ms <n>] [--retries <n>] "
+                 "[--backoff-ms <n>] [--backoff-max-ms <n>] [--hedge-after-ms <n>|auto]\n";
+}
+
+long parseNonNegative(const std::string &name, const std::string &value) {
+    std::size_t consumed = 0;
+    long parsed = -1;
+    try {
+        parsed = std::stol(value, &consumed);
+    } catch (const std::exception &) {
+        consumed = 0;
+    }
+    if (consumed != value.size() || parsed < 0) {
+        throw std::invalid_argument("Argument " + name + " requires a non-negative integer");
+    }
+    return parsed;
 }
 
 }  // namespace
@@ -37,6 +63,32 @@ Arguments parseArguments(int argc, char *argv[]) {
             args.model = argv[++i];
         } else if (current == "--iteration" && i + 1 < argc) {
             args.iteration = std::stoi(argv[++i]);
+        } else if (current == "--summary-mode" && i + 1 < argc) {
+            args.summaryMode = argv[++i];
+        } else if (current == "--response-schema" && i + 1 < argc) {
+            args.responseSchema = argv[++i];
+        } else if (current == "--schema-retries" && i + 1 < argc) {
+            args.schemaRetries = static_cast<int>(parseNonNegative(current, argv[++i]));
+        } else if (current == "--base-url" && i + 1 < argc) {
+            args.requestPolicy.baseUrl = argv[++i];
+        } else if (current == "--connect-timeout-ms" && i + 1 < argc) {
+            args.requestPolicy.connectTimeoutMs = parseNonNegative(current, argv[++i]);
+        } else if (current == "--timeout-ms" && i + 1 < argc) {
+            args.requestPolicy.timeoutMs = parseNonNegative(current, argv[++i]);
+        } else if (current == "--retries" && i + 1 < argc) {
+            args.requestPolicy.maxRetries = static_cast<int>(parseNonNegative(current, argv[++i]));
+        } else if (current == "--backoff-ms" && i + 1 < argc) {
+            args.requestPolicy.backoffMs = parseNonNegative(current, argv[++i]);
+        } else if (current == "--backoff-max-ms" && i + 1 < argc) {
+            args.requestPolicy.backoffMaxMs = parseNonNegative(current, argv[++i]);
+        } else if (current == "--hedge-after-ms" && i + 1 < argc) {
+            std::string value = argv[++i];
+            args.requestPolicy.hedgeAfterMs =
+                value == "auto" ? RequestPolicy::kHedgeAuto : parseNonNegative(current, value);
+        } else if (current == "--serve") {
+            args.serve = true;
+        } else if (current == "--batch") {
+            args.batch = true;
         } else if (current == "--help") {
             printUsage();
             std::exit(0);
@@ -47,11 +99,30 @@ Arguments parseArguments(int argc, char *argv[]) {
         }
     }
 
+    if (args.summaryMode != "separate" && args.summaryMode != "inline" && args.summaryMode != "pipelined") {
+        throw std::invalid_argument("Argument --summary-mode must be separate, inline or pipelined");
+    }
+    if (args.requestPolicy.baseUrl.empty()) {
+        args.requestPolicy.baseUrl = config::loadBaseUrl(args.envPath);
+    }
+    if (!args.responseSchema.empty()) {
+        try {
+            json::parse(args.responseSchema);
+        } catch (const std::exception &ex) {
+            throw std::invalid_argument(std::string("Argument --response-schema must be a JSON schema: ") + ex.what());
+        }
+    }
+    if (args.serve && args.batch) {
+        throw std::invalid_argument("Arguments --serve and --batch cannot be combined");
+    }
+    if (args.serve || args.batch) {
+        return args;
+    }
     if (args.message.empty()) {
         throw std::invalid_argument("Missing required argument --message");
     }
     if (args.outputPath.empty()) {
-        throw std::invalid_argument("Missing required argument --output");
+        throw std::invalid_argument("Argument --output requires a file path or '-' for stdout");
     }
 
     return args;
@@ -2,6 +2,8 @@
 
 #include <string>
 
+#include "request_policy.hpp"
+
 namespace kievan {
 
 /**
@@ -11,10 +13,22 @@ struct Arguments {
     std::string message;
     std::string summarizedThought;
     std::string branchLabel;
-    std::string outputPath;
+    std::string outputPath = "-";  // "-" streams the payload to stdout.
     std::string envPath;
     std::string model = "gemini-2.5-flash-lite";
+    // "separate": analysis then summary call; "inline": one call whose JSON
+    // carries "thought_summary"; "pipelined": separate calls, but the analysis
+    // is streamed as a partial payload before the summary call starts.
+    std::string summaryMode = "separate";
+    // Gemini responseSchema (JSON) for the analysis call; empty sends none and
+    // skips validation. Replies that do not match it are re-asked up to
+    // schemaRetries times with the validation error attached.
+    std::string responseSchema;
+    int schemaRetries = 1;
+    RequestPolicy requestPolicy;
     int iteration = 0;
+    bool serve = false;
+    bool batch = false;
 };
 
 /**
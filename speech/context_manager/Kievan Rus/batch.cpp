@@ -0,0 +1,189 @@
+#include "batch.hpp"
+
+#include "binary_payload.hpp"
+#include "curl_guard.hpp"
+#include "environment.hpp"
+#include "gemini_client.hpp"
+#include "prompts.hpp"
+#include "thinker.hpp"
+
+#include <chrono>
+#include <exception>
+#include <iostream>
+#include <memory>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+namespace kievan::batch {
+
+namespace {
+
+enum class Stage { Analysis, Summary, Done };
+
+/**
+ * @brief One thought node moving through its Gemini calls.
+ */
+struct Job {
+    Arguments args;
+    Thought thought;
+    Stage stage = Stage::Analysis;
+    std::string analysisPrompt;
+    int repairs = 0;
+    std::unique_ptr<gemini::Exchange> exchange;
+    const char *callStage = "";
+    std::chrono::steady_clock::time_point callStarted;
+    std::string error;
+};
+
+void fail(Job &job, const std::string &message) {
+    job.exchange.reset();
+    job.error = message;
+    job.stage = Stage::Done;
+}
+
+void startExchange(gemini::Multi &multi, Job &job, const std::string &apiKey, const char *stage, std::string payload) {
+    job.callStage = stage;
+    job.callStarted = std::chrono::steady_clock::now();
+    job.exchange = std::make_unique<gemini::Exchange>(apiKey, job.args.model, std::move(payload),
+                                                      job.args.requestPolicy);
+    job.exchange->start(multi.handle());
+}
+
+void startAnalysis(gemini::Multi &multi, Job &job, const std::string &apiKey) {
+    try {
+        job.analysisPrompt = prompts::buildAnalysisPrompt(job.args);
+        startExchange(multi, job, apiKey, "analysis",
+                      prompts::buildAnalysisPayload(job.analysisPrompt, job.args.responseSchema));
+    } catch (const std::exception &ex) {
+        fail(job, ex.what());
+    }
+}
+
+/**
+ * @brief Take a finished exchange and start the job's next call, if any.
+ */
+void advance(gemini::Multi &multi, Job &job, const std::string &apiKey) {
+    try {
+        json::GeminiResponse response = job.exchange->result();
+        job.exchange.reset();
+        job.thought.calls.push_back({job.callStage, elapsedMs(job.callStarted)});
+        job.thought.usage += response.usage;
+        if (job.stage == Stage::Summary) {
+            job.thought.summary = response.text();
+            job.stage = Stage::Done;
+            return;
+        }
+
+        job.thought.contextJson = response.text();
+        std::string problem = analysisProblem(job.args, job.thought.contextJson);
+        if (!problem.empty()) {
+            if (job.repairs++ >= job.args.schemaRetries) {
+                fail(job, schemaFailure(problem));
+                return;
+            }
+            std::string prompt = prompts::buildRepairPrompt(job.analysisPrompt, job.thought.contextJson, problem);
+            startExchange(multi, job, apiKey, "repair", prompts::buildAnalysisPayload(prompt, job.args.responseSchema));
+            return;
+        }
+        if (job.args.summaryMode == "inline") {
+            job.stage = Stage::Done;
+            return;
+        }
+        job.stage = Stage::Summary;
+        std::string prompt = prompts::buildSummaryPrompt(job.thought.contextJson);
+        startExchange(multi, job, apiKey, "summary", prompts::buildSummaryPayload(prompt));
+    } catch (const std::exception &ex) {
+        fail(job, ex.what());
+    }
+}
+
+void writeResult(const Job &job) {
+    if (job.error.empty()) {
+        io::writeBinaryPayload(std::cout, true, job.thought.contextJson, job.thought.summary,
+                               thoughtMetadata(job.thought));
+        return;
+    }
+    std::ostringstream oss;
+    oss << "Thinking process failed: " << job.error;
+    std::cerr << "Error: [" << job.args.branchLabel << "] " << job.error << std::endl;
+    io::writeBinaryPayload(std::cout, false, oss.str(), "");
+}
+
+void runJobs(std::vector<Job> &jobs, const std::string &apiKey, std::size_t &written) {
+    gemini::Multi multi;
+    // Exchanges detach from the multi handle when destroyed, so drop them first.
+    struct ExchangeCleanup {
+        std::vector<Job> &jobs;
+        ~ExchangeCleanup() {
+            for (Job &job : jobs) {
+                job.exchange.reset();
+            }
+        }
+    } cleanup{jobs};
+
+    for (Job &job : jobs) {
+        startAnalysis(multi, job, apiKey);
+    }
+
+    std::vector<gemini::Exchange *> running;
+    while (written < jobs.size()) {
+        running.clear();
+        for (Job &job : jobs) {
+            if (job.exchange) {
+                running.push_back(job.exchange.get());
+            }
+        }
+        for (gemini::Exchange *exchange : multi.step(running)) {
+            for (Job &job : jobs) {
+                if (job.exchange.get() == exchange) {
+                    advance(multi, job, apiKey);
+                    break;
+                }
+            }
+        }
+
+        while (written < jobs.size() && jobs[written].stage == Stage::Done) {
+            writeResult(jobs[written++]);
+        }
+    }
+}
+
+}  // namespace
+
+int runBatch(const Arguments &defaults) {
+    std::ios::sync_with_stdio(false);
+    std::cin.tie(nullptr);
+
+    std::vector<Job> jobs;
+    try {
+        std::vector<Arguments> requests = io::readBatchFrame(std::cin, defaults);
+        jobs.resize(requests.size());
+        for (std::size_t i = 0; i < requests.size(); ++i) {
+            jobs[i].args = std::move(requests[i]);
+        }
+    } catch (const std::exception &ex) {
+        std::cerr << "Error: " << ex.what() << std::endl;
+        return 1;
+    }
+
+    std::size_t written = 0;
+    try {
+        curl::GlobalGuard curlGuard;
+        std::string apiKey = config::loadApiKey(defaults.envPath);
+        runJobs(jobs, apiKey, written);
+        return 0;
+    } catch (const std::exception &ex) {
+        // Jobs still in flight share the failure; the caller gets one payload per job either way.
+        for (; written < jobs.size(); ++written) {
+            if (jobs[written].stage != Stage::Done) {
+                fail(jobs[written], ex.what());
+            }
+            writeResult(jobs[written]);
+        }
+        return 1;
+    }
+}
+
+}  // namespace kievan::batch
@@ -0,0 +1,21 @@
+#pragma once
+
+#include "arguments.hpp"
+
+namespace kievan::batch {
+
+/**
+ * @brief Evaluate a batch of thought nodes read from stdin in one process.
+ *
+ * Reads one batch frame (see io::readBatchFrame) and runs every job's Gemini
+ * calls concurrently on a single curl multi handle, so the jobs share
+ * connections (multiplexed over HTTP/2 where available). One binary payload
+ * per job is written to stdout in job order, each as soon as it and all jobs
+ * before it are done; failed jobs get error payloads. Partial payloads are not
+ * sent in batch mode, so "pipelined" behaves like "separate".
+ *
+ * @return process exit code.
+ */
+int runBatch(const Arguments &defaults);
+
+}  // namespace kievan::batch
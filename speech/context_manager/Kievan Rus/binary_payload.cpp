@@ -2,13 +2,22 @@
 
 #include <cstdint>
 #include <fstream>
+#include <iostream>
+#include <istream>
+#include <ostream>
 #include <stdexcept>
 #include <string>
+#include <utility>
+#include <vector>
 
 namespace kievan::io {
 
 namespace {
 
+constexpr uint8_t kStatusSuccess = 0;
+constexpr uint8_t kStatusFailure = 1;
+constexpr uint8_t kStatusPartial = 2;
+
 uint32_t toBigEndian(uint32_t value) {
     return ((value & 0x000000FFu) << 24) |
            ((value & 0x0000FF00u) << 8) |
@@ -16,20 +25,42 @@ uint32_t toBigEndian(uint32_t value) {
            ((value & 0xFF000000u) >> 24);
 }
 
-}  // namespace
+bool readExact(std::istream &input, char *buffer, std::size_t size) {
+    if (size == 0) {
+        return true;
+    }
+    input.read(buffer, static_cast<std::streamsize>(size));
+    return static_cast<std::size_t>(input.gcount()) == size;
+}
 
-void writeBinaryPayload(const std::string &path,
-                        bool success,
-                        const std::string &contextJson,
-                        const std::string &summary) {
-    std::ofstream output(path, std::ios::binary);
-    if (!output.is_open()) {
-        throw std::runtime_error("Unable to open output path for writing: " + path);
+uint32_t readLength(std::istream &input) {
+    unsigned char raw[4];
+    if (!readExact(input, reinterpret_cast<char *>(raw), sizeof(raw))) {
+        throw std::runtime_error("Truncated request frame (missing length).");
     }
+    return (static_cast<uint32_t>(raw[0]) << 24) |
+           (static_cast<uint32_t>(raw[1]) << 16) |
+           (static_cast<uint32_t>(raw[2]) << 8) |
+           static_cast<uint32_t>(raw[3]);
+}
 
-    uint8_t status = success ? 0 : 1;
+std::string readField(std::istream &input) {
+    uint32_t length = readLength(input);
+    std::string value(length, '\0');
+    if (!readExact(input, value.data(), length)) {
+        throw std::runtime_error("Truncated request frame (short field).");
+    }
+    return value;
+}
+
+void writeFrame(std::ostream &output,
+                uint8_t status,
+                const std::string &contextJson,
+                const std::string &summary,
+                const std::string &metadata) {
     uint32_t contextLen = toBigEndian(static_cast<uint32_t>(contextJson.size()));
     uint32_t summaryLen = toBigEndian(static_cast<uint32_t>(summary.size()));
+    uint32_t metadataLen = toBigEndian(static_cast<uint32_t>(metadata.size()));
 
     output.write(reinterpret_cast<char *>(&status), sizeof(status));
     output.write(reinterpret_cast<char *>(&contextLen), sizeof(contextLen));
@@ -40,7 +71,78 @@ void writeBinaryPayload(const std::string &path,
     if (!summary.empty()) {
         output.write(summary.data(), static_cast<std::streamsize>(summary.size()));
     }
+    output.write(reinterpret_cast<char *>(&metadataLen), sizeof(metadataLen));
+    if (!metadata.empty()) {
+        output.write(metadata.data(), static_cast<std::streamsize>(metadata.size()));
+    }
+    output.flush();
+    if (!output) {
+        throw std::runtime_error("Unable to write binary payload to output stream.");
+    }
 }
 
-}  // namespace kievan::io
+}  // namespace
 
+void writeBinaryPayload(const std::string &path,
+                        bool success,
+                        const std::string &contextJson,
+                        const std::string &summary,
+                        const std::string &metadata) {
+    if (path == "-") {
+        writeBinaryPayload(std::cout, success, contextJson, summary, metadata);
+        return;
+    }
+    std::ofstream output(path, std::ios::binary);
+    if (!output.is_open()) {
+        throw std::runtime_error("Unable to open output path for writing: " + path);
+    }
+    writeBinaryPayload(output, success, contextJson, summary, metadata);
+}
+
+void writeBinaryPayload(std::ostream &output,
+                        bool success,
+                        const std::string &contextJson,
+                        const std::string &summary,
+                        const std::string &metadata) {
+    writeFrame(output, success ? kStatusSuccess : kStatusFailure, contextJson, summary, metadata);
+}
+
+void writePartialPayload(std::ostream &output, const std::string &contextJson) {
+    writeFrame(output, kStatusPartial, contextJson, "", "");
+}
+
+bool readRequestFrame(std::istream &input, Arguments &args) {
+    if (input.peek() == std::char_traits<char>::eof()) {
+        return false;
+    }
+
+    args.message = readField(input);
+    args.summarizedThought = readField(input);
+
+    std::string branchLabel = readField(input);
+    if (!branchLabel.empty()) {
+        args.branchLabel = branchLabel;
+    }
+    std::string model = readField(input);
+    if (!model.empty()) {
+        args.model = model;
+    }
+    args.iteration = static_cast<int>(readLength(input));
+    return true;
+}
+
+std::vector<Arguments> readBatchFrame(std::istream &input, const Arguments &defaults) {
+    uint32_t count = readLength(input);
+    std::vector<Arguments> requests;
+    requests.reserve(count);
+    for (uint32_t i = 0; i < count; ++i) {
+        Arguments args = defaults;
+        if (!readRequestFrame(input, args)) {
+            throw std::runtime_error("Truncated batch frame (missing request).");
+        }
+        requests.push_back(std::move(args));
+    }
+    return requests;
+}
+
+}  // namespace kievan::io
@@ -1,20 +1,74 @@
 #pragma once
 
+#include <iosfwd>
 #include <string>
+#include <vector>
+
+#include "arguments.hpp"
 
 namespace kievan::io {
 
 /**
  * @brief Write the structured response payload to disk for the Python caller.
+ *
+ * Layout: status byte, then length-prefixed (4 byte big-endian) context,
+ * summary and metadata fields. The metadata trailer is a JSON object
+ * (e.g. token usage) and is empty on failures.
+ *
+ * @param path Destination file, or "-" to stream the payload to stdout.
  * @param success true when the thinking process succeeded, false otherwise.
  * @param contextJson Serialized JSON describing the thought context or an error message.
  * @param summary Summarised thought string (ignored on failures).
+ * @param metadata JSON object with node metadata, or empty.
  * @throws std::runtime_error when the output file cannot be written.
  */
 void writeBinaryPayload(const std::string &path,
                         bool success,
                         const std::string &contextJson,
-                        const std::string &summary);
+                        const std::string &summary,
+                        const std::string &metadata = "");
 
-}  // namespace kievan::io
+/**
+ * @brief Write the structured response payload to an already open binary stream.
+ * @throws std::runtime_error when the stream enters a failed state.
+ */
+void writeBinaryPayload(std::ostream &output,
+                        bool success,
+                        const std::string &contextJson,
+                        const std::string &summary,
+                        const std::string &metadata = "");
+
+/**
+ * @brief Write an early payload (status 2) carrying only the analysis context.
+ *
+ * Pipelined runs send it before the summary call; the complete payload for
+ * the same node always follows, so readers may simply skip partial payloads.
+ * @throws std::runtime_error when the stream enters a failed state.
+ */
+void writePartialPayload(std::ostream &output, const std::string &contextJson);
+
+/**
+ * @brief Read one framed thinking request from a long-lived caller.
+ *
+ * The request frame is a sequence of length-prefixed UTF-8 fields
+ * (4 byte big-endian length each): message, summary, branch label and model,
+ * followed by the iteration as a 4 byte big-endian unsigned integer.
+ * Empty branch label or model fields keep the defaults already in @p args.
+ *
+ * @return false on a clean end of stream before a new frame starts.
+ * @throws std::runtime_error when the stream ends in the middle of a frame.
+ */
+bool readRequestFrame(std::istream &input, Arguments &args);
 
+/**
+ * @brief Read a batch of thinking requests.
+ *
+ * The batch frame is the job count as a 4 byte big-endian unsigned integer
+ * followed by that many request frames (see readRequestFrame), each starting
+ * from a copy of @p defaults.
+ *
+ * @throws std::runtime_error when the stream ends in the middle of the batch.
+ */
+std::vector<Arguments> readBatchFrame(std::istream &input, const Arguments &defaults);
+
+}  // namespace kievan::io
@@ -63,5 +63,16 @@ std::string loadApiKey(const std::string &envPath) {
     throw std::runtime_error("Unable to locate GEMINI_API_KEY in environment or .env file.");
 }
 
+std::string loadBaseUrl(const std::string &envPath) {
+    const char *fromEnv = std::getenv("GEMINI_BASE_URL");
+    if (fromEnv != nullptr && *fromEnv != '\0') {
+        return trim(fromEnv);
+    }
+    if (!envPath.empty()) {
+        return readValueFromEnvFile(envPath, "GEMINI_BASE_URL");
+    }
+    return {};
+}
+
 }  // namespace kievan::config
 
@@ -10,5 +10,11 @@ namespace kievan::config {
  */
 std::string loadApiKey(const std::string &envPath);
 
+/**
+ * @brief Resolve GEMINI_BASE_URL from the environment or provided .env file.
+ * @return the configured API root, or an empty string for the default endpoint.
+ */
+std::string loadBaseUrl(const std::string &envPath);
+
 }  // namespace kievan::config
 
@@ -3,17 +3,39 @@
 #include <algorithm>
 #include <cctype>
 #include <curl/curl.h>
+#include <exception>
+#include <iostream>
+#include <random>
 #include <sstream>
 #include <stdexcept>
 #include <string>
+#include <utility>
 
 namespace kievan::gemini {
 
 namespace {
 
-size_t writeToString(void *ptr, size_t size, size_t nmemb, void *userdata) {
-    auto *stream = static_cast<std::string *>(userdata);
-    stream->append(static_cast<char *>(ptr), size * nmemb);
+constexpr long kMaxPollMs = 1000;
+
+/**
+ * Receives the body from curl and feeds it to the parser as it arrives. A
+ * parse error stops parsing but not the transfer, so error bodies that are
+ * not JSON can still be reported with their HTTP status.
+ */
+struct ResponseSink {
+    json::ResponseParser parser;
+    std::string parseError;
+};
+
+size_t writeToParser(void *ptr, size_t size, size_t nmemb, void *userdata) {
+    auto *sink = static_cast<ResponseSink *>(userdata);
+    if (sink->parseError.empty()) {
+        try {
+            sink->parser.feed(static_cast<const char *>(ptr), size * nmemb);
+        } catch (const std::exception &ex) {
+            sink->parseError = ex.what();
+        }
+    }
     return size * nmemb;
 }
 
@@ -33,145 +55,400 @@ std::string urlEncode(const std::string &value) {
     return encoded;
 }
 
-std::string unescapeJsonString(const std::string &input, std::size_t startPos) {
-    std::string result;
-    result.reserve(input.size() - startPos);
-    for (std::size_t i = startPos; i < input.size();) {
-        char c = input[i++];
-        if (c == '\\') {
-            if (i >= input.size()) {
-                break;
-            }
-            char esc = input[i++];
-            switch (esc) {
-                case '\\': result.push_back('\\'); break;
-                case '"': result.push_back('"'); break;
-                case '/': result.push_back('/'); break;
-                case 'b': result.push_back('\b'); break;
-                case 'f': result.push_back('\f'); break;
-                case 'n': result.push_back('\n'); break;
-                case 'r': result.push_back('\r'); break;
-                case 't': result.push_back('\t'); break;
-                case 'u': {
-                    if (i + 3 >= input.size()) {
-                        break;
-                    }
-                    unsigned int code = 0;
-                    for (int j = 0; j < 4; ++j) {
-                        char hex = input[i++];
-                        code <<= 4;
-                        if (hex >= '0' && hex <= '9') {
-                            code += static_cast<unsigned>(hex - '0');
-                        } else if (hex >= 'a' && hex <= 'f') {
-                            code += static_cast<unsigned>(hex - 'a' + 10);
-                        } else if (hex >= 'A' && hex <= 'F') {
-                            code += static_cast<unsigned>(hex - 'A' + 10);
-                        } else {
-                            code = 0;
-                            break;
-                        }
-                    }
-                    if (code <= 0x7F) {
-                        result.push_back(static_cast<char>(code));
-                    } else if (code <= 0x7FF) {
-                        result.push_back(static_cast<char>(0xC0 | ((code >> 6) & 0x1F)));
-                        result.push_back(static_cast<char>(0x80 | (code & 0x3F)));
-                    } else {
-                        result.push_back(static_cast<char>(0xE0 | ((code >> 12) & 0x0F)));
-                        result.push_back(static_cast<char>(0x80 | ((code >> 6) & 0x3F)));
-                        result.push_back(static_cast<char>(0x80 | (code & 0x3F)));
-                    }
-                    break;
-                }
-                default:
-                    result.push_back(esc);
-                    break;
-            }
-        } else if (c == '"') {
-            break;
+
+std::string buildUrl(const std::string &baseUrl, const std::string &apiKey, const std::string &model) {
+    std::string url = baseUrl.empty() ? RequestPolicy::kDefaultBaseUrl : baseUrl;
+    while (!url.empty() && url.back() == '/') {
+        url.pop_back();
+    }
+    url += "/v1beta/models/";
+    url += urlEncode(model);
+    url += ":generateContent?key=";
+    url += urlEncode(apiKey);
+    return url;
+}
+
+bool isRetryableStatus(long httpStatus) {
+    return httpStatus == 408 || httpStatus == 429 || httpStatus >= 500;
+}
+
+bool isRetryableCode(CURLcode code) {
+    switch (code) {
+        case CURLE_COULDNT_RESOLVE_HOST:
+        case CURLE_COULDNT_CONNECT:
+        case CURLE_OPERATION_TIMEDOUT:
+        case CURLE_SEND_ERROR:
+        case CURLE_RECV_ERROR:
+        case CURLE_GOT_NOTHING:
+        case CURLE_PARTIAL_FILE:
+        case CURLE_HTTP2:
+        case CURLE_HTTP2_STREAM:
+            return true;
+        default:
+            return false;
+    }
+}
+
+/**
+ * Latencies of this process's recent successful attempts, for hedging at p95.
+ */
+class LatencyWindow {
+public:
+    void record(long milliseconds) {
+        if (samples_.size() < kCapacity) {
+            samples_.push_back(milliseconds);
         } else {
-            result.push_back(c);
+            samples_[next_] = milliseconds;
+        }
+        next_ = (next_ + 1) % kCapacity;
+    }
+
+    /**
+     * @return the p95 latency, or 0 until enough calls were seen.
+     */
+    long p95() const {
+        if (samples_.size() < kMinimumSamples) {
+            return 0;
         }
+        std::vector<long> sorted = samples_;
+        auto rank = sorted.begin() + static_cast<long>(sorted.size() * 95 / 100);
+        std::nth_element(sorted.begin(), rank, sorted.end());
+        return *rank;
     }
-    return result;
+
+private:
+    static constexpr std::size_t kCapacity = 64;
+    static constexpr std::size_t kMinimumSamples = 16;
+
+    std::vector<long> samples_;
+    std::size_t next_ = 0;
+};
+
+LatencyWindow &latencies() {
+    static LatencyWindow window;
+    return window;
 }
 
+long backoffDelayMs(const RequestPolicy &policy, int attempt, long retryAfterMs) {
+    static std::mt19937 generator{std::random_device{}()};
+    long ceiling = policy.backoffMs;
+    for (int i = 0; i < attempt && ceiling < policy.backoffMaxMs; ++i) {
+        ceiling *= 2;
+    }
+    ceiling = std::min(ceiling, policy.backoffMaxMs);
+    long delay = std::uniform_int_distribution<long>(0, std::max(ceiling, 0L))(generator);
+    return std::max(delay, std::min(retryAfterMs, policy.backoffMaxMs));
+}
+
+long elapsedMs(Exchange::Clock::time_point since, Exchange::Clock::time_point now) {
+    return static_cast<long>(std::chrono::duration_cast<std::chrono::milliseconds>(now - since).count());
+}
+
+/**
+ * Everything a transfer points at, which therefore has to outlive it.
+ */
+struct Transfer {
+    std::string url;
+    struct curl_slist *headers = nullptr;
+    ResponseSink sink;
+
+    Transfer(const std::string &baseUrl, const std::string &apiKey, const std::string &model)
+        : url(buildUrl(baseUrl, apiKey, model)) {
+        headers = curl_slist_append(headers, "Content-Type: application/json");
+    }
+
+    ~Transfer() {
+        if (headers) {
+            curl_slist_free_all(headers);
+        }
+    }
+
+    Transfer(const Transfer &) = delete;
+    Transfer &operator=(const Transfer &) = delete;
+
+    void configure(CURL *curl, const std::string &payload, const RequestPolicy &policy) {
+        curl_easy_setopt(curl, CURLOPT_URL, url.c_str());
+        curl_easy_setopt(curl, CURLOPT_POST, 1L);
+        curl_easy_setopt(curl, CURLOPT_POSTFIELDS, payload.c_str());
+        curl_easy_setopt(curl, CURLOPT_POSTFIELDSIZE, static_cast<long>(payload.size()));
+        curl_easy_setopt(curl, CURLOPT_WRITEFUNCTION, writeToParser);
+        curl_easy_setopt(curl, CURLOPT_WRITEDATA, &sink);
+        curl_easy_setopt(curl, CURLOPT_TCP_KEEPALIVE, 1L);
+        curl_easy_setopt(curl, CURLOPT_HTTPHEADER, headers);
+        curl_easy_setopt(curl, CURLOPT_NOSIGNAL, 1L);
+        curl_easy_setopt(curl, CURLOPT_CONNECTTIMEOUT_MS, policy.connectTimeoutMs);
+        curl_easy_setopt(curl, CURLOPT_TIMEOUT_MS, policy.timeoutMs);
+    }
+
+    json::GeminiResponse collect(CURL *curl, CURLcode code) {
+        if (code != CURLE_OK) {
+            std::ostringstream oss;
+            oss << "CURL request failed: " << curl_easy_strerror(code);
+            throw CallError(oss.str(), isRetryableCode(code));
+        }
+
+        long httpStatus = 0;
+        curl_easy_getinfo(curl, CURLINFO_RESPONSE_CODE, &httpStatus);
+        if (httpStatus < 200 || httpStatus >= 300) {
+            std::ostringstream oss;
+            oss << "Gemini API responded with HTTP status " << httpStatus << ": ";
+            json::GeminiResponse error;
+            if (sink.parseError.empty()) {
+                try {
+                    error = sink.parser.finish();
+                } catch (const std::exception &) {
+                    // Truncated error body; fall back to the raw prefix below.
+                }
+            }
+            if (!error.errorMessage.empty()) {
+                oss << error.errorMessage;
+            } else {
+                oss << sink.parser.rawPrefix();
+            }
+            curl_off_t retryAfter = 0;
+            curl_easy_getinfo(curl, CURLINFO_RETRY_AFTER, &retryAfter);
+            throw CallError(oss.str(), isRetryableStatus(httpStatus), static_cast<long>(retryAfter) * 1000);
+        }
+
+        if (!sink.parseError.empty()) {
+            throw CallError("Unable to parse Gemini response: " + sink.parseError, false);
+        }
+        try {
+            return sink.parser.finish();
+        } catch (const std::exception &ex) {
+            throw CallError(ex.what(), false);
+        }
+    }
+};
+
 }  // namespace
 
-std::string callGemini(const std::string &apiKey,
-                       const std::string &model,
-                       const std::string &payload) {
-    CURL *curl = curl_easy_init();
-    if (!curl) {
+struct Call::Request : Transfer {
+    using Transfer::Transfer;
+};
+
+Call::Call(const std::string &apiKey, const std::string &model, std::string payload, const RequestPolicy &policy)
+    : handle_(curl_easy_init()),
+      payload_(std::move(payload)),
+      request_(std::make_unique<Request>(policy.baseUrl, apiKey, model)) {
+    if (!handle_) {
         throw std::runtime_error("Unable to initialize CURL context.");
     }
+    request_->configure(static_cast<CURL *>(handle_), payload_, policy);
+}
 
-    std::string response;
-    std::string url = "https://generativelanguage.googleapis.com/v1beta/models/";
-    url += urlEncode(model);
-    url += ":generateContent?key=";
-    url += urlEncode(apiKey);
+Call::~Call() {
+    if (handle_) {
+        curl_easy_cleanup(static_cast<CURL *>(handle_));
+    }
+}
 
-    struct CurlHandle {
-        CURL *ptr;
-        explicit CurlHandle(CURL *c) : ptr(c) {}
-        ~CurlHandle() {
-            if (ptr) {
-                curl_easy_cleanup(ptr);
-            }
+json::GeminiResponse Call::result(int curlCode) {
+    return request_->collect(static_cast<CURL *>(handle_), static_cast<CURLcode>(curlCode));
+}
+
+Exchange::Exchange(std::string apiKey, std::string model, std::string payload, const RequestPolicy &policy)
+    : apiKey_(std::move(apiKey)), model_(std::move(model)), payload_(std::move(payload)), policy_(policy) {}
+
+Exchange::~Exchange() {
+    cancelActive();
+}
+
+void Exchange::start(void *multi) {
+    multi_ = multi;
+    attemptStarted_ = Clock::now();
+    launch();
+}
+
+json::GeminiResponse Exchange::result() {
+    if (error_) {
+        std::rethrow_exception(error_);
+    }
+    if (!response_) {
+        throw std::logic_error("Gemini exchange has not finished.");
+    }
+    return std::move(*response_);
+}
+
+bool Exchange::owns(void *easy) const {
+    for (const auto &call : active_) {
+        if (call->handle() == easy) {
+            return true;
         }
-    } handle(curl);
+    }
+    return false;
+}
 
-    curl_easy_setopt(curl, CURLOPT_URL, url.c_str());
-    curl_easy_setopt(curl, CURLOPT_POST, 1L);
-    curl_easy_setopt(curl, CURLOPT_POSTFIELDS, payload.c_str());
-    curl_easy_setopt(curl, CURLOPT_POSTFIELDSIZE, payload.size());
-    curl_easy_setopt(curl, CURLOPT_WRITEFUNCTION, writeToString);
-    curl_easy_setopt(curl, CURLOPT_WRITEDATA, &response);
+void Exchange::launch() {
+    auto call = std::make_unique<Call>(apiKey_, model_, payload_, policy_);
+    CURLMcode code = curl_multi_add_handle(static_cast<CURLM *>(multi_), static_cast<CURL *>(call->handle()));
+    if (code != CURLM_OK) {
+        throw std::runtime_error(curl_multi_strerror(code));
+    }
+    active_.push_back(std::move(call));
+}
 
-    struct curl_slist *headers = nullptr;
-    headers = curl_slist_append(headers, "Content-Type: application/json");
-    curl_easy_setopt(curl, CURLOPT_HTTPHEADER, headers);
+void Exchange::cancelActive() {
+    for (const auto &call : active_) {
+        curl_multi_remove_handle(static_cast<CURLM *>(multi_), static_cast<CURL *>(call->handle()));
+    }
+    active_.clear();
+}
 
-    CURLcode code = curl_easy_perform(curl);
-    curl_slist_free_all(headers);
-    if (code != CURLE_OK) {
-        std::ostringstream oss;
-        oss << "CURL request failed: " << curl_easy_strerror(code);
-        throw std::runtime_error(oss.str());
+long Exchange::hedgeDelayMs() const {
+    if (policy_.hedgeAfterMs == RequestPolicy::kHedgeAuto) {
+        return latencies().p95();
     }
+    return policy_.hedgeAfterMs;
+}
+
+void Exchange::finishTransfer(void *easy, int curlCode) {
+    auto it = std::find_if(active_.begin(), active_.end(),
+                           [easy](const std::unique_ptr<Call> &call) { return call->handle() == easy; });
+    std::unique_ptr<Call> call = std::move(*it);
+    active_.erase(it);
+    curl_multi_remove_handle(static_cast<CURLM *>(multi_), static_cast<CURL *>(easy));
 
-    long httpStatus = 0;
-    curl_easy_getinfo(curl, CURLINFO_RESPONSE_CODE, &httpStatus);
-    if (httpStatus < 200 || httpStatus >= 300) {
-        std::ostringstream oss;
-        oss << "Gemini API responded with HTTP status " << httpStatus << ": " << response;
-        throw std::runtime_error(oss.str());
+    try {
+        response_ = call->result(curlCode);
+        latencies().record(elapsedMs(attemptStarted_, Clock::now()));
+        cancelActive();  // The hedged twin lost the race.
+        done_ = true;
+    } catch (const CallError &ex) {
+        if (!active_.empty()) {
+            return;  // The twin of a hedged attempt may still succeed.
+        }
+        if (ex.retryable() && attempt_ < policy_.maxRetries) {
+            retryAt_ = Clock::now() + std::chrono::milliseconds(backoffDelayMs(policy_, attempt_, ex.retryAfterMs()));
+            std::cerr << "Warning: retrying Gemini call after: " << ex.what() << std::endl;
+            return;
+        }
+        error_ = std::current_exception();
+        done_ = true;
     }
+}
 
-    return response;
+long Exchange::tick(Clock::time_point now) {
+    if (done_) {
+        return -1;
+    }
+    try {
+        if (retryAt_) {
+            if (now < *retryAt_) {
+                return static_cast<long>(
+                    std::chrono::duration_cast<std::chrono::milliseconds>(*retryAt_ - now).count()) + 1;
+            }
+            retryAt_.reset();
+            ++attempt_;
+            hedged_ = false;
+            attemptStarted_ = now;
+            launch();
+            return 0;
+        }
+
+        long hedgeAfter = hedgeDelayMs();
+        if (hedged_ || hedgeAfter <= 0 || active_.size() != 1) {
+            return -1;
+        }
+        long elapsed = elapsedMs(attemptStarted_, now);
+        if (elapsed < hedgeAfter) {
+            return hedgeAfter - elapsed;
+        }
+        hedged_ = true;
+        launch();
+        return 0;
+    } catch (const std::exception &) {
+        error_ = std::current_exception();
+        cancelActive();
+        done_ = true;
+        return -1;
+    }
 }
 
-std::string extractTextField(const std::string &response) {
-    const std::string key = "\"text\"";
-    auto pos = response.find(key);
-    if (pos == std::string::npos) {
-        throw std::runtime_error("Gemini response did not contain the expected text field: " + response);
+Multi::Multi() : handle_(curl_multi_init()) {
+    if (!handle_) {
+        throw std::runtime_error("Unable to initialize CURL multi handle.");
     }
+}
+
+Multi::~Multi() {
+    curl_multi_cleanup(static_cast<CURLM *>(handle_));
+}
 
-    pos = response.find(':', pos + key.size());
-    if (pos == std::string::npos) {
-        throw std::runtime_error("Gemini response contained a malformed text field: " + response);
+std::vector<Exchange *> Multi::step(const std::vector<Exchange *> &exchanges) {
+    CURLM *multi = static_cast<CURLM *>(handle_);
+    int running = 0;
+    CURLMcode code = curl_multi_perform(multi, &running);
+    if (code != CURLM_OK) {
+        throw std::runtime_error(curl_multi_strerror(code));
     }
-    ++pos;
-    while (pos < response.size() && std::isspace(static_cast<unsigned char>(response[pos]))) {
-        ++pos;
+
+    std::vector<Exchange *> finished;
+    int queued = 0;
+    while (CURLMsg *message = curl_multi_info_read(multi, &queued)) {
+        if (message->msg != CURLMSG_DONE) {
+            continue;
+        }
+        // The message does not survive removing its handle, so copy it first.
+        CURL *easy = message->easy_handle;
+        CURLcode result = message->data.result;
+        for (Exchange *exchange : exchanges) {
+            if (!exchange->done() && exchange->owns(easy)) {
+                exchange->finishTransfer(easy, result);
+                if (exchange->done()) {
+                    finished.push_back(exchange);
+                }
+                break;
+            }
+        }
     }
-    if (pos >= response.size() || response[pos] != '"') {
-        throw std::runtime_error("Gemini response text field was not a JSON string: " + response);
+
+    long waitMs = kMaxPollMs;
+    auto now = Exchange::Clock::now();
+    for (Exchange *exchange : exchanges) {
+        bool wasDone = exchange->done();
+        long due = exchange->tick(now);
+        if (!wasDone && exchange->done()) {
+            finished.push_back(exchange);
+        }
+        if (due >= 0) {
+            waitMs = std::min(waitMs, due);
+        }
+    }
+    if (!finished.empty()) {
+        return finished;
     }
 
-    return unescapeJsonString(response, pos + 1);
+    long curlTimeout = -1;
+    curl_multi_timeout(multi, &curlTimeout);
+    if (curlTimeout >= 0) {
+        waitMs = std::min(waitMs, curlTimeout);
+    }
+    if (waitMs > 0) {
+        curl_multi_poll(multi, nullptr, 0, static_cast<int>(waitMs), nullptr);
+    }
+    return finished;
+}
+
+json::GeminiResponse callGemini(const std::string &apiKey,
+                                const std::string &model,
+                                const std::string &payload,
+                                const RequestPolicy &policy) {
+    Session session;
+    return callGemini(session, apiKey, model, payload, policy);
+}
+
+json::GeminiResponse callGemini(Session &session,
+                                const std::string &apiKey,
+                                const std::string &model,
+                                const std::string &payload,
+                                const RequestPolicy &policy) {
+    Exchange exchange(apiKey, model, payload, policy);
+    exchange.start(session.multi().handle());
+    while (!exchange.done()) {
+        session.multi().step({&exchange});
+    }
+    return exchange.result();
 }
 
 }  // namespace kievan::gemini
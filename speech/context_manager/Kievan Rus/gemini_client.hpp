@@ -1,22 +1,182 @@
 #pragma once
 
+#include <chrono>
+#include <exception>
+#include <memory>
+#include <optional>
+#include <stdexcept>
 #include <string>
+#include <vector>
+
+#include "json_stream.hpp"
+#include "request_policy.hpp"
 
 namespace kievan::gemini {
 
+/**
+ * @brief A failed Gemini call, flagged with whether trying again could help.
+ */
+class CallError : public std::runtime_error {
+public:
+    CallError(const std::string &message, bool retryable, long retryAfterMs = 0)
+        : std::runtime_error(message), retryable_(retryable), retryAfterMs_(retryAfterMs) {}
+
+    bool retryable() const { return retryable_; }
+
+    /**
+     * @brief Delay the server asked for (Retry-After), or 0.
+     */
+    long retryAfterMs() const { return retryAfterMs_; }
+
+private:
+    bool retryable_;
+    long retryAfterMs_;
+};
+
+/**
+ * @brief One generateContent request prepared on its own easy handle.
+ *
+ * A single attempt: the caller adds handle() to a curl multi handle and, once
+ * the transfer is done, passes the transfer's CURLcode to result().
+ */
+class Call {
+public:
+    Call(const std::string &apiKey, const std::string &model, std::string payload, const RequestPolicy &policy);
+    ~Call();
+
+    Call(const Call &) = delete;
+    Call &operator=(const Call &) = delete;
+
+    void *handle() const { return handle_; }
+
+    /**
+     * @brief Interpret the finished transfer.
+     * @param curlCode the CURLcode the multi handle reported for this transfer.
+     * @throws CallError when the transfer failed, returned a non-success HTTP
+     *         status or the body is not valid JSON.
+     */
+    json::GeminiResponse result(int curlCode);
+
+private:
+    struct Request;
+
+    void *handle_;
+    std::string payload_;
+    std::unique_ptr<Request> request_;
+};
+
+/**
+ * @brief One logical Gemini request: its attempts, retries and hedged duplicates.
+ *
+ * Retryable failures (see RequestPolicy) are retried after an exponential
+ * backoff with full jitter. With hedging enabled, an attempt that has not
+ * answered in time gets a duplicate and the first success wins; the other
+ * transfer is cancelled. Exchanges are driven by a Multi.
+ */
+class Exchange {
+public:
+    using Clock = std::chrono::steady_clock;
+
+    Exchange(std::string apiKey, std::string model, std::string payload, const RequestPolicy &policy);
+    ~Exchange();
+
+    Exchange(const Exchange &) = delete;
+    Exchange &operator=(const Exchange &) = delete;
+
+    /**
+     * @brief Start the first attempt on @p multi (a CURLM handle).
+     */
+    void start(void *multi);
+
+    bool done() const { return done_; }
+
+    /**
+     * @brief The response of a finished exchange.
+     * @throws CallError (or std::runtime_error) with the last attempt's failure.
+     */
+    json::GeminiResponse result();
+
+private:
+    friend class Multi;
+
+    bool owns(void *easy) const;
+    void finishTransfer(void *easy, int curlCode);
+    long tick(Clock::time_point now);
+    void launch();
+    void cancelActive();
+    long hedgeDelayMs() const;
+
+    std::string apiKey_;
+    std::string model_;
+    std::string payload_;
+    RequestPolicy policy_;
+    void *multi_ = nullptr;
+    std::vector<std::unique_ptr<Call>> active_;
+    int attempt_ = 0;
+    bool hedged_ = false;
+    bool done_ = false;
+    Clock::time_point attemptStarted_;
+    std::optional<Clock::time_point> retryAt_;
+    std::optional<json::GeminiResponse> response_;
+    std::exception_ptr error_;
+};
+
+/**
+ * @brief Owns a curl multi handle and drives the exchanges running on it.
+ *
+ * Connections stay in the multi handle's cache, so consecutive and concurrent
+ * requests to the same host share them.
+ */
+class Multi {
+public:
+    Multi();
+    ~Multi();
+
+    Multi(const Multi &) = delete;
+    Multi &operator=(const Multi &) = delete;
+
+    void *handle() const { return handle_; }
+
+    /**
+     * @brief Move transfers forward once, waiting briefly for network activity
+     *        or the next retry/hedge timer when nothing finished.
+     * @return the exchanges among @p exchanges that finished during this step.
+     */
+    std::vector<Exchange *> step(const std::vector<Exchange *> &exchanges);
+
+private:
+    void *handle_;
+};
+
+/**
+ * @brief Long-lived connection state so consecutive requests reuse keep-alive connections.
+ */
+class Session {
+public:
+    Multi &multi() { return multi_; }
+
+private:
+    Multi multi_;
+};
+
 /**
  * @brief Execute a POST request to the Gemini API with the provided payload.
- * @throws std::runtime_error when the request fails or returns a non-success HTTP status.
+ * @return Candidate texts and usage metadata, parsed while the body streams in.
+ * @throws CallError when the request still fails after the policy's retries.
  */
-std::string callGemini(const std::string &apiKey,
-                       const std::string &model,
-                       const std::string &payload);
+json::GeminiResponse callGemini(const std::string &apiKey,
+                                const std::string &model,
+                                const std::string &payload,
+                                const RequestPolicy &policy = {});
 
 /**
- * @brief Extract the text field from the Gemini JSON response.
- * @throws std::runtime_error when the response format is unexpected.
+ * @brief Execute a POST request on an existing session, reusing its open connections.
+ * @throws CallError when the request still fails after the policy's retries.
  */
-std::string extractTextField(const std::string &response);
+json::GeminiResponse callGemini(Session &session,
+                                const std::string &apiKey,
+                                const std::string &model,
+                                const std::string &payload,
+                                const RequestPolicy &policy = {});
 
 }  // namespace kievan::gemini
-
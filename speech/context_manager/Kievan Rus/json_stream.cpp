@@ -0,0 +1,384 @@
+#include "json_stream.hpp"
+
+#include <algorithm>
+#include <cstdlib>
+#include <stdexcept>
+#include <string>
+#include <utility>
+
+namespace kievan::json {
+
+namespace {
+
+constexpr std::size_t kRawPrefixLimit = 2048;
+constexpr unsigned int kReplacementCharacter = 0xFFFD;
+
+const char *const kTextPath[] = {"candidates", nullptr, "content", "parts", nullptr, "text"};
+const char *const kErrorPath[] = {"error", "message"};
+
+bool isWhitespace(char c) {
+    return c == ' ' || c == '\n' || c == '\r' || c == '\t';
+}
+
+bool isScalarChar(char c) {
+    return (c >= '0' && c <= '9') || (c >= 'a' && c <= 'z') || (c >= 'A' && c <= 'Z') ||
+           c == '-' || c == '+' || c == '.';
+}
+
+int hexValue(char c) {
+    if (c >= '0' && c <= '9') {
+        return c - '0';
+    }
+    if (c >= 'a' && c <= 'f') {
+        return c - 'a' + 10;
+    }
+    if (c >= 'A' && c <= 'F') {
+        return c - 'A' + 10;
+    }
+    return -1;
+}
+
+void addCount(long &total, long value) {
+    if (value >= 0) {
+        total = std::max(total, 0L) + value;
+    }
+}
+
+}  // namespace
+
+Usage &Usage::operator+=(const Usage &other) {
+    addCount(promptTokens, other.promptTokens);
+    addCount(candidatesTokens, other.candidatesTokens);
+    addCount(totalTokens, other.totalTokens);
+    addCount(thoughtsTokens, other.thoughtsTokens);
+    return *this;
+}
+
+const std::string &GeminiResponse::text() const {
+    for (const std::string &candidate : candidates) {
+        if (!candidate.empty()) {
+            return candidate;
+        }
+    }
+    throw std::runtime_error("Gemini response did not contain any candidate text.");
+}
+
+ResponseParser::ResponseParser() {
+    stack_.reserve(8);
+}
+
+bool ResponseParser::pathIs(std::size_t depth, const char *const *keys) const {
+    if (stack_.size() != depth) {
+        return false;
+    }
+    for (std::size_t i = 0; i < depth; ++i) {
+        const Frame &frame = stack_[i];
+        if (keys[i] == nullptr) {
+            if (frame.isObject) {
+                return false;
+            }
+        } else if (!frame.isObject || frame.key != keys[i]) {
+            return false;
+        }
+    }
+    return true;
+}
+
+ResponseParser::Capture ResponseParser::classifyString() const {
+    if (pathIs(6, kTextPath)) {
+        return Capture::Text;
+    }
+    if (pathIs(2, kErrorPath)) {
+        return Capture::Error;
+    }
+    return Capture::None;
+}
+
+long *ResponseParser::usageField() {
+    if (stack_.size() != 2 || !stack_[0].isObject || stack_[0].key != "usageMetadata" || !stack_[1].isObject) {
+        return nullptr;
+    }
+    const std::string &name = stack_[1].key;
+    Usage &usage = response_.usage;
+    if (name == "promptTokenCount") {
+        return &usage.promptTokens;
+    }
+    if (name == "candidatesTokenCount") {
+        return &usage.candidatesTokens;
+    }
+    if (name == "totalTokenCount") {
+        return &usage.totalTokens;
+    }
+    if (name == "thoughtsTokenCount") {
+        return &usage.thoughtsTokens;
+    }
+    return nullptr;
+}
+
+void ResponseParser::startString(Capture capture) {
+    capture_ = capture;
+    switch (capture) {
+        case Capture::Key:
+            key_.clear();
+            target_ = &key_;
+            break;
+        case Capture::Text: {
+            auto candidate = static_cast<std::size_t>(stack_[1].index);
+            if (response_.candidates.size() <= candidate) {
+                response_.candidates.resize(candidate + 1);
+            }
+            target_ = &response_.candidates[candidate];
+            break;
+        }
+        case Capture::Error:
+            response_.errorMessage.clear();
+            target_ = &response_.errorMessage;
+            break;
+        default:
+            target_ = nullptr;
+            break;
+    }
+    state_ = State::String;
+}
+
+void ResponseParser::startValue(char c) {
+    switch (c) {
+        case '{':
+            stack_.push_back(Frame{true, {}, 0});
+            state_ = State::KeyOrObjectEnd;
+            break;
+        case '[':
+            stack_.push_back(Frame{false, {}, 0});
+            state_ = State::ValueOrArrayEnd;
+            break;
+        case '"':
+            startString(classifyString());
+            break;
+        default:
+            if (c != '-' && !(c >= '0' && c <= '9') && c != 't' && c != 'f' && c != 'n') {
+                throw std::runtime_error(std::string("Unexpected character in Gemini response: ") + c);
+            }
+            scalar_.assign(1, c);
+            state_ = State::Scalar;
+            break;
+    }
+}
+
+void ResponseParser::endValue() {
+    state_ = stack_.empty() ? State::Done : State::CommaOrEnd;
+}
+
+void ResponseParser::endScalar() {
+    if (long *field = usageField()) {
+        *field = std::strtol(scalar_.c_str(), nullptr, 10);
+    }
+    scalar_.clear();
+    endValue();
+}
+
+void ResponseParser::flushSurrogate() {
+    if (highSurrogate_ != 0) {
+        // A high surrogate not followed by a low one is not valid UTF-16.
+        highSurrogate_ = 0;
+        appendCodePoint(kReplacementCharacter);
+    }
+}
+
+void ResponseParser::appendCaptured(const char *data, std::size_t size) {
+    flushSurrogate();
+    if (target_ != nullptr) {
+        target_->append(data, size);
+    }
+}
+
+void ResponseParser::appendCodePoint(unsigned int codePoint) {
+    if (target_ == nullptr) {
+        return;
+    }
+    std::string &out = *target_;
+    if (codePoint <= 0x7F) {
+        out.push_back(static_cast<char>(codePoint));
+    } else if (codePoint <= 0x7FF) {
+        out.push_back(static_cast<char>(0xC0 | (codePoint >> 6)));
+        out.push_back(static_cast<char>(0x80 | (codePoint & 0x3F)));
+    } else if (codePoint <= 0xFFFF) {
+        out.push_back(static_cast<char>(0xE0 | (codePoint >> 12)));
+        out.push_back(static_cast<char>(0x80 | ((codePoint >> 6) & 0x3F)));
+        out.push_back(static_cast<char>(0x80 | (codePoint & 0x3F)));
+    } else {
+        out.push_back(static_cast<char>(0xF0 | (codePoint >> 18)));
+        out.push_back(static_cast<char>(0x80 | ((codePoint >> 12) & 0x3F)));
+        out.push_back(static_cast<char>(0x80 | ((codePoint >> 6) & 0x3F)));
+        out.push_back(static_cast<char>(0x80 | (codePoint & 0x3F)));
+    }
+}
+
+void ResponseParser::feed(const char *data, std::size_t size) {
+    if (rawPrefix_.size() < kRawPrefixLimit) {
+        rawPrefix_.append(data, std::min(size, kRawPrefixLimit - rawPrefix_.size()));
+    }
+
+    std::size_t i = 0;
+    while (i < size) {
+        char c = data[i];
+        switch (state_) {
+            case State::String: {
+                // Copy unescaped runs in one append instead of byte by byte.
+                std::size_t start = i;
+                while (i < size && data[i] != '"' && data[i] != '\\') {
+                    ++i;
+                }
+                if (i > start) {
+                    appendCaptured(data + start, i - start);
+                }
+                if (i == size) {
+                    return;
+                }
+                if (data[i++] == '\\') {
+                    state_ = State::Escape;
+                    break;
+                }
+                flushSurrogate();
+                if (capture_ == Capture::Key) {
+                    stack_.back().key = key_;
+                    state_ = State::Colon;
+                } else {
+                    endValue();
+                }
+                target_ = nullptr;
+                break;
+            }
+            case State::Escape: {
+                ++i;
+                char decoded;
+                switch (c) {
+                    case 'u':
+                        unicode_ = 0;
+                        unicodeDigits_ = 0;
+                        state_ = State::Unicode;
+                        continue;
+                    case 'b': decoded = '\b'; break;
+                    case 'f': decoded = '\f'; break;
+                    case 'n': decoded = '\n'; break;
+                    case 'r': decoded = '\r'; break;
+                    case 't': decoded = '\t'; break;
+                    default: decoded = c; break;
+                }
+                appendCaptured(&decoded, 1);
+                state_ = State::String;
+                break;
+            }
+            case State::Unicode: {
+                ++i;
+                int digit = hexValue(c);
+                if (digit < 0) {
+                    throw std::runtime_error("Malformed \\u escape in Gemini response.");
+                }
+                unicode_ = (unicode_ << 4) | static_cast<unsigned int>(digit);
+                if (++unicodeDigits_ < 4) {
+                    break;
+                }
+                state_ = State::String;
+                if (unicode_ >= 0xD800 && unicode_ <= 0xDBFF) {
+                    flushSurrogate();
+                    highSurrogate_ = unicode_;
+                } else if (unicode_ >= 0xDC00 && unicode_ <= 0xDFFF) {
+                    if (highSurrogate_ != 0) {
+                        unsigned int codePoint = 0x10000 + ((highSurrogate_ - 0xD800) << 10) + (unicode_ - 0xDC00);
+                        highSurrogate_ = 0;
+                        appendCodePoint(codePoint);
+                    } else {
+                        appendCodePoint(kReplacementCharacter);
+                    }
+                } else {
+                    flushSurrogate();
+                    appendCodePoint(unicode_);
+                }
+                break;
+            }
+            case State::Scalar:
+                if (isScalarChar(c)) {
+                    scalar_.push_back(c);
+                    ++i;
+                } else {
+                    endScalar();  // The delimiter is handled on the next pass.
+                }
+                break;
+            default:
+                ++i;
+                if (isWhitespace(c)) {
+                    break;
+                }
+                switch (state_) {
+                    case State::Value:
+                        startValue(c);
+                        break;
+                    case State::ValueOrArrayEnd:
+                        if (c == ']') {
+                            stack_.pop_back();
+                            endValue();
+                        } else {
+                            startValue(c);
+                        }
+                        break;
+                    case State::KeyOrObjectEnd:
+                        if (c == '}') {
+                            stack_.pop_back();
+                            endValue();
+                            break;
+                        }
+                        [[fallthrough]];
+                    case State::Key:
+                        if (c != '"') {
+                            throw std::runtime_error("Expected an object key in Gemini response.");
+                        }
+                        startString(Capture::Key);
+                        break;
+                    case State::Colon:
+                        if (c != ':') {
+                            throw std::runtime_error("Expected ':' in Gemini response.");
+                        }
+                        state_ = State::Value;
+                        break;
+                    case State::CommaOrEnd: {
+                        Frame &frame = stack_.back();
+                        if (c == ',') {
+                            if (frame.isObject) {
+                                state_ = State::Key;
+                            } else {
+                                ++frame.index;
+                                state_ = State::Value;
+                            }
+                        } else if ((c == '}' && frame.isObject) || (c == ']' && !frame.isObject)) {
+                            stack_.pop_back();
+                            endValue();
+                        } else {
+                            throw std::runtime_error(std::string("Unexpected character in Gemini response: ") + c);
+                        }
+                        break;
+                    }
+                    default:
+                        throw std::runtime_error("Unexpected data after the Gemini response document.");
+                }
+                break;
+        }
+    }
+}
+
+GeminiResponse ResponseParser::finish() {
+    if (state_ == State::Scalar && stack_.empty()) {
+        endScalar();
+    }
+    if (state_ != State::Done) {
+        throw std::runtime_error("Gemini response ended before the JSON document was complete.");
+    }
+    return std::move(response_);
+}
+
+GeminiResponse parseResponse(const std::string &body) {
+    ResponseParser parser;
+    parser.feed(body.data(), body.size());
+    return parser.finish();
+}
+
+}  // namespace kievan::json
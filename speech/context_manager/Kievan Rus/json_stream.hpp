@@ -0,0 +1,122 @@
+#pragma once
+
+#include <cstddef>
+#include <string>
+#include <vector>
+
+namespace kievan::json {
+
+/**
+ * @brief Token accounting reported in a Gemini response's usageMetadata (-1 when absent).
+ */
+struct Usage {
+    long promptTokens = -1;
+    long candidatesTokens = -1;
+    long totalTokens = -1;
+    long thoughtsTokens = -1;
+
+    /**
+     * @brief Add another call's counts, treating absent values as zero.
+     */
+    Usage &operator+=(const Usage &other);
+};
+
+/**
+ * @brief Everything the thinker needs from a generateContent response.
+ */
+struct GeminiResponse {
+    std::vector<std::string> candidates;  // Concatenated text parts, one entry per candidate.
+    Usage usage;
+    std::string errorMessage;  // error.message of an API error body, if any.
+
+    /**
+     * @brief Text of the first candidate that produced any.
+     * @throws std::runtime_error when no candidate carried text.
+     */
+    const std::string &text() const;
+};
+
+/**
+ * @brief Incremental JSON parser for generateContent responses.
+ *
+ * Chunks are fed as they arrive from the curl write callback, so the body is
+ * never buffered as a whole: candidate text is unescaped straight from each
+ * chunk into its candidate string (including UTF-16 surrogate pairs in
+ * \\u escapes) and usage counters are read as numbers; everything else is
+ * skipped. Only a short prefix of the raw body is kept for error messages.
+ */
+class ResponseParser {
+public:
+    ResponseParser();
+
+    /**
+     * @brief Consume the next chunk of the body; chunks may split any token.
+     * @throws std::runtime_error on malformed JSON.
+     */
+    void feed(const char *data, std::size_t size);
+
+    /**
+     * @brief Finish parsing and return the extracted fields.
+     * @throws std::runtime_error when the body ended before the top-level value closed.
+     */
+    GeminiResponse finish();
+
+    /**
+     * @brief The first bytes of the raw body, for diagnostics.
+     */
+    const std::string &rawPrefix() const { return rawPrefix_; }
+
+private:
+    enum class State {
+        Value,
+        ValueOrArrayEnd,
+        KeyOrObjectEnd,
+        Key,
+        Colon,
+        CommaOrEnd,
+        String,
+        Escape,
+        Unicode,
+        Scalar,
+        Done,
+    };
+
+    enum class Capture { None, Key, Text, Usage, Error };
+
+    struct Frame {
+        bool isObject;
+        std::string key;  // Current member name (objects only).
+        long index = 0;   // Current element index (arrays only).
+    };
+
+    void startValue(char c);
+    void startString(Capture capture);
+    void endValue();
+    void endScalar();
+    void appendCodePoint(unsigned int codePoint);
+    void flushSurrogate();
+    void appendCaptured(const char *data, std::size_t size);
+    bool pathIs(std::size_t depth, const char *const *keys) const;
+    Capture classifyString() const;
+    long *usageField();
+
+    State state_ = State::Value;
+    Capture capture_ = Capture::None;
+    std::vector<Frame> stack_;
+    std::string key_;
+    std::string scalar_;
+    std::string *target_ = nullptr;
+    unsigned int unicode_ = 0;
+    int unicodeDigits_ = 0;
+    unsigned int highSurrogate_ = 0;
+    std::string rawPrefix_;
+    GeminiResponse response_;
+};
+
+/**
+ * @brief Parse a complete response body in one go.
+ * @throws std::runtime_error on malformed JSON.
+ */
+GeminiResponse parseResponse(const std::string &body);
+
+}  // namespace kievan::json
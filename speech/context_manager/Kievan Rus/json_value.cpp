@@ -0,0 +1,358 @@
+#include "json_value.hpp"
+
+#include <algorithm>
+#include <cctype>
+#include <cmath>
+#include <cstdlib>
+#include <stdexcept>
+#include <string>
+
+namespace kievan::json {
+
+namespace {
+
+constexpr int kMaxDepth = 64;
+
+class Parser {
+public:
+    explicit Parser(const std::string &text) : text_(text) {}
+
+    Value document() {
+        Value value = parseValue(0);
+        skipWhitespace();
+        if (pos_ != text_.size()) {
+            fail("unexpected data after the JSON document");
+        }
+        return value;
+    }
+
+private:
+    [[noreturn]] void fail(const std::string &what) const {
+        throw std::runtime_error("Invalid JSON at offset " + std::to_string(pos_) + ": " + what + ".");
+    }
+
+    void skipWhitespace() {
+        while (pos_ < text_.size() && (text_[pos_] == ' ' || text_[pos_] == '\n' || text_[pos_] == '\r' ||
+                                       text_[pos_] == '\t')) {
+            ++pos_;
+        }
+    }
+
+    char peek() {
+        skipWhitespace();
+        if (pos_ >= text_.size()) {
+            fail("unexpected end of input");
+        }
+        return text_[pos_];
+    }
+
+    void expect(char c) {
+        if (peek() != c) {
+            fail(std::string("expected '") + c + "'");
+        }
+        ++pos_;
+    }
+
+    bool consumeLiteral(const char *literal) {
+        std::size_t length = std::char_traits<char>::length(literal);
+        if (text_.compare(pos_, length, literal) != 0) {
+            return false;
+        }
+        pos_ += length;
+        return true;
+    }
+
+    Value parseValue(int depth) {
+        if (depth > kMaxDepth) {
+            fail("nesting too deep");
+        }
+        Value value;
+        char c = peek();
+        if (c == '{') {
+            value.type = Value::Type::Object;
+            ++pos_;
+            if (peek() == '}') {
+                ++pos_;
+                return value;
+            }
+            while (true) {
+                if (peek() != '"') {
+                    fail("expected an object key");
+                }
+                std::string key = parseString();
+                expect(':');
+                value.members.emplace_back(std::move(key), parseValue(depth + 1));
+                char next = peek();
+                ++pos_;
+                if (next == '}') {
+                    return value;
+                }
+                if (next != ',') {
+                    fail("expected ',' or '}'");
+                }
+            }
+        }
+        if (c == '[') {
+            value.type = Value::Type::Array;
+            ++pos_;
+            if (peek() == ']') {
+                ++pos_;
+                return value;
+            }
+            while (true) {
+                value.items.push_back(parseValue(depth + 1));
+                char next = peek();
+                ++pos_;
+                if (next == ']') {
+                    return value;
+                }
+                if (next != ',') {
+                    fail("expected ',' or ']'");
+                }
+            }
+        }
+        if (c == '"') {
+            value.type = Value::Type::String;
+            value.string = parseString();
+            return value;
+        }
+        if (consumeLiteral("true") || consumeLiteral("false")) {
+            value.type = Value::Type::Boolean;
+            value.boolean = text_[pos_ - 1] == 'e' && text_[pos_ - 2] == 'u';
+            return value;
+        }
+        if (consumeLiteral("null")) {
+            return value;
+        }
+        return parseNumber();
+    }
+
+    Value parseNumber() {
+        std::size_t start = pos_;
+        if (pos_ < text_.size() && text_[pos_] == '-') {
+            ++pos_;
+        }
+        while (pos_ < text_.size()) {
+            char c = text_[pos_];
+            if (std::isdigit(static_cast<unsigned char>(c)) || c == '.' || c == 'e' || c == 'E' || c == '+' ||
+                c == '-') {
+                ++pos_;
+            } else {
+                break;
+            }
+        }
+        std::string literal = text_.substr(start, pos_ - start);
+        char *end = nullptr;
+        Value value;
+        value.type = Value::Type::Number;
+        value.number = std::strtod(literal.c_str(), &end);
+        if (literal.empty() || literal == "-" || end != literal.c_str() + literal.size()) {
+            pos_ = start;
+            fail("expected a value");
+        }
+        return value;
+    }
+
+    unsigned int parseHex4() {
+        if (pos_ + 4 > text_.size()) {
+            fail("truncated \\u escape");
+        }
+        unsigned int code = 0;
+        for (int i = 0; i < 4; ++i) {
+            char c = text_[pos_++];
+            code <<= 4;
+            if (c >= '0' && c <= '9') {
+                code |= static_cast<unsigned int>(c - '0');
+            } else if (c >= 'a' && c <= 'f') {
+                code |= static_cast<unsigned int>(c - 'a' + 10);
+            } else if (c >= 'A' && c <= 'F') {
+                code |= static_cast<unsigned int>(c - 'A' + 10);
+            } else {
+                fail("malformed \\u escape");
+            }
+        }
+        return code;
+    }
+
+    static void appendUtf8(std::string &out, unsigned int codePoint) {
+        if (codePoint <= 0x7F) {
+            out.push_back(static_cast<char>(codePoint));
+        } else if (codePoint <= 0x7FF) {
+            out.push_back(static_cast<char>(0xC0 | (codePoint >> 6)));
+            out.push_back(static_cast<char>(0x80 | (codePoint & 0x3F)));
+        } else if (codePoint <= 0xFFFF) {
+            out.push_back(static_cast<char>(0xE0 | (codePoint >> 12)));
+            out.push_back(static_cast<char>(0x80 | ((codePoint >> 6) & 0x3F)));
+            out.push_back(static_cast<char>(0x80 | (codePoint & 0x3F)));
+        } else {
+            out.push_back(static_cast<char>(0xF0 | (codePoint >> 18)));
+            out.push_back(static_cast<char>(0x80 | ((codePoint >> 12) & 0x3F)));
+            out.push_back(static_cast<char>(0x80 | ((codePoint >> 6) & 0x3F)));
+            out.push_back(static_cast<char>(0x80 | (codePoint & 0x3F)));
+        }
+    }
+
+    std::string parseString() {
+        ++pos_;  // Opening quote.
+        std::string out;
+        while (true) {
+            if (pos_ >= text_.size()) {
+                fail("unterminated string");
+            }
+            char c = text_[pos_++];
+            if (c == '"') {
+                return out;
+            }
+            if (c != '\\') {
+                out.push_back(c);
+                continue;
+            }
+            if (pos_ >= text_.size()) {
+                fail("unterminated escape");
+            }
+            char escape = text_[pos_++];
+            switch (escape) {
+                case 'b': out.push_back('\b'); break;
+                case 'f': out.push_back('\f'); break;
+                case 'n': out.push_back('\n'); break;
+                case 'r': out.push_back('\r'); break;
+                case 't': out.push_back('\t'); break;
+                case 'u': {
+                    unsigned int code = parseHex4();
+                    if (code >= 0xD800 && code <= 0xDBFF && text_.compare(pos_, 2, "\\u") == 0) {
+                        std::size_t mark = pos_;
+                        pos_ += 2;
+                        unsigned int low = parseHex4();
+                        if (low >= 0xDC00 && low <= 0xDFFF) {
+                            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00);
+                        } else {
+                            pos_ = mark;  // Not a pair; decode the next escape on its own.
+                        }
+                    }
+                    if (code >= 0xD800 && code <= 0xDFFF) {
+                        code = 0xFFFD;
+                    }
+                    appendUtf8(out, code);
+                    break;
+                }
+                default: out.push_back(escape); break;
+            }
+        }
+    }
+
+    const std::string &text_;
+    std::size_t pos_ = 0;
+};
+
+std::string lower(std::string text) {
+    std::transform(text.begin(), text.end(), text.begin(),
+                   [](unsigned char c) { return static_cast<char>(std::tolower(c)); });
+    return text;
+}
+
+const char *typeName(Value::Type type) {
+    switch (type) {
+        case Value::Type::Null: return "null";
+        case Value::Type::Boolean: return "boolean";
+        case Value::Type::Number: return "number";
+        case Value::Type::String: return "string";
+        case Value::Type::Array: return "array";
+        case Value::Type::Object: return "object";
+    }
+    return "value";
+}
+
+bool matchesType(const Value &document, const std::string &expected) {
+    if (expected == "string") {
+        return document.type == Value::Type::String;
+    }
+    if (expected == "number") {
+        return document.type == Value::Type::Number;
+    }
+    if (expected == "integer") {
+        return document.type == Value::Type::Number && std::floor(document.number) == document.number;
+    }
+    if (expected == "boolean") {
+        return document.type == Value::Type::Boolean;
+    }
+    if (expected == "array") {
+        return document.type == Value::Type::Array;
+    }
+    if (expected == "object") {
+        return document.type == Value::Type::Object;
+    }
+    return true;  // Unknown type keyword: nothing to check.
+}
+
+}  // namespace
+
+const Value *Value::find(const std::string &key) const {
+    for (const auto &member : members) {
+        if (member.first == key) {
+            return &member.second;
+        }
+    }
+    return nullptr;
+}
+
+Value parse(const std::string &text) {
+    return Parser(text).document();
+}
+
+std::string schemaViolation(const Value &document, const Value &schema, const std::string &path) {
+    if (document.type == Value::Type::Null) {
+        const Value *nullable = schema.find("nullable");
+        if (nullable != nullptr && nullable->boolean) {
+            return "";
+        }
+    }
+
+    if (const Value *type = schema.find("type"); type != nullptr && type->type == Value::Type::String) {
+        std::string expected = lower(type->string);
+        if (!matchesType(document, expected)) {
+            return path + " must be " + expected + ", got " + typeName(document.type);
+        }
+    }
+
+    if (const Value *options = schema.find("enum"); options != nullptr && document.type == Value::Type::String) {
+        bool allowed = std::any_of(options->items.begin(), options->items.end(),
+                                   [&document](const Value &option) { return option.string == document.string; });
+        if (!allowed) {
+            return path + " must be one of the schema's enum values, got \"" + document.string + "\"";
+        }
+    }
+
+    if (document.type == Value::Type::Object) {
+        if (const Value *required = schema.find("required")) {
+            for (const Value &name : required->items) {
+                if (document.find(name.string) == nullptr) {
+                    return path + " is missing required field \"" + name.string + "\"";
+                }
+            }
+        }
+        if (const Value *properties = schema.find("properties")) {
+            for (const auto &property : properties->members) {
+                if (const Value *member = document.find(property.first)) {
+                    std::string problem = schemaViolation(*member, property.second, path + "." + property.first);
+                    if (!problem.empty()) {
+                        return problem;
+                    }
+                }
+            }
+        }
+    }
+
+    if (document.type == Value::Type::Array) {
+        if (const Value *items = schema.find("items")) {
+            for (std::size_t i = 0; i < document.items.size(); ++i) {
+                std::string problem = schemaViolation(document.items[i], *items, path + "[" + std::to_string(i) + "]");
+                if (!problem.empty()) {
+                    return problem;
+                }
+            }
+        }
+    }
+    return "";
+}
+
+}  // namespace kievan::json
@@ -0,0 +1,45 @@
+#pragma once
+
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace kievan::json {
+
+/**
+ * @brief A parsed JSON document, small enough for model output and schemas.
+ */
+struct Value {
+    enum class Type { Null, Boolean, Number, String, Array, Object };
+
+    Type type = Type::Null;
+    bool boolean = false;
+    double number = 0.0;
+    std::string string;
+    std::vector<Value> items;
+    std::vector<std::pair<std::string, Value>> members;
+
+    /**
+     * @brief Member named @p key of an object, or nullptr.
+     */
+    const Value *find(const std::string &key) const;
+};
+
+/**
+ * @brief Parse a complete JSON document.
+ * @throws std::runtime_error on malformed JSON or trailing data.
+ */
+Value parse(const std::string &text);
+
+/**
+ * @brief Check @p document against a Gemini responseSchema (an OpenAPI schema subset).
+ *
+ * Checks types (case-insensitive; INTEGER also accepts whole numbers written
+ * as floats), "nullable", "enum", "required", object "properties" and array
+ * "items". Unknown keywords are ignored.
+ *
+ * @return a description of the first mismatch, or an empty string when it conforms.
+ */
+std::string schemaViolation(const Value &document, const Value &schema, const std::string &path = "$");
+
+}  // namespace kievan::json
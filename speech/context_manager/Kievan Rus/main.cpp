@@ -1,9 +1,11 @@
 #include "arguments.hpp"
+#include "batch.hpp"
 #include "binary_payload.hpp"
 #include "curl_guard.hpp"
 #include "environment.hpp"
 #include "gemini_client.hpp"
-#include "prompts.hpp"
+#include "server.hpp"
+#include "thinker.hpp"
 
 #include <exception>
 #include <iostream>
@@ -14,23 +16,30 @@ int main(int argc, char *argv[]) {
     std::string outputPath;
     try {
         kievan::Arguments args = kievan::parseArguments(argc, argv);
+        if (args.serve) {
+            return kievan::server::runServer(args);
+        }
+        if (args.batch) {
+            return kievan::batch::runBatch(args);
+        }
         outputPath = args.outputPath;
 
         kievan::curl::GlobalGuard curlGuard;
 
         std::string apiKey = kievan::config::loadApiKey(args.envPath);
 
-        std::string analysisPrompt = kievan::prompts::buildAnalysisPrompt(args);
-        std::string analysisPayload = kievan::prompts::buildAnalysisPayload(analysisPrompt);
-        std::string analysisResponse = kievan::gemini::callGemini(apiKey, args.model, analysisPayload);
-        std::string contextJson = kievan::gemini::extractTextField(analysisResponse);
-
-        std::string summaryPrompt = kievan::prompts::buildSummaryPrompt(contextJson);
-        std::string summaryPayload = kievan::prompts::buildSummaryPayload(summaryPrompt);
-        std::string summaryResponse = kievan::gemini::callGemini(apiKey, args.model, summaryPayload);
-        std::string summaryText = kievan::gemini::extractTextField(summaryResponse);
+        kievan::gemini::Session session;
+        kievan::AnalysisCallback onAnalysis;
+        if (args.outputPath == "-") {
+            // Partial payloads only make sense on a stream the caller reads as it arrives.
+            onAnalysis = [](const std::string &contextJson) {
+                kievan::io::writePartialPayload(std::cout, contextJson);
+            };
+        }
+        kievan::Thought thought = kievan::think(session, apiKey, args, onAnalysis);
 
-        kievan::io::writeBinaryPayload(args.outputPath, true, contextJson, summaryText);
+        kievan::io::writeBinaryPayload(args.outputPath, true, thought.contextJson, thought.summary,
+                                       kievan::thoughtMetadata(thought));
         return 0;
     } catch (const std::exception &ex) {
         try {
@@ -46,4 +55,3 @@ int main(int argc, char *argv[]) {
         return 1;
     }
 }
-
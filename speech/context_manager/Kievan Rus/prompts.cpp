@@ -40,13 +40,19 @@ std::string buildAnalysisPrompt(const Arguments &args) {
         << "  \"potential_score\": number,\n"
         << "  \"date_of_request\": string (ISO 8601),\n"
         << "  \"is_done_thinking\": boolean,\n"
-        << "  \"regrets_choice\": boolean\n"
-        << "}\n"
+        << "  \"regrets_choice\": boolean" << (args.summaryMode == "inline" ? ",\n" : "\n");
+    if (args.summaryMode == "inline") {
+        oss << "  \"thought_summary\": string\n";
+    }
+    oss << "}\n"
         << "\"possible_setbacks\" must concisely list the primary risks, trade-offs, or downsides of the plan.\n"
         << "\"probability_of_success\" must be a float between 0.0 and 1.0 describing the likelihood this branch succeeds.\n"
         << "\"potential_score\" must be a float increment (positive or negative) to add to the cumulative potential score for the overall search.\n"
-        << "Ensure at least two distinct branch possibilities are explored across the wider reasoning process.\n"
-        << "Use the following context for iteration " << args.iteration << ":\n";
+        << "Ensure at least two distinct branch possibilities are explored across the wider reasoning process.\n";
+    if (args.summaryMode == "inline") {
+        oss << "\"thought_summary\" must summarize this thought process and its decisions concisely, in first person.\n";
+    }
+    oss << "Use the following context for iteration " << args.iteration << ":\n";
 
     if (!args.summarizedThought.empty()) {
         oss << "[LAST THOUGHT]\n" << args.summarizedThought << "\n";
@@ -64,7 +70,7 @@ std::string buildAnalysisPrompt(const Arguments &args) {
     return oss.str();
 }
 
-std::string buildAnalysisPayload(const std::string &prompt) {
+std::string buildAnalysisPayload(const std::string &prompt, const std::string &responseSchema) {
     std::ostringstream oss;
     oss << "{\n"
         << "  \"contents\": [\n"
@@ -81,12 +87,28 @@ std::string buildAnalysisPayload(const std::string &prompt) {
         << "    \"temperature\": 0.2,\n"
         << "    \"topP\": 0.9,\n"
         << "    \"maxOutputTokens\": 1024,\n"
-        << "    \"responseMimeType\": \"application/json\"\n"
+        << "    \"responseMimeType\": \"application/json\"";
+    if (!responseSchema.empty()) {
+        oss << ",\n    \"responseSchema\": " << responseSchema;
+    }
+    oss << "\n"
         << "  }\n"
         << "}";
     return oss.str();
 }
 
+std::string buildRepairPrompt(const std::string &analysisPrompt,
+                              const std::string &rejectedJson,
+                              const std::string &problem) {
+    std::ostringstream oss;
+    oss << analysisPrompt << "\n"
+        << "[REJECTED REPLY]\n" << rejectedJson << "\n"
+        << "[VALIDATION ERROR]\n" << problem << "\n"
+        << "Your previous reply did not match the required JSON schema. "
+        << "Return the corrected JSON object, keeping every valid field as it was.";
+    return oss.str();
+}
+
 std::string buildSummaryPrompt(const std::string &contextJson) {
     std::ostringstream oss;
     oss << "Summarize the thought process and decisions concisely in first person based on this JSON context:\n"
@@ -13,8 +13,19 @@ std::string buildAnalysisPrompt(const Arguments &args);
 
 /**
  * @brief Wrap the analysis prompt inside the JSON payload required by the Gemini API.
+ * @param responseSchema Gemini responseSchema JSON constraining the reply; empty for none.
  */
-std::string buildAnalysisPayload(const std::string &prompt);
+std::string buildAnalysisPayload(const std::string &prompt, const std::string &responseSchema = "");
+
+/**
+ * @brief Re-ask the analysis prompt after a reply that failed schema validation.
+ *
+ * Quotes the rejected reply and the validation error so the model fixes that
+ * field instead of starting over.
+ */
+std::string buildRepairPrompt(const std::string &analysisPrompt,
+                              const std::string &rejectedJson,
+                              const std::string &problem);
 
 /**
  * @brief Build the summarisation prompt used to compress the thought process.
@@ -0,0 +1,28 @@
+#pragma once
+
+#include <string>
+
+namespace kievan {
+
+/**
+ * @brief Endpoint, timeouts, retries and hedging applied to every Gemini call.
+ */
+struct RequestPolicy {
+    // Root of the Gemini REST API; empty uses kDefaultBaseUrl. Pointing it at a
+    // local stand-in (--base-url, GEMINI_BASE_URL) is how benchmarks run offline.
+    std::string baseUrl;
+    long connectTimeoutMs = 10000;
+    long timeoutMs = 60000;  // Per attempt, body included; 0 waits forever.
+    int maxRetries = 2;      // Extra attempts after 429, 5xx, timeouts and connection errors.
+    long backoffMs = 500;    // First retry delay; doubles per retry, with full jitter.
+    long backoffMaxMs = 8000;
+    // Send a duplicate request when an attempt has not answered after this long
+    // and keep whichever finishes first. 0 disables hedging; kHedgeAuto uses the
+    // p95 latency of this process's recent calls.
+    long hedgeAfterMs = 0;
+
+    static constexpr long kHedgeAuto = -1;
+    static constexpr const char *kDefaultBaseUrl = "https://generativelanguage.googleapis.com";
+};
+
+}  // namespace kievan
@@ -0,0 +1,49 @@
+#include "server.hpp"
+
+#include "binary_payload.hpp"
+#include "curl_guard.hpp"
+#include "environment.hpp"
+#include "gemini_client.hpp"
+#include "thinker.hpp"
+
+#include <exception>
+#include <iostream>
+#include <sstream>
+#include <string>
+
+namespace kievan::server {
+
+int runServer(const Arguments &defaults) {
+    curl::GlobalGuard curlGuard;
+    std::string apiKey = config::loadApiKey(defaults.envPath);
+    gemini::Session session;
+
+    std::ios::sync_with_stdio(false);
+    std::cin.tie(nullptr);
+
+    while (true) {
+        Arguments request = defaults;
+        try {
+            if (!io::readRequestFrame(std::cin, request)) {
+                return 0;
+            }
+        } catch (const std::exception &ex) {
+            std::cerr << "Error: " << ex.what() << std::endl;
+            return 1;
+        }
+
+        try {
+            Thought thought = think(session, apiKey, request, [](const std::string &contextJson) {
+                io::writePartialPayload(std::cout, contextJson);
+            });
+            io::writeBinaryPayload(std::cout, true, thought.contextJson, thought.summary, thoughtMetadata(thought));
+        } catch (const std::exception &ex) {
+            std::ostringstream oss;
+            oss << "Thinking process failed: " << ex.what();
+            std::cerr << "Error: " << ex.what() << std::endl;
+            io::writeBinaryPayload(std::cout, false, oss.str(), "");
+        }
+    }
+}
+
+}  // namespace kievan::server
@@ -0,0 +1,19 @@
+#pragma once
+
+#include "arguments.hpp"
+
+namespace kievan::server {
+
+/**
+ * @brief Serve framed thinking requests from stdin until the caller closes the pipe.
+ *
+ * curl global state, the API key and one keep-alive curl handle are set up once
+ * and shared by every request. Each request frame (see io::readRequestFrame) is
+ * answered with one binary payload on stdout; per-request failures are reported
+ * as error payloads and do not stop the server.
+ *
+ * @return process exit code.
+ */
+int runServer(const Arguments &defaults);
+
+}  // namespace kievan::server
@@ -0,0 +1,110 @@
+#include "thinker.hpp"
+
+#include "json_value.hpp"
+#include "prompts.hpp"
+
+#include <chrono>
+#include <exception>
+#include <iomanip>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+
+namespace kievan {
+
+namespace {
+
+json::GeminiResponse timedCall(gemini::Session &session,
+                               const std::string &apiKey,
+                               const Arguments &args,
+                               const std::string &payload,
+                               const char *stage,
+                               Thought &thought) {
+    auto started = std::chrono::steady_clock::now();
+    json::GeminiResponse response = gemini::callGemini(session, apiKey, args.model, payload, args.requestPolicy);
+    thought.calls.push_back({stage, elapsedMs(started)});
+    return response;
+}
+
+}  // namespace
+
+double elapsedMs(std::chrono::steady_clock::time_point started) {
+    return std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - started).count();
+}
+
+Thought think(gemini::Session &session,
+              const std::string &apiKey,
+              const Arguments &args,
+              const AnalysisCallback &onAnalysis) {
+    Thought thought;
+
+    std::string analysisPrompt = prompts::buildAnalysisPrompt(args);
+    std::string analysisPayload = prompts::buildAnalysisPayload(analysisPrompt, args.responseSchema);
+    for (int repairs = 0;; ++repairs) {
+        json::GeminiResponse analysis =
+            timedCall(session, apiKey, args, analysisPayload, repairs == 0 ? "analysis" : "repair", thought);
+        thought.contextJson = analysis.text();
+        thought.usage += analysis.usage;
+
+        std::string problem = analysisProblem(args, thought.contextJson);
+        if (problem.empty()) {
+            break;
+        }
+        if (repairs >= args.schemaRetries) {
+            throw std::runtime_error(schemaFailure(problem));
+        }
+        std::string repairPrompt = prompts::buildRepairPrompt(analysisPrompt, thought.contextJson, problem);
+        analysisPayload = prompts::buildAnalysisPayload(repairPrompt, args.responseSchema);
+    }
+    if (args.summaryMode == "inline") {
+        return thought;
+    }
+    if (args.summaryMode == "pipelined" && onAnalysis) {
+        // The summary prompt embeds the analysis, so the two calls cannot
+        // overlap; publishing the analysis now is what lets the caller move on.
+        onAnalysis(thought.contextJson);
+    }
+
+    std::string summaryPrompt = prompts::buildSummaryPrompt(thought.contextJson);
+    std::string summaryPayload = prompts::buildSummaryPayload(summaryPrompt);
+    json::GeminiResponse summary = timedCall(session, apiKey, args, summaryPayload, "summary", thought);
+    thought.summary = summary.text();
+    thought.usage += summary.usage;
+
+    return thought;
+}
+
+std::string analysisProblem(const Arguments &args, const std::string &contextJson) {
+    if (args.responseSchema.empty()) {
+        return "";
+    }
+    json::Value document;
+    try {
+        document = json::parse(contextJson);
+    } catch (const std::exception &ex) {
+        return ex.what();
+    }
+    return json::schemaViolation(document, json::parse(args.responseSchema));
+}
+
+std::string schemaFailure(const std::string &problem) {
+    return "Analysis did not match the response schema: " + problem;
+}
+
+std::string thoughtMetadata(const Thought &thought) {
+    std::ostringstream oss;
+    oss << "{\"usage\":{"
+        << "\"prompt_tokens\":" << thought.usage.promptTokens << ","
+        << "\"candidates_tokens\":" << thought.usage.candidatesTokens << ","
+        << "\"thoughts_tokens\":" << thought.usage.thoughtsTokens << ","
+        << "\"total_tokens\":" << thought.usage.totalTokens
+        << "},\"calls\":[";
+    oss << std::fixed << std::setprecision(1);
+    for (std::size_t i = 0; i < thought.calls.size(); ++i) {
+        oss << (i ? "," : "") << "{\"stage\":\"" << thought.calls[i].stage << "\",\"ms\":" << thought.calls[i].ms << "}";
+    }
+    oss << "]}";
+    return oss.str();
+}
+
+}  // namespace kievan
@@ -0,0 +1,77 @@
+#pragma once
+
+#include <chrono>
+#include <functional>
+#include <string>
+#include <vector>
+
+#include "arguments.hpp"
+#include "gemini_client.hpp"
+
+namespace kievan {
+
+/**
+ * @brief Wall time of one Gemini call, its retries and hedged duplicates included.
+ */
+struct CallTiming {
+    std::string stage;  // "analysis", "repair" or "summary".
+    double ms = 0.0;
+};
+
+/**
+ * @brief Structured context and narrative summary produced for one thought node.
+ */
+struct Thought {
+    std::string contextJson;
+    std::string summary;
+    json::Usage usage;  // Summed over the node's Gemini calls.
+    std::vector<CallTiming> calls;
+};
+
+/**
+ * @brief Called with the analysis JSON before the summary call starts (pipelined mode).
+ */
+using AnalysisCallback = std::function<void(const std::string &contextJson)>;
+
+/**
+ * @brief Run the Gemini calls for a single thought node.
+ *
+ * "separate" and "pipelined" modes make an analysis call and then a summary
+ * call; "pipelined" reports the analysis through @p onAnalysis in between.
+ * "inline" makes a single call whose JSON carries the summary as
+ * "thought_summary", leaving Thought::summary empty for the caller to fill.
+ *
+ * With Arguments::responseSchema set, an analysis reply that does not match
+ * the schema is re-asked (see prompts::buildRepairPrompt) up to
+ * Arguments::schemaRetries times before the node fails.
+ *
+ * @throws std::runtime_error when a Gemini call fails or the analysis never
+ *         matches the schema.
+ */
+Thought think(gemini::Session &session,
+              const std::string &apiKey,
+              const Arguments &args,
+              const AnalysisCallback &onAnalysis = {});
+
+/**
+ * @brief Milliseconds since @p started, for CallTiming.
+ */
+double elapsedMs(std::chrono::steady_clock::time_point started);
+
+/**
+ * @brief Why @p contextJson does not match args.responseSchema.
+ * @return the validation error, or an empty string when it matches or no schema is set.
+ */
+std::string analysisProblem(const Arguments &args, const std::string &contextJson);
+
+/**
+ * @brief Error raised once a node's analysis still fails validation after its retries.
+ */
+std::string schemaFailure(const std::string &problem);
+
+/**
+ * @brief Serialise the node's metadata (token usage, call timings) for the payload trailer.
+ */
+std::string thoughtMetadata(const Thought &thought);
+
+}  // namespace kievan
@@ -1,21 +1,44 @@
+import asyncio
+import atexit
 import datetime
 import json
 import os
+import queue
 import struct
 import subprocess
-import tempfile
-import uuid
+import threading
 import textwrap
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional, Tuple
-import matplotlib
+from typing import Any, AsyncIterator, BinaryIO, Callable, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
 
-from pydantic import BaseModel, Field
+from asgiref.sync import sync_to_async
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
-from plotting.graphing import ThoughtNode, render_thought_graph
+from plotting import render_queue
+from providentia_network import telemetry
+from plotting.graph_store import get_graph_store, graph_key
+from plotting.graphing import ThoughtNode
+
+from .engine import AsyncNodeExecutor, Node, NodeExecutor, TreeEngine, to_float
+from .limits import Interrupt, ThinkingLimits
+from .response_schema import gemini_response_schema
+from .search import SearchStrategy
+from .thinker_cache import cache_key, get_thinker_cache, request_hash
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
 
 
 class ContextStruct(BaseModel):
+    # Build the validator on first use rather than when Django loads the URLs.
+    model_config = ConfigDict(defer_build=True)
+
     user_enquiry: str = Field(
         description="The raw, unaltered text query received from the user."
     )
@@ -62,6 +85,14 @@ class ThinkingProcessError(RuntimeError):
     """Raised when the C++ thinking process reports an error or fails."""
 
 
+class ThinkingCancelled(ThinkingProcessError):
+    """Raised when a thinker run is stopped because its tree hit a limit."""
+
+
+class ThinkingOutputError(ThinkingProcessError):
+    """Raised when the thinker's output is not a valid ContextStruct."""
+
+
 CPP_DIR = Path(__file__).resolve().parent / "Kievan Rus"
 CPP_BINARY_NAME = "kievan_rus_thinker"
 if os.name == "nt":
@@ -69,6 +100,75 @@ if os.name == "nt":
 CPP_BINARY = CPP_DIR / CPP_BINARY_NAME
 
 
+def _env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Read an integer of at least ``minimum`` from the environment, falling back to ``default``."""
+    try:
+        return max(minimum, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+# Upper bound on concurrently running C++ thinker processes per thought tree.
+# A value of 1 restores strictly sequential branch expansion.
+DEFAULT_MAX_WORKERS = _env_int("THINKING_MAX_WORKERS", 4)
+
+# Number of persistent ``--serve`` thinker processes shared by the whole Python
+# process. Zero keeps the one-subprocess-per-node behaviour.
+THINKER_POOL_SIZE = _env_int("KIEVAN_RUS_WORKERS", 0, minimum=0)
+
+# Gemini model used by the C++ thinker for analysis and summary calls.
+THINKER_MODEL = os.environ.get("KIEVAN_RUS_MODEL", "gemini-2.5-flash-lite")
+
+# How the thinker produces a node's summary: "separate" (a second Gemini call),
+# "pipelined" (as separate, but the analysis is streamed back first) or
+# "inline" (returned with the analysis in a single call).
+SUMMARY_MODE = os.environ.get("KIEVAN_RUS_SUMMARY_MODE", "separate").strip().lower() or "separate"
+
+# Timeouts, retries and hedging of the thinker's Gemini calls, and how often
+# it re-asks an analysis that fails schema validation, passed through as
+# command-line options; unset variables keep the C++ defaults.
+_REQUEST_POLICY_OPTIONS = {
+    "KIEVAN_RUS_SCHEMA_RETRIES": "--schema-retries",
+    "KIEVAN_RUS_CONNECT_TIMEOUT_MS": "--connect-timeout-ms",
+    "KIEVAN_RUS_TIMEOUT_MS": "--timeout-ms",
+    "KIEVAN_RUS_RETRIES": "--retries",
+    "KIEVAN_RUS_BACKOFF_MS": "--backoff-ms",
+    "KIEVAN_RUS_BACKOFF_MAX_MS": "--backoff-max-ms",
+    "KIEVAN_RUS_HEDGE_AFTER_MS": "--hedge-after-ms",
+}
+REQUEST_POLICY_ARGS = [
+    argument
+    for name, option in _REQUEST_POLICY_OPTIONS.items()
+    if os.environ.get(name, "").strip()
+    for argument in (option, os.environ[name].strip())
+]
+
+# Constrain the analysis call with a responseSchema generated from
+# ContextStruct, which the thinker also validates replies against.
+RESPONSE_SCHEMA = os.environ.get("KIEVAN_RUS_RESPONSE_SCHEMA", "1").lower() not in {"0", "false", "no"}
+
+# Development mode: re-check the C++ sources on every call and rebuild the
+# thinker when they change. Otherwise the binary is resolved once per process.
+WATCH_CPP_SOURCES = os.environ.get("KIEVAN_RUS_WATCH_SOURCES", "").lower() in {"1", "true", "yes"}
+
+# Evaluate each round of the search in one ``--batch`` thinker process, whose
+# Gemini calls run concurrently over shared connections, instead of one
+# thinker run per node.
+THINKER_BATCH = os.environ.get("KIEVAN_RUS_BATCH", "").lower() in {"1", "true", "yes"}
+
+# Store finished trees in the reasoning app's tables, and answer a repeated
+# request from its newest complete stored tree instead of searching again.
+TREE_STORE = os.environ.get("REASONING_STORE", "1").lower() not in {"0", "false", "no"}
+
+# Only trees stored this many seconds ago or later are reused, since answers
+# go stale (prompts carry the request date). Zero stores trees without reuse.
+REUSE_MAX_AGE = _env_int("REASONING_REUSE_MAX_AGE", 3600, minimum=0)
+
+# Start a new request from the stored tree of the most similar previous one
+# (see warm_start.py). Needs the tree store, torch and transformers.
+WARM_START = os.environ.get("WARM_START", "").lower() in {"1", "true", "yes"}
+
+
 def _locate_env_file() -> Optional[Path]:
     """Return the most likely .env file path, if it exists."""
     explicit = os.environ.get("KIEVAN_RUS_ENV_PATH")
@@ -83,11 +183,7 @@ def _locate_env_file() -> Optional[Path]:
     return None
 
 
-def _ensure_cpp_binary() -> Path:
-    """
-    Ensure the C++ assistant is compiled. If the binary is missing or older than
-    the source file, attempt to rebuild it. This assumes a system compiler and libcurl.
-    """
+def _latest_source_timestamp() -> float:
     try:
         sources = sorted(CPP_DIR.glob("*.cpp"))
         headers = list(CPP_DIR.glob("*.hpp"))
@@ -103,111 +199,524 @@ def _ensure_cpp_binary() -> Path:
             latest_timestamp = max(latest_timestamp, path.stat().st_mtime)
         except OSError:
             continue
+    return latest_timestamp
 
-    if CPP_BINARY.exists():
-        try:
-            if CPP_BINARY.stat().st_mtime >= latest_timestamp:
-                return CPP_BINARY
-        except OSError:
-            pass
 
+def _binary_is_fresh() -> bool:
+    if not CPP_BINARY.exists():
+        return False
+    try:
+        return CPP_BINARY.stat().st_mtime >= _latest_source_timestamp()
+    except OSError:
+        return False
+
+
+def _compile_cpp_binary(force: bool = False) -> None:
+    """
+    Compile into a temporary file and atomically move it into place, holding
+    an exclusive lock so concurrent workers never race on a half-written binary.
+    """
+    sources = sorted(path.name for path in CPP_DIR.glob("*.cpp"))
+    staging_path = CPP_BINARY.with_name(f"{CPP_BINARY.name}.{os.getpid()}.tmp")
     compile_command = [
         "g++",
         "-std=c++17",
         "-O2",
-        *[path.name for path in sources],
+        *sources,
         "-lcurl",
         "-o",
-        str(CPP_BINARY),
+        str(staging_path),
     ]
 
-    try:
-        subprocess.run(
-            compile_command,
-            check=True,
-            cwd=str(CPP_DIR),
-        )
-    except FileNotFoundError as exc:
-        raise ThinkingProcessError(
-            "C++ compiler (g++) not found. Install a C++17-compatible compiler to build the thinking engine."
-        ) from exc
-    except subprocess.CalledProcessError as exc:
-        raise ThinkingProcessError(
-            f"Failed to compile C++ thinking engine. Command: {' '.join(compile_command)}"
-        ) from exc
+    with (CPP_DIR / ".build.lock").open("a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            # Another worker may have finished the build while we waited.
+            if not force and _binary_is_fresh():
+                return
+            subprocess.run(
+                compile_command,
+                check=True,
+                cwd=str(CPP_DIR),
+            )
+            os.replace(staging_path, CPP_BINARY)
+        except FileNotFoundError as exc:
+            raise ThinkingProcessError(
+                "C++ compiler (g++) not found. Install a C++17-compatible compiler to build the thinking engine."
+            ) from exc
+        except subprocess.CalledProcessError as exc:
+            raise ThinkingProcessError(
+                f"Failed to compile C++ thinking engine. Command: {' '.join(compile_command)}"
+            ) from exc
+        finally:
+            staging_path.unlink(missing_ok=True)
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+_resolved_binary: Optional[Path] = None
+_binary_lock = threading.Lock()
+
+
+def build_cpp_binary(force: bool = False) -> Path:
+    """
+    Ensure the C++ assistant is compiled. If the binary is missing or older than
+    the sources, rebuild it. This assumes a system compiler and libcurl.
+
+    Called once at startup (``speech.apps.prepare_thinker`` or ``manage.py build_thinker``);
+    the resolved path is memoised for the rest of the process.
+    """
+    global _resolved_binary
+    with _binary_lock:
+        if force or not _binary_is_fresh():
+            _compile_cpp_binary(force=force)
+        _resolved_binary = CPP_BINARY
+        return _resolved_binary
+
+
+def _ensure_cpp_binary() -> Path:
+    """Return the thinker binary, building it only if this process has not resolved it yet."""
+    with telemetry.span("binary_check"):
+        if _resolved_binary is not None and not WATCH_CPP_SOURCES:
+            return _resolved_binary
+        return build_cpp_binary()
+
+
+_PAYLOAD_HEADER = struct.Struct(">BI")
+_PAYLOAD_LENGTH = struct.Struct(">I")
+
+# Payload status byte. Pipelined runs send a partial payload (analysis only)
+# before the complete payload for the same node.
+_STATUS_OK = 0
+_STATUS_PARTIAL = 2
+
+PartialCallback = Callable[[dict[str, Any]], None]
 
-    return CPP_BINARY
+
+class ThinkerResult(NamedTuple):
+    """
+    One node's thinker output; ``metadata`` carries e.g. ``{"usage": {...}}``
+    when reported. ``command`` is the validated context, once ``_validated``
+    has checked it, so the node does not validate it again.
+    """
+
+    context: dict[str, Any]
+    summary: str
+    metadata: dict[str, Any]
+    command: Optional[ContextStruct] = None
+
+
+def _read_exact(stream: BinaryIO, size: int, what: str) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise ThinkingProcessError(f"Malformed output from C++ thinking engine ({what}).")
+    return data
 
 
-def _read_binary_payload(path: Path) -> Tuple[dict[str, Any], str]:
+def _report_partial(context_payload: bytes, on_partial: Optional[PartialCallback]) -> None:
+    if on_partial is None:
+        return
+    try:
+        context = json.loads(str(context_payload, "utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return  # The complete payload follows and reports the problem properly.
+    if isinstance(context, dict):
+        on_partial(context)
+
+
+def _read_payload_frame(
+    stream: BinaryIO,
+    on_partial: Optional[PartialCallback] = None,
+) -> Tuple[int, bytes, bytes, bytes]:
     """
+    Read one node's binary payload from a pipe.
+
     The binary payload is encoded as:
-        status (1 byte)
+        status (1 byte; 0 success, 1 failure, 2 partial)
         context_length (4 bytes, big-endian)
         context payload (context_length bytes, UTF-8)
         summary_length (4 bytes, big-endian)
         summary payload (summary_length bytes, UTF-8)
+        metadata_length (4 bytes, big-endian)
+        metadata payload (metadata_length bytes, JSON object)
+
+    Partial payloads are handed to ``on_partial`` and reading continues until
+    the complete payload arrives.
     """
-    with path.open("rb") as stream:
-        status_raw = stream.read(1)
-        if len(status_raw) != 1:
-            raise ThinkingProcessError("Malformed output from C++ thinking engine (missing status byte).")
-
-        status = status_raw[0]
-
-        context_len_bytes = stream.read(4)
-        if len(context_len_bytes) != 4:
-            raise ThinkingProcessError("Malformed output from C++ thinking engine (missing context length).")
-        context_length = struct.unpack(">I", context_len_bytes)[0]
-        context_payload = stream.read(context_length)
-        if len(context_payload) != context_length:
-            raise ThinkingProcessError("Malformed output from C++ thinking engine (truncated context payload).")
-
-        summary_len_bytes = stream.read(4)
-        if len(summary_len_bytes) != 4:
-            raise ThinkingProcessError("Malformed output from C++ thinking engine (missing summary length).")
-        summary_length = struct.unpack(">I", summary_len_bytes)[0]
-        summary_payload = stream.read(summary_length)
-        if len(summary_payload) != summary_length:
-            raise ThinkingProcessError("Malformed output from C++ thinking engine (truncated summary payload).")
-
-    context_text = context_payload.decode("utf-8")
-    summary_text = summary_payload.decode("utf-8")
-
-    if status != 0:
+    while True:
+        status, context_length = _PAYLOAD_HEADER.unpack(
+            _read_exact(stream, _PAYLOAD_HEADER.size, "missing status byte or context length")
+        )
+        context_payload = _read_exact(stream, context_length, "truncated context payload")
+        (summary_length,) = _PAYLOAD_LENGTH.unpack(_read_exact(stream, _PAYLOAD_LENGTH.size, "missing summary length"))
+        summary_payload = _read_exact(stream, summary_length, "truncated summary payload")
+        (metadata_length,) = _PAYLOAD_LENGTH.unpack(_read_exact(stream, _PAYLOAD_LENGTH.size, "missing metadata length"))
+        metadata_payload = _read_exact(stream, metadata_length, "truncated metadata payload")
+
+        if status != _STATUS_PARTIAL:
+            return status, context_payload, summary_payload, metadata_payload
+        _report_partial(context_payload, on_partial)
+
+
+async def _aread_payload_frame(
+    reader: asyncio.StreamReader,
+    on_partial: Optional[PartialCallback] = None,
+) -> Tuple[int, bytes, bytes, bytes]:
+    """Asyncio counterpart of ``_read_payload_frame``."""
+    while True:
+        try:
+            status, context_length = _PAYLOAD_HEADER.unpack(await reader.readexactly(_PAYLOAD_HEADER.size))
+            context_payload = await reader.readexactly(context_length)
+            (summary_length,) = _PAYLOAD_LENGTH.unpack(await reader.readexactly(_PAYLOAD_LENGTH.size))
+            summary_payload = await reader.readexactly(summary_length)
+            (metadata_length,) = _PAYLOAD_LENGTH.unpack(await reader.readexactly(_PAYLOAD_LENGTH.size))
+            metadata_payload = await reader.readexactly(metadata_length)
+        except asyncio.IncompleteReadError as exc:
+            raise ThinkingProcessError("Malformed output from C++ thinking engine (truncated payload).") from exc
+
+        if status != _STATUS_PARTIAL:
+            return status, context_payload, summary_payload, metadata_payload
+        _report_partial(context_payload, on_partial)
+
+
+def _decode_payload(
+    status: int,
+    context_payload: bytes,
+    summary_payload: bytes,
+    metadata_payload: bytes = b"",
+) -> ThinkerResult:
+    with telemetry.span("parse", payload_bytes=len(context_payload) + len(summary_payload) + len(metadata_payload)):
+        return _parse_payload(status, context_payload, summary_payload, metadata_payload)
+
+
+def _parse_payload(
+    status: int,
+    context_payload: bytes,
+    summary_payload: bytes,
+    metadata_payload: bytes,
+) -> ThinkerResult:
+    context_text = str(context_payload, "utf-8")
+    summary_text = str(summary_payload, "utf-8")
+
+    if status != _STATUS_OK:
         raise ThinkingProcessError(context_text or "C++ thinking engine reported an error.")
 
     try:
         context_obj = json.loads(context_text)
     except json.JSONDecodeError as exc:
-        raise ThinkingProcessError("Unable to parse JSON generated by C++ thinking engine.") from exc
+        raise ThinkingOutputError("Unable to parse JSON generated by C++ thinking engine.") from exc
 
     if not isinstance(context_obj, dict):
-        raise ThinkingProcessError("Unexpected JSON structure from C++ thinking engine.")
+        raise ThinkingOutputError("Unexpected JSON structure from C++ thinking engine.")
 
-    return context_obj, summary_text
+    # Inline summary mode returns the summary inside the analysis JSON.
+    inline_summary = context_obj.pop("thought_summary", None)
+    if not summary_text and inline_summary:
+        summary_text = str(inline_summary)
 
+    metadata: dict[str, Any] = {}
+    if len(metadata_payload):
+        # Metadata is informational; a bad trailer must not fail the node.
+        try:
+            metadata = json.loads(str(metadata_payload, "utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            metadata = {}
 
-def _invoke_cpp_thinker(
+    return ThinkerResult(context_obj, summary_text, metadata if isinstance(metadata, dict) else {})
+
+
+@contextmanager
+def _killed_on_interrupt(process: subprocess.Popen, interrupt: Optional[Interrupt]) -> Iterator[None]:
+    """
+    Reads on the pipe cannot be abandoned, so ``process`` is killed when the
+    tree is cancelled while the block runs; pending reads then fail.
+    """
+    if interrupt is None:
+        yield
+        return
+
+    remove = interrupt.add_callback(process.kill)
+    try:
+        yield
+    finally:
+        remove()
+
+
+def _read_until_interrupted(
+    process: subprocess.Popen,
+    interrupt: Optional[Interrupt],
+    on_partial: Optional[PartialCallback] = None,
+) -> Tuple[int, bytes, bytes, bytes]:
+    """Read the node's payload from ``process``, killing it if the tree is cancelled meanwhile."""
+    with _killed_on_interrupt(process, interrupt):
+        try:
+            return _read_payload_frame(process.stdout, on_partial)
+        except ThinkingProcessError:
+            if interrupt is not None and interrupt.triggered():
+                raise ThinkingCancelled("Thinker run cancelled by the tree's limits.") from None
+            raise
+
+
+async def _until_interrupted(interrupt: Interrupt) -> None:
+    """Return once ``interrupt`` fires: its deadline passes or the tree is cancelled."""
+    loop = asyncio.get_running_loop()
+    fired = asyncio.Event()
+
+    def wake() -> None:
+        try:
+            loop.call_soon_threadsafe(fired.set)
+        except RuntimeError:
+            pass  # The loop has already closed; nobody is waiting.
+
+    remove = interrupt.add_callback(wake)
+    try:
+        await fired.wait()
+    finally:
+        remove()
+
+
+async def _aread_until_interrupted(
+    process: asyncio.subprocess.Process,
+    interrupt: Optional[Interrupt],
+    on_partial: Optional[PartialCallback] = None,
+) -> Tuple[int, bytes, bytes, bytes]:
+    """
+    Asyncio counterpart of ``_read_until_interrupted``: raises ``ThinkingCancelled``
+    when the tree is cancelled first, and the caller kills ``process``.
+    """
+    if interrupt is None:
+        return await _aread_payload_frame(process.stdout, on_partial)
+
+    reader = asyncio.ensure_future(_aread_payload_frame(process.stdout, on_partial))
+    watchdog = asyncio.ensure_future(_until_interrupted(interrupt))
+    try:
+        await asyncio.wait({reader, watchdog}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (reader, watchdog):
+            task.cancel()
+        await asyncio.gather(reader, watchdog, return_exceptions=True)
+    if reader.cancelled():
+        raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    try:
+        return reader.result()
+    except ThinkingProcessError:
+        if interrupt.triggered():
+            raise ThinkingCancelled("Thinker run cancelled by the tree's limits.") from None
+        raise
+
+
+def _encode_request_frame(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str = "",
+) -> bytes:
+    """
+    Encode a request for a ``--serve`` thinker: message, summary, branch label
+    and model as length-prefixed UTF-8 fields, then the iteration (4 bytes,
+    big-endian). Empty branch label or model select the C++ defaults.
+    """
+    parts = []
+    for field in (message, summarized_thought, branch_label, model):
+        encoded = field.encode("utf-8")
+        parts.append(struct.pack(">I", len(encoded)))
+        parts.append(encoded)
+    parts.append(struct.pack(">I", iteration))
+    return b"".join(parts)
+
+
+@lru_cache(maxsize=None)
+def _analysis_response_schema(summary_mode: str) -> str:
+    """ContextStruct as a compact Gemini responseSchema, with ``thought_summary`` in inline mode."""
+    extra = {}
+    if summary_mode == "inline":
+        extra["thought_summary"] = {
+            "type": "STRING",
+            "description": "A concise first-person summary of this thought process and its decisions.",
+        }
+    # The model cannot know the request time, so ContextStruct's default fills it in.
+    schema = gemini_response_schema(ContextStruct, extra, optional=("date_of_request",))
+    return json.dumps(schema, separators=(",", ":"))
+
+
+def _thinker_options() -> list[str]:
+    """Options shared by every thinker invocation: summary mode, request policy and response schema."""
+    options = ["--summary-mode", SUMMARY_MODE, *REQUEST_POLICY_ARGS]
+    if RESPONSE_SCHEMA:
+        options.extend(["--response-schema", _analysis_response_schema(SUMMARY_MODE)])
+    return options
+
+
+class _ThinkerWorker:
+    """A long-lived ``kievan_rus_thinker --serve`` process answering framed requests."""
+
+    def __init__(self, binary_path: Path, env_path: Optional[Path]):
+        command = [str(binary_path), "--serve", *_thinker_options()]
+        if env_path:
+            command.extend(["--env", str(env_path)])
+        try:
+            with telemetry.span("spawn", mode="serve"):
+                self.process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    cwd=str(CPP_DIR),
+                )
+        except OSError as exc:
+            raise ThinkingProcessError(f"Unable to start C++ thinker worker: {exc}") from exc
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(
+        self,
+        frame: bytes,
+        interrupt: Optional[Interrupt] = None,
+        on_partial: Optional[PartialCallback] = None,
+    ) -> Tuple[int, bytes, bytes, bytes]:
+        try:
+            self.process.stdin.write(frame)
+            self.process.stdin.flush()
+        except OSError as exc:
+            raise ThinkingProcessError(f"C++ thinker worker stopped accepting requests: {exc}") from exc
+        # A cancelled read kills the worker; the pool then replaces it.
+        return _read_until_interrupted(self.process, interrupt, on_partial)
+
+    def close(self) -> None:
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class _ThinkerPool:
+    """Bounded set of persistent thinker workers shared across thought trees."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: "queue.LifoQueue[_ThinkerWorker]" = queue.LifoQueue()
+        self._free = size
+        self._slots = threading.Condition()
+        self._workers: set[_ThinkerWorker] = set()
+        self._lock = threading.Lock()
+
+    def _wake(self) -> None:
+        with self._slots:
+            self._slots.notify_all()
+
+    def _acquire(self, interrupt: Optional[Interrupt]) -> None:
+        """Take a worker slot, or raise ``ThinkingCancelled`` if the tree is cancelled first."""
+        remove = interrupt.add_callback(self._wake) if interrupt is not None else None
+        try:
+            with self._slots:
+                while True:
+                    if interrupt is not None and interrupt.triggered():
+                        raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+                    if self._free:
+                        self._free -= 1
+                        return
+                    self._slots.wait()
+        finally:
+            if remove is not None:
+                remove()
+
+    def _release(self) -> None:
+        with self._slots:
+            self._free += 1
+            self._slots.notify()
+
+    def _checkout(self) -> _ThinkerWorker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.alive:
+                return worker
+            self._discard(worker)
+
+        worker = _ThinkerWorker(_ensure_cpp_binary(), _locate_env_file())
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker: _ThinkerWorker) -> None:
+        worker.close()
+        with self._lock:
+            self._workers.discard(worker)
+
+    def request(
+        self,
+        frame: bytes,
+        interrupt: Optional[Interrupt] = None,
+        on_partial: Optional[PartialCallback] = None,
+    ) -> Tuple[int, bytes, bytes, bytes]:
+        self._acquire(interrupt)
+        try:
+            worker = self._checkout()
+            if interrupt is not None and interrupt.triggered():
+                # Cancelled while waiting or spawning: the worker never saw the request.
+                self._idle.put(worker)
+                raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+            try:
+                result = worker.request(frame, interrupt, on_partial)
+            except ThinkingProcessError:
+                # The stream may be out of sync with the worker; never reuse it.
+                self._discard(worker)
+                raise
+            self._idle.put(worker)
+            return result
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+_thinker_pool: Optional[_ThinkerPool] = None
+_thinker_pool_lock = threading.Lock()
+
+
+def _get_thinker_pool() -> _ThinkerPool:
+    global _thinker_pool
+    with _thinker_pool_lock:
+        if _thinker_pool is None:
+            _thinker_pool = _ThinkerPool(THINKER_POOL_SIZE)
+            atexit.register(_thinker_pool.close)
+        return _thinker_pool
+
+
+def _thinker_command(
     message: str,
     iteration: int,
     summarized_thought: str,
     branch_label: str,
-) -> Tuple[dict[str, Any], str]:
+    model: str,
+) -> list[str]:
     binary_path = _ensure_cpp_binary()
     env_path = _locate_env_file()
 
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        output_path = Path(tmp.name)
-
     command = [
         str(binary_path),
         "--message",
         message,
         "--output",
-        str(output_path),
+        "-",
         "--iteration",
         str(iteration),
+        "--model",
+        model,
+        *_thinker_options(),
     ]
     if summarized_thought:
         command.extend(["--summary", summarized_thought])
@@ -215,356 +724,1202 @@ def _invoke_cpp_thinker(
         command.extend(["--branch", branch_label])
     if env_path:
         command.extend(["--env", str(env_path)])
+    return command
 
+
+def _process_failure(returncode: Optional[int]) -> ThinkingProcessError:
+    return ThinkingProcessError(f"C++ thinking engine execution failed with exit code {returncode}.")
+
+
+def _run_cpp_thinker(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str,
+    interrupt: Optional[Interrupt] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> ThinkerResult:
+    if THINKER_POOL_SIZE > 0:
+        frame = _encode_request_frame(
+            message=message,
+            iteration=iteration,
+            summarized_thought=summarized_thought,
+            branch_label=branch_label,
+            model=model,
+        )
+        return _decode_payload(*_get_thinker_pool().request(frame, interrupt, on_partial))
+
+    if interrupt is not None and interrupt.triggered():
+        raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    command = _thinker_command(message, iteration, summarized_thought, branch_label, model)
     try:
-        subprocess.run(command, check=True, cwd=str(CPP_DIR))
-        return _read_binary_payload(output_path)
-    except subprocess.CalledProcessError as exc:
-        raise ThinkingProcessError(
-            f"C++ thinking engine execution failed with exit code {exc.returncode}."
-        ) from exc
-    finally:
+        with telemetry.span("spawn", mode="oneshot"):
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, cwd=str(CPP_DIR))
+    except OSError as exc:
+        raise ThinkingProcessError(f"Unable to start C++ thinking engine: {exc}") from exc
+
+    with process:
         try:
-            output_path.unlink(missing_ok=True)
-        except AttributeError:
-            if output_path.exists():
-                output_path.unlink()
+            # A failing run still writes an error payload, which carries a
+            # better message than the exit code alone.
+            payload = _read_until_interrupted(process, interrupt, on_partial)
+        except ThinkingCancelled:
+            raise
+        except ThinkingProcessError:
+            raise _process_failure(process.wait()) from None
+    return _decode_payload(*payload)
 
 
-class ThinkingManager:
-    def __init__(
-        self,
-        message,
-        iteration: int = 0,
-        previous: Optional["ThinkingManager"] = None,
-        summarized_thought: str = "",
-        branch_label: str = "Primary",
-    ):
-        self.next = []
-        self.id = str(uuid.uuid4())
-        self.graph_path: Optional[Path] = None
-        self.branch_label = branch_label
-        self.summary_text = summarized_thought
-        self.probability_of_success: float = 0.0
-        self.potential_increment: float = 0.0
-        self.cumulative_potential: float = (
-            previous.cumulative_potential if previous is not None else 0.0
+async def _arun_cpp_thinker(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str,
+    interrupt: Optional[Interrupt] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> ThinkerResult:
+    if THINKER_POOL_SIZE > 0:
+        # Pool workers speak over blocking pipes; the pool itself bounds how
+        # many of these threads can be busy at once. Task cancellation cannot
+        # reach the thread, so it fires the interrupt, which stops the worker.
+        loop = asyncio.get_running_loop()
+        run = asyncio.to_thread(
+            _run_cpp_thinker,
+            message=message,
+            iteration=iteration,
+            summarized_thought=summarized_thought,
+            branch_label=branch_label,
+            model=model,
+            interrupt=interrupt,
+            on_partial=(
+                (lambda context: loop.call_soon_threadsafe(on_partial, context))
+                if on_partial is not None
+                else None
+            ),
         )
+        try:
+            return await run
+        except asyncio.CancelledError:
+            if interrupt is not None:
+                interrupt.cancel()
+            raise
+
+    if interrupt is not None and interrupt.triggered():
+        raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    command = _thinker_command(message, iteration, summarized_thought, branch_label, model)
+    try:
+        with telemetry.span("spawn", mode="oneshot"):
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                cwd=str(CPP_DIR),
+            )
+    except OSError as exc:
+        raise ThinkingProcessError(f"Unable to start C++ thinking engine: {exc}") from exc
+
+    try:
+        payload = await _aread_until_interrupted(process, interrupt, on_partial)
+    except ThinkingCancelled:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise
+    except ThinkingProcessError:
+        raise _process_failure(await process.wait()) from None
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+        # Reap it before the loop can close under its transport.
+        await process.wait()
+        raise
+    await process.wait()
+    return _decode_payload(*payload)
+
+
+def _validated(result: ThinkerResult) -> ThinkerResult:
+    """Return ``result`` with its validated ``command``, raising ``ThinkingOutputError`` if the context is invalid."""
+    try:
+        with telemetry.span("validate"):
+            command = ContextStruct.model_validate(result.context)
+    except ValidationError as exc:
+        raise ThinkingOutputError(f"Thinker output failed ContextStruct validation: {exc}") from exc
+    return result._replace(command=command)
 
-        self.previous = previous
-        if previous is not None:
-            previous.next.append(self)
 
-        self.message = message
-        self.iteration = iteration + 1
-        self.max_iterations = 8
+def _report_retry(branch_label: str, exc: ThinkingOutputError) -> None:
+    print(f"[ThinkingManager] Re-running branch '{branch_label or 'Primary'}' after invalid output: {exc}")
+
+
+def _run_validated(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str,
+    interrupt: Optional[Interrupt] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> ThinkerResult:
+    """
+    Run the thinker and validate its output, re-running it once when the output
+    is not a valid ContextStruct: a second call is cheaper than losing the
+    branch and the calls that led to it.
+    """
+    try:
+        return _validated(
+            _run_cpp_thinker(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+        )
+    except ThinkingOutputError as exc:
+        _report_retry(branch_label, exc)
+    return _validated(
+        _run_cpp_thinker(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+    )
+
+
+async def _arun_validated(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str,
+    interrupt: Optional[Interrupt] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> ThinkerResult:
+    """Asyncio counterpart of ``_run_validated``."""
+    try:
+        return _validated(
+            await _arun_cpp_thinker(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+        )
+    except ThinkingOutputError as exc:
+        _report_retry(branch_label, exc)
+    return _validated(
+        await _arun_cpp_thinker(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+    )
+
+
+def _invoke_cpp_thinker(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str = THINKER_MODEL,
+    interrupt: Optional[Interrupt] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> ThinkerResult:
+    """
+    Run the thinker for one node, answering repeated inputs from the thinker
+    cache. Cached results report no usage, since they cost no tokens.
+    ``on_partial`` receives the node's analysis ahead of its summary when the
+    thinker runs in pipelined mode.
+    """
+    cache = get_thinker_cache()
+    if not cache.enabled:
+        return _run_validated(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+
+    key = cache_key(message, iteration, summarized_thought, branch_label, model, SUMMARY_MODE)
+    cached = cache.get(key)
+    if cached is not None:
+        return ThinkerResult(*cached, {"cached": True})
+
+    result = _run_validated(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+    cache.set(key, result.context, result.summary)
+    return result
+
+
+async def _ainvoke_cpp_thinker(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str = THINKER_MODEL,
+    interrupt: Optional[Interrupt] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> ThinkerResult:
+    """Asyncio counterpart of ``_invoke_cpp_thinker`` that never blocks the event loop."""
+    cache = get_thinker_cache()
+    if not cache.enabled:
+        return await _arun_validated(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+
+    key = cache_key(message, iteration, summarized_thought, branch_label, model, SUMMARY_MODE)
+    # Redis round trips block, so only the in-process tier is read on the loop.
+    if cache.uses_redis:
+        cached = await asyncio.to_thread(cache.get, key)
+    else:
+        cached = cache.get(key)
+    if cached is not None:
+        return ThinkerResult(*cached, {"cached": True})
+
+    result = await _arun_validated(message, iteration, summarized_thought, branch_label, model, interrupt, on_partial)
+    if cache.uses_redis:
+        await asyncio.to_thread(cache.set, key, result.context, result.summary)
+    else:
+        cache.set(key, result.context, result.summary)
+    return result
 
+
+class ThinkerJob(NamedTuple):
+    """One node's thinker inputs, as sent in a ``--batch`` frame."""
+
+    message: str
+    iteration: int
+    summarized_thought: str
+    branch_label: str
+    model: str = THINKER_MODEL
+
+
+# A batch reports each job's failure in place of its result instead of raising.
+BatchOutcome = Union[ThinkerResult, ThinkingProcessError]
+
+
+def _encode_batch_frame(jobs: Sequence[ThinkerJob]) -> bytes:
+    """Encode a ``--batch`` input: the job count (4 bytes, big-endian), then one request frame per job."""
+    return struct.pack(">I", len(jobs)) + b"".join(_encode_request_frame(*job) for job in jobs)
+
+
+def _batch_command() -> list[str]:
+    command = [str(_ensure_cpp_binary()), "--batch", *_thinker_options()]
+    env_path = _locate_env_file()
+    if env_path:
+        command.extend(["--env", str(env_path)])
+    return command
+
+
+def _decode_outcome(payload: Tuple[int, bytes, bytes, bytes]) -> BatchOutcome:
+    try:
+        return _decode_payload(*payload)
+    except ThinkingProcessError as exc:
+        return exc
+
+
+def _run_cpp_thinker_batch(
+    jobs: Sequence[ThinkerJob],
+    interrupt: Optional[Interrupt] = None,
+) -> Iterator[BatchOutcome]:
+    """
+    Evaluate ``jobs`` in one ``--batch`` thinker process, yielding one outcome
+    per job, in job order, as its payload arrives. Raises ``ThinkingProcessError``
+    only when the process cannot be started at all.
+    """
+    if not jobs:
+        return
+    if interrupt is not None and interrupt.triggered():
+        raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    command = _batch_command()
+    try:
+        with telemetry.span("spawn", mode="batch", jobs=len(jobs)):
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=str(CPP_DIR))
+    except OSError as exc:
+        raise ThinkingProcessError(f"Unable to start C++ thinking engine: {exc}") from exc
+
+    with process, _killed_on_interrupt(process, interrupt):
         try:
-            raw_context, summarize_thought = _invoke_cpp_thinker(
-                message=message,
-                iteration=self.iteration,
-                summarized_thought=summarized_thought,
-                branch_label=self.branch_label,
+            process.stdin.write(_encode_batch_frame(jobs))
+            process.stdin.close()
+        except OSError:
+            pass  # The process already exited; reading its output reports why.
+
+        for index in range(len(jobs)):
+            try:
+                payload = _read_payload_frame(process.stdout)
+            except ThinkingProcessError:
+                if interrupt is not None and interrupt.triggered():
+                    error = ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+                else:
+                    error = _process_failure(process.wait())
+                for _ in range(index, len(jobs)):
+                    yield error
+                return
+            try:
+                yield _decode_outcome(payload)
+            except GeneratorExit:
+                process.kill()  # Closed early: the remaining jobs are not wanted.
+                raise
+
+
+async def _arun_cpp_thinker_batch(
+    jobs: Sequence[ThinkerJob],
+    interrupt: Optional[Interrupt] = None,
+) -> AsyncIterator[BatchOutcome]:
+    """Asyncio counterpart of ``_run_cpp_thinker_batch``; closing it early kills the process."""
+    if not jobs:
+        return
+    if interrupt is not None and interrupt.triggered():
+        raise ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    command = _batch_command()
+    try:
+        with telemetry.span("spawn", mode="batch", jobs=len(jobs)):
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                cwd=str(CPP_DIR),
             )
-        except ThinkingProcessError as exc:
-            print(f"Error running C++ thinking engine: {exc}")
-            self.context = None
-            return
+    except OSError as exc:
+        raise ThinkingProcessError(f"Unable to start C++ thinking engine: {exc}") from exc
+
+    try:
+        try:
+            process.stdin.write(_encode_batch_frame(jobs))
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The process already exited; reading its output reports why.
+
+        for index in range(len(jobs)):
+            try:
+                payload = await _aread_until_interrupted(process, interrupt)
+            except ThinkingProcessError as exc:
+                error = exc if isinstance(exc, ThinkingCancelled) else _process_failure(await process.wait())
+                for _ in range(index, len(jobs)):
+                    yield error
+                return
+            yield _decode_outcome(payload)
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+def _checked(outcome: BatchOutcome) -> BatchOutcome:
+    """A batch job's result validated, or the ``ThinkingOutputError`` that rejects it."""
+    if isinstance(outcome, ThinkerResult):
+        try:
+            return _validated(outcome)
+        except ThinkingOutputError as exc:
+            return exc
+    return outcome
+
+
+def _retried(job: ThinkerJob, error: ThinkingOutputError, interrupt: Optional[Interrupt]) -> BatchOutcome:
+    """Re-run a batch job whose output was rejected, on its own, unless the tree was cancelled meanwhile."""
+    if interrupt is not None and interrupt.triggered():
+        return ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    _report_retry(job.branch_label, error)
+    try:
+        return _validated(_run_cpp_thinker(*job, interrupt))
+    except ThinkingProcessError as exc:
+        return exc
+
+
+async def _aretried(job: ThinkerJob, error: ThinkingOutputError, interrupt: Optional[Interrupt]) -> BatchOutcome:
+    """Asyncio counterpart of ``_retried``."""
+    if interrupt is not None and interrupt.triggered():
+        return ThinkingCancelled("Thinker run cancelled by the tree's limits.")
+    _report_retry(job.branch_label, error)
+    try:
+        return _validated(await _arun_cpp_thinker(*job, interrupt))
+    except ThinkingProcessError as exc:
+        return exc
+
+
+def _invoke_cpp_thinker_batch(
+    jobs: Sequence[ThinkerJob],
+    interrupt: Optional[Interrupt] = None,
+) -> Iterator[BatchOutcome]:
+    """
+    Batch counterpart of ``_invoke_cpp_thinker``: only cache misses reach the
+    thinker, and a job whose output is not a valid ContextStruct is re-run once
+    on its own.
+    """
+    cache = get_thinker_cache()
+    keys = [cache_key(*job, SUMMARY_MODE) for job in jobs]
+    cached = [cache.get(key) for key in keys] if cache.enabled else [None] * len(jobs)
+    misses = _run_cpp_thinker_batch([job for job, hit in zip(jobs, cached) if hit is None], interrupt)
+    try:
+        for job, key, hit in zip(jobs, keys, cached):
+            if hit is not None:
+                yield ThinkerResult(*hit, {"cached": True})
+                continue
+            outcome = _checked(next(misses))
+            if isinstance(outcome, ThinkingOutputError):
+                outcome = _retried(job, outcome, interrupt)
+            if cache.enabled and isinstance(outcome, ThinkerResult):
+                cache.set(key, outcome.context, outcome.summary)
+            yield outcome
+    finally:
+        misses.close()
+
+
+async def _ainvoke_cpp_thinker_batch(
+    jobs: Sequence[ThinkerJob],
+    interrupt: Optional[Interrupt] = None,
+) -> AsyncIterator[BatchOutcome]:
+    """Asyncio counterpart of ``_invoke_cpp_thinker_batch``."""
+    cache = get_thinker_cache()
+    keys = [cache_key(*job, SUMMARY_MODE) for job in jobs]
+    if not cache.enabled:
+        cached = [None] * len(jobs)
+    elif cache.uses_redis:
+        cached = await asyncio.to_thread(lambda: [cache.get(key) for key in keys])
+    else:
+        cached = [cache.get(key) for key in keys]
+
+    misses = _arun_cpp_thinker_batch([job for job, hit in zip(jobs, cached) if hit is None], interrupt)
+    try:
+        for job, key, hit in zip(jobs, keys, cached):
+            if hit is not None:
+                yield ThinkerResult(*hit, {"cached": True})
+                continue
+            outcome = _checked(await misses.__anext__())
+            if isinstance(outcome, ThinkingOutputError):
+                outcome = await _aretried(job, outcome, interrupt)
+            if cache.enabled and isinstance(outcome, ThinkerResult):
+                if cache.uses_redis:
+                    await asyncio.to_thread(cache.set, key, outcome.context, outcome.summary)
+                else:
+                    cache.set(key, outcome.context, outcome.summary)
+            yield outcome
+    finally:
+        await misses.aclose()
+
+
+def _telemetry_attributes(engine: TreeEngine, node: Node) -> dict[str, Any]:
+    return {"tree_id": engine.id, "node_id": node.id, "branch": node.branch_label}
+
+
+def _thinker_job(engine: TreeEngine, node: Node) -> ThinkerJob:
+    return ThinkerJob(
+        message=engine.message,
+        iteration=node.iteration,
+        summarized_thought=node.summary_text,
+        branch_label=node.branch_label,
+    )
 
+
+def _absorb_analysis(
+    engine: TreeEngine,
+    node: Node,
+    raw_context: dict[str, Any],
+    command: Optional[ContextStruct] = None,
+) -> bool:
+    """
+    Hand a node's analysis to the engine, validating it first unless
+    ``command`` is its already validated form. Returns False when it is invalid.
+    """
+    if command is None:
         try:
-            command_obj = ContextStruct.model_validate(raw_context)
+            with telemetry.span("validate", **_telemetry_attributes(engine, node)):
+                command = ContextStruct.model_validate(raw_context)
         except Exception as exc:
             print(f"Validation error parsing context: {exc}")
-            self.context = None
-            return
+            node.context = None
+            return False
+    engine.absorb_analysis(node, command.model_dump())
+    return True
 
-        self.context = command_obj.model_dump()
-        self.summary_text = summarize_thought or self.summary_text
 
-        self.probability_of_success = self._to_float(
-            self.context.get("probability_of_success"),
-            default=0.0,
-            clamp=(0.0, 1.0),
-        )
-        self.potential_increment = self._to_float(
-            self.context.get("potential_score"),
-            default=0.0,
+def _absorb_partial(engine: TreeEngine, node: Node, raw_context: dict[str, Any]) -> None:
+    """
+    Take a pipelined node's analysis while its summary is still being
+    written, so the node is reported and the good-enough check runs a
+    Gemini call earlier. The complete result follows through ``_settle``.
+    """
+    if _absorb_analysis(engine, node, raw_context):
+        engine.notify(node)
+
+
+def _node_tokens(raw_context: dict[str, Any], summary: str, metadata: dict[str, Any]) -> int:
+    """The tokens a node's thinker run used, for the tree's token budget."""
+    usage = metadata.get("usage") or {}
+    tokens = to_float(usage.get("total_tokens"), default=-1)
+    if tokens >= 0:
+        return int(tokens)
+    if metadata:
+        return 0  # Cache hit, or Gemini omitted usageMetadata.
+    # No usage reported (older binary or test double): estimate ~4 characters per token.
+    return (len(json.dumps(raw_context)) + len(summary or "")) // 4
+
+
+def _record_calls(engine: TreeEngine, node: Node, metadata: dict[str, Any]) -> None:
+    """Report the Gemini call timings the thinker put in the payload trailer."""
+    for call in metadata.get("calls") or ():
+        telemetry.record(
+            f"gemini_{call.get('stage', 'call')}",
+            to_float(call.get("ms")) / 1000,
+            **_telemetry_attributes(engine, node),
         )
-        self.cumulative_potential += self.potential_increment
-
-        self.context["probability_of_success"] = self.probability_of_success
-        self.context["potential_increment"] = self.potential_increment
-        self.context["potential_score"] = self.potential_increment
-        self.context["cumulative_potential"] = self.cumulative_potential
-        self.context["branch_label"] = self.branch_label
 
-        self._log(
-            f"Evaluated branch '{self.branch_label}' (ID: {self.id}) | "
-            f"Prob: {self.probability_of_success:.2f} | "
-            f"ΔPotential: {self.potential_increment:+.2f} | "
-            f"Cumulative: {self.cumulative_potential:.2f}"
-        )
 
-        should_spawn = False
-        if self.previous is None and self.iteration <= self.max_iterations:
-            should_spawn = True
-        elif (
-            not self.context.get("is_done_thinking", False)
-            and self.iteration <= self.max_iterations
-        ):
-            should_spawn = True
-
-        if should_spawn:
-            self._spawn_branch_children(
-                message=message,
-                base_summary=self.summary_text,
-            )
+def _settle(engine: TreeEngine, node: Node, outcome: BatchOutcome) -> None:
+    """Absorb a thinker result or failure for ``node``."""
+    if isinstance(outcome, ThinkingCancelled):
+        engine.cancel_node(node)
+        return
+    if isinstance(outcome, ThinkingProcessError):
+        print(f"Error running C++ thinking engine: {outcome}")
+        engine.fail(node)
+        return
+
+    raw_context, summary, metadata, command = outcome
+    metadata = metadata or {}
+    if not node.analysed and not _absorb_analysis(engine, node, raw_context, command):
+        engine.fail(node)
+        return
+    _record_calls(engine, node, metadata)
+    engine.complete(node, summary, _node_tokens(raw_context, summary, metadata))
+
+
+def _evaluate_node(engine: TreeEngine, node: Node) -> None:
+    """Run the thinker for one node and settle it."""
+    with telemetry.bound(**_telemetry_attributes(engine, node)):
+        try:
+            with telemetry.span("thinker", cancelled_by=(ThinkingCancelled,)):
+                result = _invoke_cpp_thinker(
+                    **_thinker_job(engine, node)._asdict(),
+                    interrupt=engine.interrupt,
+                    on_partial=lambda raw_context: _absorb_partial(engine, node, raw_context),
+                )
+        except ThinkingProcessError as exc:
+            _settle(engine, node, exc)
+            return
+        _settle(engine, node, result)
 
-    @staticmethod
-    def _log(message: str) -> None:
-        print(f"[ThinkingManager] {message}")
 
-    @staticmethod
-    def _to_float(value: Any, default: float = 0.0, clamp: Optional[Tuple[float, float]] = None) -> float:
+async def _aevaluate_node(engine: TreeEngine, node: Node, slots: Optional[asyncio.Semaphore] = None) -> None:
+    with telemetry.bound(**_telemetry_attributes(engine, node)):
         try:
-            result = float(value)
-        except (TypeError, ValueError):
-            return default
-
-        if clamp is not None:
-            low, high = clamp
-            if low is not None:
-                result = max(low, result)
-            if high is not None:
-                result = min(high, result)
-        return result
+            async with slots or nullcontext():
+                with telemetry.span("thinker", cancelled_by=(ThinkingCancelled,)):
+                    result = await _ainvoke_cpp_thinker(
+                        **_thinker_job(engine, node)._asdict(),
+                        interrupt=engine.interrupt,
+                        on_partial=lambda raw_context: _absorb_partial(engine, node, raw_context),
+                    )
+        except asyncio.CancelledError:
+            engine.cancel_node(node)
+            raise
+        except ThinkingProcessError as exc:
+            _settle(engine, node, exc)
+            return
+        _settle(engine, node, result)
 
-    @staticmethod
-    def _wrap_label(text: str, width: int = 42) -> str:
-        if not text:
-            return "No content"
-        return textwrap.fill(" ".join(text.split()), width=width)
 
-    def _spawn_branch_children(self, message: str, base_summary: str) -> None:
-        if self.iteration >= self.max_iterations:
-            self._log("Maximum iteration reached; skipping branch expansion.")
-            return
+class ThreadedThinkerExecutor(NodeExecutor):
+    """One thinker run per node; a round's nodes run concurrently on up to ``max_workers`` threads."""
 
-        if getattr(self, "_branches_created", False):
-            self._log("Branches already created for this node; skipping additional expansion.")
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+
+    def run_round(self, engine: TreeEngine, nodes: Sequence[Node]) -> None:
+        if len(nodes) == 1:
+            _evaluate_node(engine, nodes[0])
             return
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(nodes)),
+            thread_name_prefix="thinker",
+        ) as executor:
+            pending = {executor.submit(_evaluate_node, engine, node): node for node in nodes}
+            while pending:
+                done, _ = wait(pending, timeout=engine.interrupt.remaining(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                if engine.limit_reached():
+                    # Queued nodes never start; running ones are killed by the interrupt.
+                    for future, node in list(pending.items()):
+                        if future.cancel():
+                            engine.discard(node)
+                            pending.pop(future)
+                    # A passed deadline leaves no timeout to poll with; block until the killed runs exit.
+                    wait(pending)
+                    break
+
+
+class AsyncThinkerExecutor(AsyncNodeExecutor):
+    """``ThreadedThinkerExecutor`` on asyncio subprocess I/O, at most ``max_workers`` runs at a time."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    async def arun_round(self, engine: TreeEngine, nodes: Sequence[Node]) -> None:
+        pending = {asyncio.ensure_future(_aevaluate_node(engine, node, self._slots)) for node in nodes}
+        try:
+            while pending:
+                _, pending = await asyncio.wait(
+                    pending, timeout=engine.interrupt.remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if pending and engine.limit_reached():
+                    break
+        finally:
+            # Also runs when the request itself is cancelled, so no evaluation outlives it.
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
 
-        # Only spawn branches for the root node (Primary) and first-level branches
-        # Count depth by checking how many branch segments exist
-        # Primary → 0 levels deep (create branches)
-        # A, B (or Primary-A, Primary-B) → 1 level deep (create branches)
-        # A-A, A-B, B-A, B-B → 2 levels deep (stop here)
 
-        # Calculate branch depth based on label structure
-        if self.branch_label == "Primary":
-            branch_depth = 0
-        else:
-            # Remove "Primary-" prefix if it exists for counting
-            label_to_check = self.branch_label.replace("Primary-", "")
-            # Count number of segments separated by hyphens
-            branch_depth = len(label_to_check.split("-"))
+class BatchThinkerExecutor(NodeExecutor):
+    """
+    Evaluates each round in one ``kievan_rus_thinker --batch`` process. A
+    single node (the root) runs on its own, so it can still report partials.
+    """
 
-        if branch_depth >= 2:
-            self._log(f"Branch '{self.branch_label}' is at depth {branch_depth}; stopping expansion.")
+    def run_round(self, engine: TreeEngine, nodes: Sequence[Node]) -> None:
+        if len(nodes) == 1:
+            _evaluate_node(engine, nodes[0])
             return
+        settled = 0
+        outcomes = _invoke_cpp_thinker_batch(
+            [_thinker_job(engine, node) for node in nodes],
+            interrupt=engine.interrupt,
+        )
+        with telemetry.bound(tree_id=engine.id), telemetry.span("thinker_batch", jobs=len(nodes)):
+            try:
+                for outcome in outcomes:
+                    _settle(engine, nodes[settled], outcome)
+                    settled += 1
+                    if engine.limit_reached():
+                        break
+            except ThinkingProcessError as exc:
+                for node in nodes[settled:]:
+                    _settle(engine, node, exc)
+                settled = len(nodes)
+            finally:
+                # Closing early kills the thinker; its unfinished nodes are dropped.
+                outcomes.close()
+                for node in nodes[settled:]:
+                    engine.cancel_node(node)
+
+
+class AsyncBatchThinkerExecutor(AsyncNodeExecutor):
+    async def arun_round(self, engine: TreeEngine, nodes: Sequence[Node]) -> None:
+        if len(nodes) == 1:
+            await _aevaluate_node(engine, nodes[0])
+            return
+        try:
+            await asyncio.wait_for(self._run_batch(engine, nodes), timeout=engine.interrupt.remaining())
+        except asyncio.TimeoutError:
+            engine.limit_reached()  # Records the deadline; the round's unfinished nodes were dropped.
 
-        branch_suffixes = ["A", "B"]
-        for index, suffix in enumerate(branch_suffixes, start=1):
-            child_label = f"{self.branch_label}-{suffix}".strip("-")
-            augmented_summary = (base_summary or "").strip()
-            branch_summary = (
-                f"{augmented_summary}\nBranch {child_label}: explore an alternate path distinct from other branches. "
-                f"Parent cumulative potential: {self.cumulative_potential:.2f}. "
-                f"Focus on a unique strategy with a quantified probability of success."
-            ).strip()
-
-            self._log(
-                f"Spawning branch '{child_label}' from parent '{self.branch_label}' (ID: {self.id})."
-            )
+    @staticmethod
+    async def _run_batch(engine: TreeEngine, nodes: Sequence[Node]) -> None:
+        settled = 0
+        outcomes = _ainvoke_cpp_thinker_batch(
+            [_thinker_job(engine, node) for node in nodes],
+            interrupt=engine.interrupt,
+        )
+        with telemetry.bound(tree_id=engine.id), telemetry.span("thinker_batch", jobs=len(nodes)):
+            try:
+                async for outcome in outcomes:
+                    _settle(engine, nodes[settled], outcome)
+                    settled += 1
+                    if engine.limit_reached():
+                        break
+            except ThinkingProcessError as exc:
+                for node in nodes[settled:]:
+                    _settle(engine, node, exc)
+                settled = len(nodes)
+            finally:
+                # Also runs when the request is cancelled.
+                await outcomes.aclose()
+                for node in nodes[settled:]:
+                    engine.cancel_node(node)
+
+
+def default_executor(max_workers: Optional[int] = None, asynchronous: bool = False):
+    """The thinker executor selected by ``KIEVAN_RUS_BATCH``, for a threaded or an asyncio search."""
+    if THINKER_BATCH:
+        return AsyncBatchThinkerExecutor() if asynchronous else BatchThinkerExecutor()
+    return AsyncThinkerExecutor(max_workers) if asynchronous else ThreadedThinkerExecutor(max_workers)
+
+
+def _stored_enquiries() -> Iterator[Tuple[str, str]]:
+    """``(run_id, user_enquiry)`` of every reusable stored run, for the warm-start index."""
+    from reasoning.models import ReasoningNode
+
+    roots = ReasoningNode.objects.filter(depth=0, run__complete=True).values_list("run_id", "context")
+    for run_id, context in roots.iterator():
+        yield str(run_id), str((context or {}).get("user_enquiry") or "")
 
-            ThinkingManager(
-                message=message,
-                iteration=self.iteration,
-                previous=self,
-                summarized_thought=branch_summary,
-                branch_label=child_label,
-            )
 
-        self._branches_created = True
+class ThinkingManager:
+    """
+    A thought tree for one message, and the final-answer prompt built from it.
+    The search runs in a ``TreeEngine``; this class chooses how its nodes are
+    evaluated and renders the finished tree.
+    """
 
-    def _collect_graph_data(self):
-        self._log("Collecting thought graph data for rendering.")
-        root = self
-        while root.previous is not None:
-            root = root.previous
+    def __init__(
+        self,
+        message,
+        iteration: int = 0,
+        summarized_thought: str = "",
+        branch_label: str = "Primary",
+        max_workers: Optional[int] = None,
+        on_node: Optional[Callable[[Node], None]] = None,
+        strategy: Optional[SearchStrategy] = None,
+        limits: Optional[ThinkingLimits] = None,
+        executor: Optional[Union[NodeExecutor, AsyncNodeExecutor]] = None,
+    ):
+        """
+        Grow the whole tree: evaluate the root, then let ``strategy`` pick which
+        nodes to expand until the frontier is empty or one of ``limits`` stops
+        the search; ``stop_reason`` records which. ``executor`` defaults to the
+        thinker executor selected by ``KIEVAN_RUS_BATCH``. A request answered
+        before is rebuilt from its stored tree instead (see ``TREE_STORE``),
+        and with ``WARM_START`` a similar one seeds the search or replaces it.
+        """
+        self._setup(
+            message, iteration, summarized_thought, branch_label, on_node, strategy, limits,
+            executor or default_executor(max_workers),
+        )
+        self.build()
 
-        nodes: list[ThoughtNode] = []
-        edges: list[tuple[str, str]] = []
-        stack: list[tuple["ThinkingManager", int, Optional[str]]] = [(root, 0, None)]
-        visited: set[str] = set()
+    @classmethod
+    def prepare(
+        cls,
+        message,
+        iteration: int = 0,
+        summarized_thought: str = "",
+        branch_label: str = "Primary",
+        max_workers: Optional[int] = None,
+        on_node: Optional[Callable[[Node], None]] = None,
+        strategy: Optional[SearchStrategy] = None,
+        limits: Optional[ThinkingLimits] = None,
+        executor: Optional[NodeExecutor] = None,
+    ) -> "ThinkingManager":
+        """
+        Set up the tree without searching it; ``build`` does the search. A
+        caller keeps the manager to ``cancel`` a build running in another thread.
+        """
+        self = cls.__new__(cls)
+        self._setup(
+            message, iteration, summarized_thought, branch_label, on_node, strategy, limits,
+            executor or default_executor(max_workers),
+        )
+        return self
+
+    def build(self) -> "ThinkingManager":
+        """Search the tree set up by ``prepare``, or rebuild it from a stored run."""
+        stored = self._load_stored_tree()
+        if stored is not None:
+            self._replay(stored)
+            return self
+        similar = self._load_similar_tree()
+        branch = self._warm_start(*similar) if similar is not None else None
+        if self.reused_run_id is not None:
+            return self
+        if branch is not None:
+            self.engine.step()  # This message's own root comes first.
+            self._graft(branch)
+        self.engine.run()
+        self._store_tree()
+        return self
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Stop the search from another thread; thinker runs in flight are killed."""
+        self.engine.cancel(reason)
+
+    @classmethod
+    async def abuild(
+        cls,
+        message,
+        iteration: int = 0,
+        summarized_thought: str = "",
+        branch_label: str = "Primary",
+        max_workers: Optional[int] = None,
+        on_node: Optional[Callable[[Node], None]] = None,
+        strategy: Optional[SearchStrategy] = None,
+        limits: Optional[ThinkingLimits] = None,
+        executor: Optional[Union[NodeExecutor, AsyncNodeExecutor]] = None,
+    ) -> "ThinkingManager":
+        """
+        Build the same thought tree as the constructor, but with asyncio
+        subprocess I/O so an ASGI worker can interleave many trees.
+        """
+        self = cls.__new__(cls)
+        self._setup(
+            message, iteration, summarized_thought, branch_label, on_node, strategy, limits,
+            executor or default_executor(max_workers, asynchronous=True),
+        )
+        stored = await sync_to_async(self._load_stored_tree)()
+        if stored is not None:
+            self._replay(stored)
+            return self
+        similar = await sync_to_async(self._load_similar_tree)()
+        branch = self._warm_start(*similar) if similar is not None else None
+        if self.reused_run_id is not None:
+            return self
+        if branch is not None:
+            await self.engine.astep()
+            self._graft(branch)
+        await self.engine.arun()
+        await sync_to_async(self._store_tree)()
+        return self
+
+    def _setup(
+        self,
+        message,
+        iteration: int,
+        summarized_thought: str,
+        branch_label: str,
+        on_node: Optional[Callable[[Node], None]],
+        strategy: Optional[SearchStrategy],
+        limits: Optional[ThinkingLimits],
+        executor: Union[NodeExecutor, AsyncNodeExecutor],
+    ) -> None:
+        self.message = message
+        self.graph_id: Optional[str] = None
+        self.graph_path: Optional[Path] = None
+        self._on_node = on_node
+        self._rendered: dict[str, Tuple[str, ThoughtNode]] = {}
+        self._final: Optional[Tuple[str, list[ThoughtNode], list[tuple[str, str]]]] = None
+        self.engine = TreeEngine(
+            message,
+            executor,
+            iteration=iteration,
+            summarized_thought=summarized_thought,
+            branch_label=branch_label,
+            on_node=self._record_node,
+            strategy=strategy,
+            limits=limits,
+        )
+        self.id = self.engine.id
+        self.reused_run_id: Optional[str] = None
+        self.seeded_from_run_id: Optional[str] = None
+        # The deadline only decides whether a run is complete, not what it finds.
+        search = (
+            THINKER_MODEL,
+            SUMMARY_MODE,
+            self.engine.strategy.describe(),
+            {name: value for name, value in asdict(self.engine.limits).items() if name != "deadline_seconds"},
+            summarized_thought,
+            branch_label,
+            iteration,
+        )
+        self.request_hash = request_hash(str(message), *search)
+        # The same key without the message: a similar question's stored tree is
+        # only warm-started from when it was searched with the same settings.
+        self.search_hash = request_hash("", *search)
 
-        while stack:
-            node, depth, parent_id = stack.pop()
-            if node.id in visited or node.context is None:
-                self._log(f"Skipping node {node.id} (visited or missing context).")
-                continue
-            visited.add(node.id)
-
-            plan_text = node.context.get("steps_for_completion", "No plan generated.")
-            setbacks = node.context.get("possible_setbacks", "")
-            probability = self._to_float(
-                node.context.get("probability_of_success"),
-                default=0.0,
-                clamp=(0.0, 1.0),
-            )
-            potential_increment = self._to_float(
-                node.context.get("potential_increment", node.context.get("potential_score")),
-                default=0.0,
-            )
-            cumulative_potential = self._to_float(
-                node.context.get("cumulative_potential"),
-                default=getattr(node, "cumulative_potential", 0.0),
-            )
-            branch_label = node.context.get("branch_label", getattr(node, "branch_label", "Branch"))
+    @property
+    def root(self) -> Node:
+        return self.engine.root
 
-            detail_parts = [plan_text]
-            if setbacks:
-                detail_parts.append(f"Setbacks: {setbacks}")
-            combined_label = "\n".join(detail_parts)
+    @property
+    def stop_reason(self) -> Optional[str]:
+        return self.engine.stop_reason
 
-            nodes.append(
-                ThoughtNode(
-                    id=node.id,
-                    depth=depth,
-                    label=self._wrap_label(combined_label),
-                    branch_label=branch_label,
-                    probability=probability,
-                    potential_increment=potential_increment,
-                    cumulative_potential=cumulative_potential,
-                    is_final=bool(node.context.get("is_done_thinking")),
-                    regrets=bool(node.context.get("regrets_choice")),
-                )
-            )
+    @property
+    def tokens_used(self) -> int:
+        return self.engine.tokens_used
 
-            if parent_id is not None:
-                edges.append((parent_id, node.id))
-                self._log(f"Registered edge {parent_id} -> {node.id}.")
+    @property
+    def node_count(self) -> int:
+        return self.engine.node_count
 
-            for child in reversed(node.next):
-                stack.append((child, depth + 1, node.id))
+    @staticmethod
+    def _log(message: str) -> None:
+        print(f"[ThinkingManager] {message}")
 
-        self._log(f"Collected {len(nodes)} nodes and {len(edges)} edges for graph.")
-        return nodes, edges, root
+    @staticmethod
+    def _wrap_label(text: str, width: int = 42) -> str:
+        if not text:
+            return "No content"
+        return textwrap.fill(" ".join(text.split()), width=width)
 
-    def _render_thought_graph(self) -> Optional[Path]:
-        try:
-            nodes, edges, root = self._collect_graph_data()
-        except Exception as exc:
-            self._log(f"Unable to collect thought graph data: {exc}")
+    def _load_stored_tree(self) -> Optional[list]:
+        """The nodes of this request's newest complete stored run, parents first, or ``None``."""
+        if not TREE_STORE or REUSE_MAX_AGE <= 0:
             return None
+        from django.db import DatabaseError
+        from reasoning.models import ReasoningRun
 
-        if not nodes:
-            self._log("No nodes available for thought graph rendering.")
+        try:
+            run = ReasoningRun.objects.reusable(self.request_hash, max_age=REUSE_MAX_AGE).first()
+            return (list(run.nodes.all()) or None) if run is not None else None
+        except DatabaseError as exc:
+            self._log(f"Unable to read stored thought trees: {exc}")
             return None
 
-        if getattr(root, "_graph_cached_path", None):
-            self._log("Using cached thought graph path.")
-            return root._graph_cached_path  # type: ignore[attr-defined]
+    def _replay(self, stored: list) -> None:
+        self.engine.replay(stored)
+        self.reused_run_id = str(stored[0].run_id)
+        self._log(f"Reused stored thought tree {self.reused_run_id} with {self.node_count} nodes.")
+
+    def _load_similar_tree(self) -> Optional[Tuple[list, float, bool]]:
+        """
+        The nodes of the stored run whose root enquiry is most similar to this
+        message among those searched with this request's settings, the
+        similarity, and whether the run is recent enough to reuse
+        (``REASONING_REUSE_MAX_AGE``); ``None`` below the seed threshold.
+        Indexed runs that have since been deleted are dropped from the index.
+        """
+        if not (WARM_START and TREE_STORE):
+            return None
+        from reasoning.models import ReasoningNode, ReasoningRun
 
-        graphs_dir = Path(__file__).resolve().parent / "graphs"
-        output_path = graphs_dir / f"thought_graph_{root.id}.png"
+        from .warm_start import get_warm_start_index
 
         try:
-            self._log(f"Rendering thought graph to {output_path}.")
-            render_thought_graph(nodes, edges, output_path)
-            self._log(f"Thought graph successfully saved to {output_path}.")
-        except RuntimeError as exc:
-            self._log(f"Unable to render thought graph: {exc}")
-            return None
+            with telemetry.span("warm_start", tree_id=self.id) as attributes:
+                index = get_warm_start_index()
+                hits = index.matches(str(self.message), _stored_enquiries)
+                if not hits:
+                    return None
+                found = ReasoningRun.objects.filter(pk__in=[run_id for run_id, _ in hits])
+                search_hashes = {str(run_id): value for run_id, value in found.values_list("id", "search_hash")}
+                deleted = [run_id for run_id, _ in hits if run_id not in search_hashes]
+                if deleted:
+                    index.discard(deleted)
+                match = next((hit for hit in hits if search_hashes.get(hit[0]) == self.search_hash), None)
+                if match is None:
+                    return None
+                run_id, similarity = match
+                attributes.update(run_id=run_id, similarity=similarity)
+                nodes = list(ReasoningNode.objects.filter(run_id=run_id))
+                recent = REUSE_MAX_AGE > 0 and ReasoningRun.objects.filter(pk=run_id).recent(REUSE_MAX_AGE).exists()
         except Exception as exc:
-            self._log(f"Unexpected error rendering thought graph: {exc}")
+            self._log(f"Warm start lookup failed: {exc}")
             return None
+        return (nodes, similarity, recent) if nodes else None
 
-        setattr(root, "_graph_cached_path", output_path)
-        return output_path
-
-    def build_thought_tree_prompt(self) -> str:
+    def _warm_start(self, stored: list, similarity: float, recent: bool) -> Optional[Any]:
         """
-        Builds a text representation of the entire thought process
-        by traversing up to the root, then recursively printing the tree.
+        Start from a similar request's tree. A recent one above the reuse
+        threshold is replayed whole. Otherwise this returns its first-level
+        branch that leads to its best node, to be grafted under this message's
+        own root, or ``None`` when the best node is the root itself.
         """
+        from .warm_start import get_warm_start_index
 
-        root = self
-        while root.previous is not None:
-            root = root.previous
+        if recent and similarity >= get_warm_start_index().reuse_threshold:
+            self._log(f"Question matches a stored thought tree (similarity {similarity:.2f}).")
+            self._replay(stored)
+            return None
 
-        output_lines = []
-        self._build_tree_recursive(root, 0, output_lines)
-        print("\n".join(output_lines))
-        return "\n".join(output_lines)
+        by_id = {record.id: record for record in stored}
+        best = max(stored, key=lambda record: record.cumulative_potential)
+        path = [best]
+        while path[-1].parent_id in by_id:
+            path.append(by_id[path[-1].parent_id])
+        if len(path) < 2:
+            return None
+        self._log(
+            f"Question resembles stored thought tree {path[-1].run_id} (similarity {similarity:.2f}); "
+            f"seeding branch '{path[-2].branch_label}'."
+        )
+        return path[-2]
 
-    def _build_tree_recursive(self, node: "ThinkingManager", depth: int, output_lines: list):
+    def _graft(self, branch: Any) -> None:
         """
-        Recursively traverses the thought tree and build the string.
+        Put a similar request's stored branch under this tree's freshly
+        evaluated root. Its enquiry is replaced by this message's, since its
+        plan and summary are only a starting point for this question.
         """
-        if node.context is None:
+        root = self.root
+        if root.context is None or self.engine.done:
             return
+        branch.context = {**branch.context, "user_enquiry": root.context.get("user_enquiry", "")}
+        self.engine.graft(root, branch)
+        self.seeded_from_run_id = str(branch.run_id)
 
-        indent = "  " * depth
-        plan = node.context.get("steps_for_completion", "No plan generated.")
-        setbacks = node.context.get("possible_setbacks", "")
-        regrets = node.context.get("regrets_choice", False)
-        branch_label = node.context.get("branch_label", getattr(node, "branch_label", "Branch"))
-        probability = self._to_float(
-            node.context.get("probability_of_success"),
-            default=0.0,
-            clamp=(0.0, 1.0),
-        )
-        potential_increment = self._to_float(
-            node.context.get("potential_increment", node.context.get("potential_score")),
-            default=0.0,
-        )
-        cumulative_potential = self._to_float(
-            node.context.get("cumulative_potential"),
-            default=getattr(node, "cumulative_potential", 0.0),
+    def _store_tree(self) -> None:
+        """Write the finished tree to the reasoning app's tables. A database error is logged, not raised."""
+        if not TREE_STORE:
+            return
+        from django.db import DatabaseError
+        from reasoning.models import ReasoningNode, ReasoningRun
+
+        evaluated = list(self._evaluated_nodes())
+        if not evaluated:
+            return
+        run = ReasoningRun(
+            id=self.id,
+            request_hash=self.request_hash,
+            search_hash=self.search_hash,
+            message=str(self.message),
+            strategy=self.engine.strategy.describe(),
+            stop_reason=self.stop_reason or "",
+            complete=self.engine.whole,
+            node_count=len(evaluated),
+            tokens_used=self.tokens_used,
         )
+        nodes = []
+        for position, node in enumerate(evaluated):
+            parent = node.previous
+            context = node.context
+            nodes.append(
+                ReasoningNode(
+                    id=node.id,
+                    run=run,
+                    parent_id=parent.id if parent is not None else None,
+                    position=position,
+                    depth=node.depth,
+                    branch_label=node.branch_label,
+                    plan=str(context.get("steps_for_completion") or ""),
+                    setbacks=str(context.get("possible_setbacks") or ""),
+                    summary=node.summary_text or "",
+                    probability=node.probability_of_success,
+                    potential_increment=node.potential_increment,
+                    cumulative_potential=node.cumulative_potential,
+                    is_final=bool(context.get("is_done_thinking")),
+                    regrets=bool(context.get("regrets_choice")),
+                    tokens=node.node_tokens,
+                    context=context,
+                )
+            )
+        try:
+            with telemetry.span("store", tree_id=self.id, nodes=len(nodes)):
+                run.save_tree(nodes)
+        except DatabaseError as exc:
+            self._log(f"Unable to store thought tree: {exc}")
+            return
+
+        if WARM_START and run.complete:
+            from .warm_start import get_warm_start_index
+
+            try:
+                get_warm_start_index().add(str(run.id), str(self.root.context.get("user_enquiry") or ""))
+            except Exception as exc:
+                self._log(f"Unable to index thought tree for warm starts: {exc}")
+
+    def _record_node(self, node: Node) -> None:
+        """
+        Render an evaluated node's prompt line and graph node as it completes,
+        so finishing the tree only has to join them, then pass it on to ``on_node``.
+        """
+        if node.context is not None:
+            self._rendered[node.id] = (self._tree_line(node), self._thought_node(node))
+        if self._on_node is not None:
+            self._on_node(node)
+
+    @staticmethod
+    def _tree_line(node: Node) -> str:
+        context = node.context
+        plan = context.get("steps_for_completion", "No plan generated.")
+        setbacks = context.get("possible_setbacks", "")
 
         prefix = ""
-        if regrets:
+        if context.get("regrets_choice", False):
             prefix = "[REGRETTED] "
-        elif node.context.get("is_done_thinking", False):
+        elif context.get("is_done_thinking", False):
             prefix = "[FINAL] "
 
-        detail_parts = [f"Branch: {branch_label}", f"Plan: {plan}"]
+        detail_parts = [f"Branch: {node.branch_label}", f"Plan: {plan}"]
         if setbacks:
             detail_parts.append(f"Setbacks: {setbacks}")
-        detail_parts.append(f"Prob={probability:.2f}")
-        detail_parts.append(f"ΔPotential={potential_increment:+.2f}")
-        detail_parts.append(f"Cumulative={cumulative_potential:.2f}")
+        detail_parts.append(f"Prob={node.probability_of_success:.2f}")
+        detail_parts.append(f"ΔPotential={node.potential_increment:+.2f}")
+        detail_parts.append(f"Cumulative={node.cumulative_potential:.2f}")
         detail = " | ".join(detail_parts)
 
-        output_lines.append(f"{indent}{prefix}Thought (ID: {node.id}, Depth: {depth}): {detail}")
+        return f"{'  ' * node.depth}{prefix}Thought (ID: {node.id}, Depth: {node.depth}): {detail}"
+
+    @classmethod
+    def _thought_node(cls, node: Node) -> ThoughtNode:
+        context = node.context
+        detail_parts = [context.get("steps_for_completion", "No plan generated.")]
+        setbacks = context.get("possible_setbacks", "")
+        if setbacks:
+            detail_parts.append(f"Setbacks: {setbacks}")
+
+        return ThoughtNode(
+            id=node.id,
+            depth=node.depth,
+            label=cls._wrap_label("\n".join(detail_parts)),
+            branch_label=node.branch_label,
+            probability=node.probability_of_success,
+            potential_increment=node.potential_increment,
+            cumulative_potential=node.cumulative_potential,
+            is_final=bool(context.get("is_done_thinking")),
+            regrets=bool(context.get("regrets_choice")),
+        )
+
+    def _evaluated_nodes(self) -> Iterator[Node]:
+        """The rendered nodes in depth-first order, parents before children."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.id not in self._rendered:
+                continue  # Failed or cancelled: the node and its subtree are left out.
+            yield node
+            stack.extend(reversed(node.children))
 
-        for child_node in node.next:
-            self._build_tree_recursive(child_node, depth + 1, output_lines)
+    def _finalised(self) -> Tuple[str, list[ThoughtNode], list[tuple[str, str]]]:
+        """
+        The tree text, graph nodes and edges in depth-first order, joined from
+        the per-node renderings. Cached once the search is over.
+        """
+        if self._final is not None:
+            return self._final
+
+        lines: list[str] = []
+        nodes: list[ThoughtNode] = []
+        edges: list[tuple[str, str]] = []
+        for node in self._evaluated_nodes():
+            line, thought_node = self._rendered[node.id]
+            lines.append(line)
+            nodes.append(thought_node)
+            parent = node.previous
+            if parent is not None:
+                edges.append((parent.id, node.id))
+
+        finalised = ("\n".join(lines), nodes, edges)
+        if self.engine.done:
+            self._final = finalised
+        return finalised
+
+    def _collect_graph_data(self):
+        with telemetry.span("graph_collect", tree_id=self.id) as attributes:
+            _, nodes, edges = self._finalised()
+            attributes["nodes"] = len(nodes)
+        self._log(f"Collected {len(nodes)} nodes and {len(edges)} edges for graph.")
+        return nodes, edges
+
+    def _queue_thought_graph(self) -> Optional[str]:
+        """Hand the tree to the background renderer and return its graph ID."""
+        if self.graph_id:
+            self._log("Thought graph already queued.")
+            return self.graph_id
+
+        try:
+            nodes, edges = self._collect_graph_data()
+        except Exception as exc:
+            self._log(f"Unable to collect thought graph data: {exc}")
+            return None
+
+        if not nodes:
+            self._log("No nodes available for thought graph rendering.")
+            return None
+
+        store = get_graph_store()
+        graph_id = graph_key(nodes, edges)
+        if store.exists(graph_id):
+            self._log(f"Thought graph {graph_id} already rendered.")
+        else:
+            try:
+                queued = render_queue.submit(store, graph_id, nodes, edges)
+            except Exception as exc:
+                self._log(f"Unable to queue thought graph: {exc}")
+                return None
+            if not queued:
+                self._log("Thought graph rendering is disabled.")
+                return None
+            self._log(f"Queued thought graph {graph_id} for rendering.")
+
+        return graph_id
+
+    def build_thought_tree_prompt(self) -> str:
+        """
+        Builds a text representation of the entire thought process,
+        one line per evaluated thought, indented by depth.
+        """
+        text, nodes, _ = self._finalised()
+        self._log(f"Thought tree prompt covers {len(nodes)} thoughts ({len(text)} characters).")
+        return text
 
     def generate_self_prompt(self):
         thought_tree_string = self.build_thought_tree_prompt()
+        original_user_message = self.message
 
-        root = self
-        while root.previous is not None:
-            root = root.previous
-        original_user_message = root.message
-
-        graph_path = self._render_thought_graph()
-        if graph_path is not None:
-            self.graph_path = graph_path
-            self._log(f"Graph path stored on manager: {graph_path}")
+        graph_id = self._queue_thought_graph()
+        if graph_id is not None:
+            self.graph_id = graph_id
+            self.graph_path = get_graph_store().path_for(graph_id)
+            self._log(f"Graph ID stored on manager: {graph_id}")
 
         return f"""
         [ ORIGINAL USER MESSAGE ]
@@ -0,0 +1,521 @@
+"""
+Explicit-state engine that grows a thought tree.
+
+``TreeEngine`` owns the search: the ``NodeStore`` holding the tree, a frontier
+queue of evaluated nodes that may still branch, and the tree's budgets and stop
+reason. ``step`` evaluates one round (the root first, then the children of the
+nodes the strategy picks), so a caller can run the search to the end, pause it
+between rounds and resume it later, or cancel it. Rounds are evaluated by a
+pluggable ``NodeExecutor``; ``ThinkingManager`` supplies the ones that run the
+C++ thinker.
+
+Executors report back through ``absorb_analysis``, ``complete``, ``fail`` and
+``cancel_node``, which may be called from worker threads.
+
+Node text lives on ``Node`` objects (``__slots__``). The numeric fields the
+search ranks and sums (parent, depth, scores) are array-backed columns of the
+store, so large trees stay compact.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from array import array
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+from providentia_network import telemetry
+
+from .limits import Interrupt, ThinkingLimits
+from .search import BreadthFirstStrategy, SearchStrategy
+
+# The root, its branches and their branches; deeper nodes are never expanded.
+MAX_BRANCH_DEPTH = 2
+BRANCH_SUFFIXES = ("A", "B")
+
+
+def to_float(value: Any, default: float = 0.0, clamp: Optional[Tuple[float, float]] = None) -> float:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return default
+
+    if clamp is not None:
+        low, high = clamp
+        if low is not None:
+            result = max(low, result)
+        if high is not None:
+            result = min(high, result)
+    return result
+
+
+def _log(message: str) -> None:
+    print(f"[ThinkingManager] {message}")
+
+
+class Node:
+    """One thought of the tree. Its scores are columns of the owning ``NodeStore``."""
+
+    __slots__ = (
+        "_store", "index", "id", "branch_label", "summary_text", "iteration", "context",
+        "children", "node_tokens", "analysed", "notified", "cancelled", "expanded",
+    )
+
+    def __init__(self, store: "NodeStore", index: int, branch_label: str, summary_text: str, iteration: int):
+        self._store = store
+        self.index = index
+        self.id = str(uuid.uuid4())
+        self.branch_label = branch_label
+        self.summary_text = summary_text
+        self.iteration = iteration
+        self.context: Optional[dict[str, Any]] = None
+        self.children: list[Node] = []
+        self.node_tokens = 0
+        self.analysed = False
+        self.notified = False
+        self.cancelled = False
+        self.expanded = False
+
+    def __repr__(self) -> str:
+        return f"<Node {self.branch_label} {self.id}>"
+
+    @property
+    def previous(self) -> Optional["Node"]:
+        parent = self._store.parent[self.index]
+        return self._store.nodes[parent] if parent >= 0 else None
+
+    @property
+    def depth(self) -> int:
+        return self._store.depth[self.index]
+
+    @property
+    def probability_of_success(self) -> float:
+        return self._store.probability[self.index]
+
+    @probability_of_success.setter
+    def probability_of_success(self, value: float) -> None:
+        self._store.probability[self.index] = value
+
+    @property
+    def potential_increment(self) -> float:
+        return self._store.potential[self.index]
+
+    @potential_increment.setter
+    def potential_increment(self, value: float) -> None:
+        self._store.potential[self.index] = value
+
+    @property
+    def cumulative_potential(self) -> float:
+        return self._store.cumulative[self.index]
+
+    @cumulative_potential.setter
+    def cumulative_potential(self, value: float) -> None:
+        self._store.cumulative[self.index] = value
+
+
+class NodeStore:
+    """The nodes of one tree, in creation order, with their numeric fields as typed arrays."""
+
+    def __init__(self) -> None:
+        self.nodes: list[Node] = []
+        self.by_id: dict[str, Node] = {}
+        self.parent = array("i")
+        self.depth = array("i")
+        self.probability = array("d")
+        self.potential = array("d")
+        self.cumulative = array("d")
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.nodes)
+
+    def get(self, node_id: str) -> Optional[Node]:
+        return self.by_id.get(node_id)
+
+    def add(self, branch_label: str, summary_text: str, iteration: int, parent: Optional[Node] = None) -> Node:
+        """Create a node; a child starts from its parent's cumulative potential."""
+        node = Node(self, len(self.nodes), branch_label, summary_text, iteration)
+        self.nodes.append(node)
+        self.by_id[node.id] = node
+        if parent is None:
+            self.parent.append(-1)
+            self.depth.append(0)
+            self.cumulative.append(0.0)
+        else:
+            self.parent.append(parent.index)
+            self.depth.append(self.depth[parent.index] + 1)
+            self.cumulative.append(self.cumulative[parent.index])
+            parent.children.append(node)
+        self.probability.append(0.0)
+        self.potential.append(0.0)
+        return node
+
+
+class NodeExecutor:
+    """Evaluates a round of nodes on the calling thread, blocking until the round is settled."""
+
+    def run_round(self, engine: "TreeEngine", nodes: Sequence[Node]) -> None:
+        raise NotImplementedError
+
+
+class AsyncNodeExecutor:
+    """Evaluates a round of nodes on the running event loop."""
+
+    async def arun_round(self, engine: "TreeEngine", nodes: Sequence[Node]) -> None:
+        raise NotImplementedError
+
+
+class TreeEngine:
+    def __init__(
+        self,
+        message,
+        executor,
+        iteration: int = 0,
+        summarized_thought: str = "",
+        branch_label: str = "Primary",
+        on_node: Optional[Callable[[Node], None]] = None,
+        strategy: Optional[SearchStrategy] = None,
+        limits: Optional[ThinkingLimits] = None,
+    ):
+        """
+        Prepare a tree whose root thinks about ``message``. Nothing is
+        evaluated until ``run``, ``arun`` or ``step``; the deadline in
+        ``limits`` counts from now.
+        """
+        self.message = message
+        self.executor = executor
+        self.on_node = on_node
+        self.strategy = strategy or BreadthFirstStrategy()
+        self.limits = limits or ThinkingLimits()
+        self.store = NodeStore()
+        self.root = self.store.add(branch_label, summarized_thought, iteration + 1)
+        self.id = self.root.id
+        self.frontier: list[Node] = []
+        self.started_at = time.monotonic()
+        self.interrupt = Interrupt(
+            self.started_at + self.limits.deadline_seconds
+            if self.limits.deadline_seconds is not None
+            else None
+        )
+        self.stop_reason: Optional[str] = None
+        self.interrupted = False
+        self.failures = 0
+        self.tokens_used = 0
+        self.node_count = 1
+        self.paused = False
+        self._started = False
+        self._budget_stop: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        """Whether the search is over: a limit stopped it or the frontier ran dry."""
+        return self.limit_reached() or (self._started and not self.frontier)
+
+    @property
+    def whole(self) -> bool:
+        """
+        Whether the tree is the search's full result: no deadline or
+        cancellation cut it short and no evaluation failed. Nodes dropped
+        because a budget ran out do not count against it.
+        """
+        return not self.interrupted and not self.failures
+
+    def step(self) -> bool:
+        """Evaluate the next round. Returns whether the search has more to do."""
+        if not isinstance(self.executor, NodeExecutor):
+            raise TypeError(f"{type(self.executor).__name__} is asynchronous; use astep or arun.")
+        if self.done:
+            return False
+        nodes = self._next_round()
+        if nodes:
+            self.executor.run_round(self, nodes)
+            self._extend_frontier(nodes)
+        self._settle_round()
+        return not self.done
+
+    async def astep(self) -> bool:
+        """``step`` for the event loop; a synchronous executor runs in a worker thread."""
+        if self.done:
+            return False
+        nodes = self._next_round()
+        if nodes:
+            if isinstance(self.executor, AsyncNodeExecutor):
+                await self.executor.arun_round(self, nodes)
+            else:
+                await asyncio.to_thread(self.executor.run_round, self, nodes)
+            self._extend_frontier(nodes)
+        self._settle_round()
+        return not self.done
+
+    def run(self) -> "TreeEngine":
+        """Evaluate rounds until the search ends or ``pause`` is called."""
+        self.paused = False
+        with self._search_span():
+            while not self.paused and self.step():
+                pass
+        self._finish()
+        return self
+
+    async def arun(self) -> "TreeEngine":
+        self.paused = False
+        with self._search_span():
+            while not self.paused and await self.astep():
+                pass
+        self._finish()
+        return self
+
+    def pause(self) -> None:
+        """Stop after the round in flight; ``run`` again to resume."""
+        self.paused = True
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """End the search and kill thinker runs that are still in flight."""
+        self.interrupted = True
+        self.stop(reason)
+
+    def replay(self, records: Iterable[Any]) -> None:
+        """
+        Rebuild a finished tree from stored nodes instead of searching.
+        ``records`` list parents first; each has ``id``, ``parent_id`` (``None``
+        for the root), ``branch_label``, ``summary``, ``context``,
+        ``probability``, ``potential_increment``, ``cumulative_potential`` and
+        ``tokens``. Every node is reported to ``on_node`` as if just evaluated.
+        """
+        nodes: dict[Any, Node] = {}
+        for record in records:
+            if record.parent_id is None:
+                node = self.root
+                node.summary_text = record.summary or node.summary_text
+            elif record.parent_id in nodes:
+                parent = nodes[record.parent_id]
+                node = self.store.add(record.branch_label, record.summary, parent.iteration + 1, parent=parent)
+                self.node_count += 1
+            else:
+                continue  # Its parent was not stored.
+            node.context = dict(record.context)
+            node.probability_of_success = record.probability
+            node.potential_increment = record.potential_increment
+            node.cumulative_potential = record.cumulative_potential
+            node.node_tokens = record.tokens
+            self.tokens_used += record.tokens
+            node.analysed = node.expanded = True
+            nodes[record.id] = node
+            self.notify(node)
+        self._started = True
+        self.frontier.clear()
+
+    def graft(self, parent: Node, record: Any) -> Node:
+        """
+        Attach a stored node (a ``replay`` record) as the only child of the
+        evaluated ``parent``, and search on from it instead of expanding
+        ``parent``. Its cumulative potential is re-accumulated from ``parent``;
+        its tokens were spent by an earlier run, so they are not counted.
+        """
+        node = self.store.add(record.branch_label, record.summary, parent.iteration + 1, parent=parent)
+        with self._lock:
+            self.node_count += 1
+        node.probability_of_success = record.probability
+        node.potential_increment = record.potential_increment
+        node.cumulative_potential = parent.cumulative_potential + record.potential_increment
+        context = dict(record.context)
+        context["cumulative_potential"] = node.cumulative_potential
+        node.context = context
+        node.analysed = True
+        parent.expanded = True
+        if parent in self.frontier:
+            self.frontier.remove(parent)
+        self.notify(node)
+        self._extend_frontier([node])
+        return node
+
+    @contextmanager
+    def _search_span(self) -> Iterator[None]:
+        if not self._started:
+            _log(f"Searching thought tree with strategy '{self.strategy.describe()}'.")
+        with telemetry.span("search", tree_id=self.id, strategy=self.strategy.describe()) as attributes:
+            yield
+            attributes.update(nodes=self.node_count, tokens=self.tokens_used, stop_reason=self.stop_reason)
+
+    def _finish(self) -> None:
+        if self.done:
+            _log(f"Search finished with {self.node_count} nodes.")
+        else:
+            _log(f"Search paused with {self.node_count} nodes and {len(self.frontier)} on the frontier.")
+
+    # Scheduling
+
+    def _next_round(self) -> list[Node]:
+        """
+        The nodes to evaluate next: the root on the first round, then the
+        (not yet evaluated) children of the nodes the strategy picks from the
+        frontier, trimmed to the remaining node budget.
+        """
+        if not self._started:
+            self._started = True
+            return [self.root]
+
+        batch = self.strategy.select(self.frontier)
+        max_nodes = self.limits.max_nodes
+        children: list[Node] = []
+        for parent in batch:
+            for child_label, branch_summary in self._child_specs(parent):
+                if max_nodes is not None and self.node_count >= max_nodes:
+                    # The children already built are evaluated in full; the
+                    # search stops once their round is settled (see ``_settle_round``).
+                    self._budget_stop = f"node budget of {max_nodes} reached"
+                    self.frontier.clear()
+                    return children
+                children.append(
+                    self.store.add(child_label, branch_summary, parent.iteration + 1, parent=parent)
+                )
+                with self._lock:
+                    self.node_count += 1
+            parent.expanded = True
+        return children
+
+    def _settle_round(self) -> None:
+        """Apply a node budget reached while the round was built, now that nothing is in flight."""
+        if self._budget_stop is not None:
+            self.stop(self._budget_stop)
+            self._budget_stop = None
+            self.frontier.clear()
+
+    def _extend_frontier(self, nodes: Sequence[Node]) -> None:
+        self.frontier.extend(node for node in nodes if self._can_expand(node))
+
+    def _can_expand(self, node: Node) -> bool:
+        """Whether an evaluated node belongs on the frontier."""
+        if node.context is None or node.expanded:
+            return False
+        if node is not self.root and node.context.get("is_done_thinking", False):
+            return False
+        if node.iteration >= self.limits.max_iterations or node.depth >= MAX_BRANCH_DEPTH:
+            return False
+        if self.strategy.prune_regrets and node.context.get("regrets_choice", False):
+            _log(f"Pruning regretted branch '{node.branch_label}' (ID: {node.id}).")
+            return False
+        return True
+
+    def _child_specs(self, node: Node) -> list[Tuple[str, str]]:
+        """``(branch_label, summary)`` pairs for the children of ``node``."""
+        base_summary = (node.summary_text or "").strip()
+        child_specs = []
+        for suffix in BRANCH_SUFFIXES:
+            child_label = f"{node.branch_label}-{suffix}".strip("-")
+            branch_summary = (
+                f"{base_summary}\nBranch {child_label}: explore an alternate path distinct from other branches. "
+                f"Parent cumulative potential: {node.cumulative_potential:.2f}. "
+                f"Focus on a unique strategy with a quantified probability of success."
+            ).strip()
+            _log(f"Spawning branch '{child_label}' from parent '{node.branch_label}' (ID: {node.id}).")
+            child_specs.append((child_label, branch_summary))
+        return child_specs
+
+    # Executor callbacks
+
+    def absorb_analysis(self, node: Node, context: dict[str, Any]) -> None:
+        """Take a node's validated analysis, derive its scores and check the good-enough stop."""
+        node.probability_of_success = to_float(
+            context.get("probability_of_success"),
+            default=0.0,
+            clamp=(0.0, 1.0),
+        )
+        node.potential_increment = to_float(context.get("potential_score"), default=0.0)
+        node.cumulative_potential += node.potential_increment
+
+        context["probability_of_success"] = node.probability_of_success
+        context["potential_increment"] = node.potential_increment
+        context["potential_score"] = node.potential_increment
+        context["cumulative_potential"] = node.cumulative_potential
+        context["branch_label"] = node.branch_label
+        node.context = context
+
+        _log(
+            f"Evaluated branch '{node.branch_label}' (ID: {node.id}) | "
+            f"Prob: {node.probability_of_success:.2f} | "
+            f"ΔPotential: {node.potential_increment:+.2f} | "
+            f"Cumulative: {node.cumulative_potential:.2f}"
+        )
+        node.analysed = True
+        self._check_good_enough(node)
+
+    def complete(self, node: Node, summary: str, tokens: int) -> None:
+        """Finish an analysed node with its summary and count its tokens against the budget."""
+        node.summary_text = summary or node.summary_text
+        node.node_tokens = tokens
+        with self._lock:
+            self.tokens_used += tokens
+            used = self.tokens_used
+        if self.limits.max_tokens is not None and used >= self.limits.max_tokens:
+            self.stop(f"token budget of {self.limits.max_tokens} reached")
+        self.notify(node)
+
+    def fail(self, node: Node) -> None:
+        """Record a failed evaluation. A node whose analysis already arrived keeps it."""
+        with self._lock:
+            self.failures += 1
+        if not node.analysed:
+            node.context = None
+        self.notify(node)
+
+    def cancel_node(self, node: Node) -> None:
+        """
+        Handle a cancelled evaluation. A pipelined node whose analysis already
+        arrived keeps it (and its parent's summary) as a leaf; anything else is discarded.
+        """
+        if not node.analysed:
+            self.discard(node)
+            return
+        _log(f"Kept analysed branch '{node.branch_label}' (ID: {node.id}) without its summary.")
+        self.notify(node)
+
+    def discard(self, node: Node) -> None:
+        """Drop a node whose evaluation was cancelled so it never reaches the tree output."""
+        node.cancelled = True
+        node.context = None
+        parent = node.previous
+        with self._lock:
+            if parent is not None and node in parent.children:
+                parent.children.remove(node)
+                self.node_count -= 1
+        _log(f"Cancelled branch '{node.branch_label}' (ID: {node.id}).")
+
+    def notify(self, node: Node) -> None:
+        """Report a node to ``on_node`` once it has been evaluated."""
+        if self.on_node is None or node.notified:
+            return
+        node.notified = True
+        try:
+            self.on_node(node)
+        except Exception as exc:
+            _log(f"Node callback failed for branch '{node.branch_label}': {exc}")
+
+    # Limits
+
+    def _check_good_enough(self, node: Node) -> None:
+        threshold = self.limits.good_enough_probability
+        if (
+            threshold is not None
+            and node.context.get("is_done_thinking")
+            and node.probability_of_success >= threshold
+        ):
+            self.stop(f"branch '{node.branch_label}' reached probability {node.probability_of_success:.2f}")
+
+    def stop(self, reason: str) -> None:
+        """Stop the whole search and cancel thinker runs that are still in flight."""
+        with self._lock:
+            if self.stop_reason is not None:
+                return
+            self.stop_reason = reason
+        _log(f"Stopping search: {reason}.")
+        self.interrupt.cancel()
+
+    def limit_reached(self) -> bool:
+        if self.stop_reason is None and self.interrupt.triggered():
+            self.interrupted = True
+            self.stop(f"deadline of {self.limits.deadline_seconds:g}s reached")
+        return self.stop_reason is not None
@@ -0,0 +1,99 @@
+"""
+Per-request budgets for a thought tree.
+
+Every field left as ``None`` is unbounded. ``capped`` applies the server-side
+ceilings from ``settings.DEEPTHINK_LIMITS`` so a client can only ask for less.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Callable, Optional
+
+
+@dataclass(frozen=True)
+class ThinkingLimits:
+    max_nodes: Optional[int] = None
+    deadline_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+    good_enough_probability: Optional[float] = None
+    max_iterations: int = 8
+
+    def capped(self, ceiling: "ThinkingLimits") -> "ThinkingLimits":
+        values = {}
+        for field in fields(self):
+            requested = getattr(self, field.name)
+            limit = getattr(ceiling, field.name)
+            if field.name == "good_enough_probability":
+                # A threshold is a stopping rule, not a cost; the client's wins.
+                values[field.name] = requested if requested is not None else limit
+            elif requested is None:
+                values[field.name] = limit
+            elif limit is None:
+                values[field.name] = requested
+            else:
+                values[field.name] = min(requested, limit)
+        return ThinkingLimits(**values)
+
+
+class Interrupt:
+    """
+    Cancellation flag plus optional monotonic deadline shared by a tree's
+    in-flight thinker runs. Runs register a callback instead of polling; one
+    timer per tree turns the deadline into a cancel while callbacks are waiting.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.cancelled = threading.Event()
+        self._callbacks: list[Callable[[], None]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        for callback in callbacks:
+            callback()
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def triggered(self) -> bool:
+        return self.cancelled.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call ``callback`` once the interrupt fires, from whichever thread fires
+        it (at once if it already has). Returns a function that unregisters it.
+        """
+        with self._lock:
+            pending = not self.triggered()
+            if pending:
+                self._callbacks.append(callback)
+                if self.deadline is not None and self._timer is None:
+                    self._timer = threading.Timer(self.remaining(), self.cancel)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if not pending:
+            callback()
+            return lambda: None
+
+        def remove() -> None:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+                if self._callbacks or self._timer is None:
+                    return
+                timer, self._timer = self._timer, None
+            timer.cancel()
+
+        return remove
@@ -0,0 +1,72 @@
+"""
+Gemini ``responseSchema`` generation from Pydantic models.
+
+Gemini accepts an OpenAPI schema subset rather than JSON Schema: upper-case
+type names, ``nullable`` instead of ``anyOf`` with ``null``, only the
+``date-time`` and ``enum`` string formats, and no ``title``/``default``.
+"""
+
+from typing import Any, Iterable, Optional
+
+from pydantic import BaseModel
+
+_GEMINI_TYPES = {
+    "string": "STRING",
+    "number": "NUMBER",
+    "integer": "INTEGER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT",
+}
+_GEMINI_STRING_FORMATS = {"date-time", "enum"}
+
+
+def _convert(prop: dict[str, Any]) -> dict[str, Any]:
+    variants = prop.get("anyOf")
+    if variants:
+        concrete = [variant for variant in variants if variant.get("type") != "null"]
+        if len(concrete) != 1:
+            raise ValueError(f"Gemini schemas cannot express a union of {len(concrete)} types.")
+        converted = _convert({**prop, **concrete[0], "anyOf": None})
+        if len(concrete) != len(variants):
+            converted["nullable"] = True
+        return converted
+
+    json_type = prop.get("type")
+    if json_type not in _GEMINI_TYPES:
+        raise ValueError(f"Unsupported JSON schema type for Gemini: {json_type!r}.")
+    schema: dict[str, Any] = {"type": _GEMINI_TYPES[json_type]}
+    if prop.get("description"):
+        schema["description"] = prop["description"]
+    if prop.get("format") in _GEMINI_STRING_FORMATS:
+        schema["format"] = prop["format"]
+    if "enum" in prop:
+        schema["enum"] = [str(value) for value in prop["enum"]]
+    if json_type == "array" and "items" in prop:
+        schema["items"] = _convert(prop["items"])
+    return schema
+
+
+def gemini_response_schema(
+    model: type[BaseModel],
+    extra_properties: Optional[dict[str, dict[str, Any]]] = None,
+    optional: Iterable[str] = (),
+) -> dict[str, Any]:
+    """
+    Build a Gemini ``responseSchema`` for a flat Pydantic model.
+
+    Every field is required unless named in ``optional``: a field with a
+    default would otherwise let the model skip it and silently take the
+    default. ``extra_properties`` (already in Gemini form) are appended as
+    required fields the model does not declare.
+    """
+    json_schema = model.model_json_schema()
+    properties = {name: _convert(prop) for name, prop in json_schema["properties"].items()}
+    properties.update(extra_properties or {})
+    skipped = set(optional)
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": [name for name in properties if name not in skipped],
+        "propertyOrdering": list(properties),
+    }
@@ -0,0 +1,83 @@
+"""
+Search strategies deciding which evaluated thoughts get expanded next.
+
+A strategy receives the current frontier (evaluated nodes that may still
+branch) and removes and returns the nodes to expand in the next round. Nodes it
+leaves in the frontier can be picked in a later round; nodes it drops are
+pruned for good.
+"""
+
+from typing import Optional
+
+
+class SearchStrategy:
+    """Exhaustive breadth-first expansion: every frontier node, level by level."""
+
+    name = "bfs"
+    # Breadth-first keeps today's behaviour and still expands regretted branches.
+    prune_regrets = False
+
+    def select(self, frontier: list) -> list:
+        batch = list(frontier)
+        frontier.clear()
+        return batch
+
+    def describe(self) -> str:
+        return self.name
+
+
+BreadthFirstStrategy = SearchStrategy
+
+
+class BestFirstStrategy(SearchStrategy):
+    """Expand the single most promising node (highest cumulative potential) per round."""
+
+    name = "best_first"
+    prune_regrets = True
+
+    def select(self, frontier: list) -> list:
+        if not frontier:
+            return []
+        best_index = max(range(len(frontier)), key=lambda index: frontier[index].cumulative_potential)
+        return [frontier.pop(best_index)]
+
+
+class BeamSearchStrategy(SearchStrategy):
+    """Expand the ``width`` best nodes of each level and prune the rest."""
+
+    name = "beam"
+    prune_regrets = True
+
+    def __init__(self, width: int = 2):
+        if width < 1:
+            raise ValueError("Beam width must be at least 1.")
+        self.width = width
+
+    def select(self, frontier: list) -> list:
+        ranked = sorted(frontier, key=lambda node: node.cumulative_potential, reverse=True)
+        frontier.clear()
+        return ranked[: self.width]
+
+    def describe(self) -> str:
+        return f"{self.name}(width={self.width})"
+
+
+STRATEGIES = {
+    "bfs": BreadthFirstStrategy,
+    "best_first": BestFirstStrategy,
+    "beam": BeamSearchStrategy,
+}
+
+
+def get_strategy(name: Optional[str] = None, beam_width: Optional[int] = None) -> SearchStrategy:
+    """
+    Build a strategy by name (``bfs``, ``best_first`` or ``beam``).
+
+    Raises ``ValueError`` for unknown names or invalid options.
+    """
+    key = (name or "bfs").strip().lower().replace("-", "_")
+    if key not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy '{name}'. Choose one of: {', '.join(STRATEGIES)}.")
+    if key == "beam":
+        return BeamSearchStrategy(width=beam_width if beam_width is not None else 2)
+    return STRATEGIES[key]()
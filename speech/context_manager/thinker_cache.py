@@ -0,0 +1,175 @@
+"""
+Content-addressed cache for C++ thinker results.
+
+A node's output only depends on the thinker inputs (message, iteration, branch
+summary, branch label, model, summary mode) and the prompt templates compiled into the
+binary, so identical requests can reuse a previous ``(context, summary)`` pair
+instead of paying for two more Gemini calls.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+PROMPTS_SOURCE = Path(__file__).resolve().parent / "Kievan Rus" / "prompts.cpp"
+
+
+@lru_cache(maxsize=1)
+def prompt_template_version() -> str:
+    """Digest of ``prompts.cpp``; editing a prompt template invalidates every cached node."""
+    try:
+        return hashlib.sha256(PROMPTS_SOURCE.read_bytes()).hexdigest()[:16]
+    except OSError:
+        return "unknown"
+
+
+def cache_key(
+    message: str,
+    iteration: int,
+    summarized_thought: str,
+    branch_label: str,
+    model: str,
+    summary_mode: str = "separate",
+) -> str:
+    material = json.dumps(
+        [prompt_template_version(), model, summary_mode, message, iteration, summarized_thought, branch_label],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def request_hash(
+    message: str,
+    model: str,
+    summary_mode: str,
+    strategy: str,
+    limits: dict[str, Any],
+    summarized_thought: str = "",
+    branch_label: str = "Primary",
+    iteration: int = 0,
+) -> str:
+    """Key of a whole deepthink request, under which its finished tree is stored for reuse."""
+    material = json.dumps(
+        [
+            prompt_template_version(), model, summary_mode, strategy, sorted(limits.items()),
+            message, summarized_thought, branch_label, iteration,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ThinkerCache:
+    """
+    Two-tier cache: an in-process LRU with TTL, optionally backed by Redis so
+    results are shared between workers and survive restarts.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600.0, redis_url: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+    @classmethod
+    def from_env(cls) -> "ThinkerCache":
+        try:
+            max_entries = int(os.environ.get("THINKER_CACHE_SIZE", 512))
+        except ValueError:
+            max_entries = 512
+        try:
+            ttl = float(os.environ.get("THINKER_CACHE_TTL", 3600))
+        except ValueError:
+            ttl = 3600.0
+        return cls(
+            max_entries=max(0, max_entries),
+            ttl=ttl,
+            redis_url=os.environ.get("THINKER_CACHE_REDIS_URL") or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.redis_url is not None
+
+    @property
+    def uses_redis(self) -> bool:
+        return self.redis_url is not None
+
+    def _redis_client(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
+    def _redis_key(self, key: str) -> str:
+        return f"providentia:thinker:{key}"
+
+    def _remember(self, key: str, serialized: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, serialized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[dict[str, Any], str]]:
+        serialized = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, serialized = entry
+                if expires_at < time.monotonic():
+                    del self._entries[key]
+                    serialized = None
+                else:
+                    self._entries.move_to_end(key)
+
+        if serialized is None and self.uses_redis:
+            try:
+                raw = self._redis_client().get(self._redis_key(key))
+            except Exception as exc:
+                print(f"[ThinkerCache] Redis lookup failed: {exc}")
+                raw = None
+            if raw is not None:
+                serialized = raw.decode("utf-8")
+                self._remember(key, serialized)
+
+        if serialized is None:
+            return None
+        value = json.loads(serialized)
+        return value["context"], value["summary"]
+
+    def set(self, key: str, context: dict[str, Any], summary: str) -> None:
+        serialized = json.dumps({"context": context, "summary": summary}, ensure_ascii=False)
+        self._remember(key, serialized)
+        if self.uses_redis:
+            try:
+                self._redis_client().set(self._redis_key(key), serialized, ex=max(1, int(self.ttl)))
+            except Exception as exc:
+                print(f"[ThinkerCache] Redis store failed: {exc}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[ThinkerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_thinker_cache() -> ThinkerCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThinkerCache.from_env()
+        return _cache
@@ -0,0 +1,268 @@
+"""
+Semantic lookup of previous thought trees for warm-starting a deepthink.
+
+Stored runs are keyed by an exact request hash, so a reworded question never
+finds them. ``WarmStartIndex`` keeps a sentence embedding of every stored run's
+root ``user_enquiry`` in an ``EmbeddingIndex`` (a NumPy matrix of unit vectors,
+searched by cosine similarity) and returns the closest runs for a new message.
+``ThinkingManager`` seeds its tree from that run above ``seed_threshold`` and
+reuses the whole tree above ``reuse_threshold``.
+
+NumPy, torch and transformers are imported on first use; the encoder is a
+transformers model with mean pooling (``WARM_START_MODEL``). With
+``WARM_START_INDEX_PATH`` set, the matrix is saved as ``<path>.npy`` next to a
+``<path>.keys.json`` and memory-mapped when the index is loaded.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class SentenceEncoder:
+    """Mean-pooled, L2-normalised sentence embeddings from a transformers model."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_length: int = 256):
+        self.model_name = model_name
+        self.max_length = max_length
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._model is not None:
+                return
+            from transformers import AutoModel, AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModel.from_pretrained(self.model_name)
+            model.eval()
+            self._model = model
+
+    def encode(self, texts: Sequence[str]):
+        """One unit-length ``float32`` row per text."""
+        import torch
+
+        self._load()
+        batch = self._tokenizer(
+            list(texts), padding=True, truncation=True, max_length=self.max_length, return_tensors="pt"
+        )
+        with torch.no_grad():
+            hidden = self._model(**batch).last_hidden_state
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        return pooled.cpu().numpy().astype("float32")
+
+
+class EmbeddingIndex:
+    """
+    Unit vectors in a growable ``float32`` matrix, one row per key, with an
+    exact top-k cosine search (a matrix-vector product). A loaded index is
+    memory-mapped read-only until the first ``add`` copies it into memory.
+    """
+
+    def __init__(self, dimension: Optional[int] = None):
+        self.dimension = dimension
+        self.keys: list[str] = []
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, vector) -> None:
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vector.shape[0]
+            elif vector.shape[0] != self.dimension:
+                raise ValueError(f"Expected a vector of dimension {self.dimension}, got {vector.shape[0]}.")
+            count = len(self.keys)
+            if self._matrix is None or count == self._matrix.shape[0] or not self._matrix.flags.writeable:
+                grown = np.zeros((max(16, count * 2), self.dimension), dtype=np.float32)
+                if count:
+                    grown[:count] = self._matrix[:count]
+                self._matrix = grown
+            self._matrix[count] = vector / norm
+            self.keys.append(key)
+
+    def remove(self, keys: Iterable[str]) -> int:
+        """Drop the rows of ``keys``, copying the rest into memory; returns how many were dropped."""
+        drop = set(keys)
+        with self._lock:
+            keep = [row for row, key in enumerate(self.keys) if key not in drop]
+            removed = len(self.keys) - len(keep)
+            if removed:
+                self._matrix = self._matrix[keep]
+                self.keys = [self.keys[row] for row in keep]
+            return removed
+
+    def search(self, vector, k: int = 1) -> list[Tuple[str, float]]:
+        """The ``k`` most similar keys with their cosine similarity, best first."""
+        import numpy as np
+
+        with self._lock:
+            count = len(self.keys)
+            if not count or k <= 0:
+                return []
+            vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+            norm = float(np.linalg.norm(vector))
+            if norm == 0.0:
+                return []
+            scores = self._matrix[:count] @ (vector / norm)
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.keys[row], float(scores[row])) for row in top]
+
+    def save(self, path: Path) -> None:
+        """
+        Write ``<path>.npy`` and ``<path>.keys.json``, each replaced atomically;
+        an empty index deletes them.
+        """
+        import numpy as np
+
+        path = Path(path)
+        with self._lock:
+            matrix = np.ascontiguousarray(self._matrix[: len(self.keys)]) if self.keys else None
+            keys = list(self.keys)
+        matrix_path = path.with_suffix(".npy")
+        keys_path = path.with_suffix(".keys.json")
+        if matrix is None:
+            keys_path.unlink(missing_ok=True)
+            matrix_path.unlink(missing_ok=True)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{matrix_path}.tmp", "wb") as handle:
+            np.save(handle, matrix)
+        keys_tmp = Path(f"{keys_path}.tmp")
+        keys_tmp.write_text(json.dumps(keys))
+        os.replace(f"{matrix_path}.tmp", matrix_path)
+        os.replace(keys_tmp, keys_path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["EmbeddingIndex"]:
+        """The index saved at ``path``, memory-mapped, or ``None`` when it is missing or inconsistent."""
+        import numpy as np
+
+        path = Path(path)
+        try:
+            keys = json.loads(path.with_suffix(".keys.json").read_text())
+            matrix = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if matrix.ndim != 2 or matrix.shape[0] != len(keys):
+            return None
+        index = cls(dimension=matrix.shape[1])
+        index.keys = keys
+        index._matrix = matrix
+        return index
+
+
+class WarmStartIndex:
+    """
+    Similar-question lookup over stored runs: ``matches`` returns up to
+    ``candidates`` of the closest runs that clear ``seed_threshold``, so the
+    caller can skip those it cannot use and fall back to the next.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[Any] = None,
+        seed_threshold: float = 0.85,
+        reuse_threshold: float = 0.95,
+        path: Optional[Path] = None,
+        candidates: int = 16,
+    ):
+        self.encoder = encoder or SentenceEncoder()
+        self.seed_threshold = seed_threshold
+        self.reuse_threshold = reuse_threshold
+        self.candidates = candidates
+        self.path = Path(path) if path else None
+        self._index: Optional[EmbeddingIndex] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "WarmStartIndex":
+        def threshold(name: str, default: float) -> float:
+            try:
+                return float(os.environ.get(name, default))
+            except ValueError:
+                return default
+
+        return cls(
+            encoder=SentenceEncoder(os.environ.get("WARM_START_MODEL") or DEFAULT_MODEL),
+            seed_threshold=threshold("WARM_START_SEED_THRESHOLD", 0.85),
+            reuse_threshold=threshold("WARM_START_REUSE_THRESHOLD", 0.95),
+            path=os.environ.get("WARM_START_INDEX_PATH") or None,
+        )
+
+    def _ensure_index(self, enquiries: Callable[[], Iterable[Tuple[str, str]]]) -> EmbeddingIndex:
+        """Load the saved index, or embed every ``(run_id, enquiry)`` pair on first use."""
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            index = EmbeddingIndex.load(self.path) if self.path else None
+            if index is None:
+                index = EmbeddingIndex()
+                pairs = [(key, text) for key, text in enquiries() if text]
+                for start in range(0, len(pairs), 64):
+                    chunk = pairs[start:start + 64]
+                    for (key, _), vector in zip(chunk, self.encoder.encode([text for _, text in chunk])):
+                        index.add(key, vector)
+                if self.path and len(index):
+                    index.save(self.path)
+            self._index = index
+            return index
+
+    def matches(
+        self, text: str, enquiries: Callable[[], Iterable[Tuple[str, str]]]
+    ) -> list[Tuple[str, float]]:
+        """The stored runs most similar to ``text`` with their similarity, best first, above ``seed_threshold``."""
+        index = self._ensure_index(enquiries)
+        if not len(index) or not text:
+            return []
+        hits = index.search(self.encoder.encode([text])[0], k=self.candidates)
+        return [(run_id, similarity) for run_id, similarity in hits if similarity >= self.seed_threshold]
+
+    def add(self, run_id: str, enquiry: str) -> None:
+        """Index a newly stored run; a no-op until the index has been loaded."""
+        index = self._index
+        if index is None or not enquiry:
+            return
+        index.add(run_id, self.encoder.encode([enquiry])[0])
+        if self.path:
+            index.save(self.path)
+
+
+    def discard(self, run_ids: Iterable[str]) -> None:
+        """Forget deleted runs, in the loaded index or else in the saved one."""
+        with self._lock:
+            index = self._index
+            if index is None and self.path:
+                index = EmbeddingIndex.load(self.path)
+        if index is not None and index.remove(run_ids) and self.path:
+            index.save(self.path)
+
+
+_warm_start: Optional[WarmStartIndex] = None
+_warm_start_lock = threading.Lock()
+
+
+def get_warm_start_index() -> WarmStartIndex:
+    global _warm_start
+    with _warm_start_lock:
+        if _warm_start is None:
+            _warm_start = WarmStartIndex.from_env()
+        return _warm_start
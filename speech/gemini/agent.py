@@ -1,13 +1,135 @@
+import asyncio
 import os
+import threading
+import weakref
+
+# httpx and google-genai are imported on first client construction, so
+# workers that never call Gemini do not pay for them at startup.
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Connection settings shared by every Gemini request made from this process.
+GEMINI_TIMEOUT = _env_float("GEMINI_HTTP_TIMEOUT", 60.0)
+GEMINI_CONNECT_TIMEOUT = _env_float("GEMINI_HTTP_CONNECT_TIMEOUT", 10.0)
+GEMINI_MAX_CONNECTIONS = _env_int("GEMINI_HTTP_MAX_CONNECTIONS", 20)
+GEMINI_MAX_KEEPALIVE = _env_int("GEMINI_HTTP_MAX_KEEPALIVE", 10)
+GEMINI_KEEPALIVE_EXPIRY = _env_float("GEMINI_HTTP_KEEPALIVE_EXPIRY", 60.0)
+GEMINI_HTTP2 = os.environ.get("GEMINI_HTTP2", "1").lower() in {"1", "true", "yes"}
+# Root of the Gemini REST API; set to reach a local stand-in (benchmarks/fake_gemini.py).
+# The C++ thinker reads the same variable.
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "").strip() or None
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _http2_available():
+    if not GEMINI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401  (httpx needs the h2 extra for HTTP/2)
+    except ImportError:
+        return False
+    return True
+
+
+def _httpx_kwargs():
+    import httpx
+
+    return {
+        "http2": _http2_available(),
+        "timeout": httpx.Timeout(GEMINI_TIMEOUT, connect=GEMINI_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=GEMINI_MAX_KEEPALIVE,
+            keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _build_client(async_only=False):
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    options = {"timeout": int(GEMINI_TIMEOUT * 1000)}
+    if GEMINI_BASE_URL:
+        options["base_url"] = GEMINI_BASE_URL
+    if async_only:
+        options["httpx_async_client"] = httpx.AsyncClient(**_httpx_kwargs())
+    else:
+        options["httpx_client"] = httpx.Client(**_httpx_kwargs())
+    return genai.Client(http_options=types.HttpOptions(**options))
+
+
+def get_client():
+    """Return the process-wide Gemini client; its connection pool is shared by all threads."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def get_async_client():
+    """
+    Return the Gemini client whose ``aio`` API is bound to the running event loop.
+
+    Async connection pools cannot be shared between event loops, so one client
+    is kept per loop (a single one under an ASGI server).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _build_client(async_only=True)
+        _async_clients[loop] = client
+    return client
 
-from google import genai
 
 class GeminiAgent():
     def __init__(self):
-        self.client = genai.Client()
+        self.client = get_client()
 
     def generate_response(self, model_name, prompt):
         response = self.client.models.generate_content(
             model=model_name, contents=prompt
         )
         return response
+
+    def stream_response(self, model_name, prompt):
+        """
+        Yield response text as Gemini produces it. Closing the generator closes
+        the upstream stream, so no further output tokens are generated for us.
+        """
+        stream = self.client.models.generate_content_stream(
+            model=model_name, contents=prompt
+        )
+        try:
+            for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    async def agenerate_response(self, model_name, prompt):
+        response = await get_async_client().aio.models.generate_content(
+            model=model_name, contents=prompt
+        )
+        return response
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from speech.context_manager.ThinkingManager import ThinkingProcessError, build_cpp_binary
+
+class Command(BaseCommand):
+    help = 'Compile the Kievan Rus C++ thinker if its sources changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the binary is up to date')
+
+    def handle(self, *args, **options):
+        try:
+            binary_path = build_cpp_binary(force=options['force'])
+        except ThinkingProcessError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(self.style.SUCCESS(f'Thinker binary ready at {binary_path}'))
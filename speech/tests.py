@@ -1,3 +1,889 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import io
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from benchmarks.fake_gemini import FakeGemini
+from plotting import graph_store, render_queue
+from providentia_network import telemetry
+from speech.context_manager import ThinkingManager as thinking_manager
+from speech.context_manager import thinker_cache
+from speech.context_manager.engine import NodeExecutor, TreeEngine
+from speech.context_manager.limits import Interrupt, ThinkingLimits
+from speech.context_manager.search import get_strategy
+from speech.gemini import agent as gemini_agent
+
+try:
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:  # pragma: no cover - the SDK is optional
+    InMemorySpanExporter = None
+
+PROMPT = "Plan a three-day trip to Kyiv on a student budget."
+
+
+class FakeGeminiMixin:
+    """
+    Point the thinker and the Gemini agent at an in-process ``FakeGemini``
+    (benchmarks/fake_gemini.py). The thinker cache, the tree store and graph
+    rendering are off; tests that need one patch it back on.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeGemini(latency_ms=0).start()
+        cls.addClassCleanup(cls.fake.stop)
+        patchers = (
+            # The thinker inherits the environment; the agent read it at import.
+            mock.patch.dict(os.environ, {"GEMINI_BASE_URL": cls.fake.base_url, "GEMINI_API_KEY": "test"}),
+            mock.patch.object(gemini_agent, "GEMINI_BASE_URL", cls.fake.base_url),
+            mock.patch.object(gemini_agent, "_client", None),
+            mock.patch.object(gemini_agent, "_async_clients", weakref.WeakKeyDictionary()),
+            mock.patch.object(thinker_cache, "_cache", thinker_cache.ThinkerCache(max_entries=0)),
+            mock.patch.object(thinking_manager, "TREE_STORE", False),
+            mock.patch.object(render_queue, "RENDER_WORKERS", 0),
+            # Stage timings still reach the histograms, just not the log.
+            mock.patch.object(telemetry.logger, "disabled", True),
+        )
+        for patcher in patchers:
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+
+    def setUp(self):
+        super().setUp()
+        # The manager and the engine print a line per node.
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def deepthink(self, **data):
+        return self.client.post("/speech/deepthink/", {"prompt": PROMPT, **data}, content_type="application/json")
+
+
+class TelemetryTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        telemetry.metrics.reset()
+        self.enterContext(mock.patch.object(telemetry, "OTEL_ENABLED", True))
+        self.enterContext(mock.patch.object(telemetry, "_tracer", None))
+
+    @skipIf(InMemorySpanExporter is None, "opentelemetry-sdk is not installed")
+    def test_deepthink_exports_stage_spans(self):
+        exporter = telemetry.configure_tracing()
+
+        response = self.deepthink(max_nodes=3)
+
+        self.assertEqual(response.status_code, 200)
+        stages = {span.name for span in exporter.get_finished_spans()}
+        self.assertLessEqual({"thinker", "validate", "final_answer"}, stages)
+
+    def test_metrics_serve_stage_histograms(self):
+        self.assertEqual(self.deepthink(max_nodes=3).status_code, 200)
+
+        response = self.client.get("/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn("# TYPE deepthink_stage_duration_seconds histogram", body)
+        for stage in ("thinker", "validate", "final_answer"):
+            labels = f'stage="{stage}",outcome="ok"'
+            self.assertIn(f'deepthink_stage_duration_seconds_bucket{{{labels},le="+Inf"}}', body)
+            self.assertIn(f"deepthink_stage_duration_seconds_count{{{labels}}}", body)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"])
+    def test_metrics_are_refused_to_other_clients(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="10.0.0.5").status_code, 200)
+
+
+def _sse_events(response) -> list[tuple[str, dict]]:
+    body = b"".join(response.streaming_content).decode()
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+class DeepThinkViewTests(FakeGeminiMixin, TestCase):
+    def test_deepthink_answers_from_the_tree(self):
+        response = self.deepthink()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["response"], "I weighed the branches and settled on the plan. ")
+        self.assertIsNone(response.json()["stop_reason"])
+        self.assertIsNone(response.json()["graph_id"])  # Rendering is off.
+
+    def test_node_budget_stops_the_search(self):
+        response = self.deepthink(max_nodes=3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stop_reason"], "node budget of 3 reached")
+
+    def test_node_budget_mid_round_spends_no_cancelled_calls(self):
+        requests = self.fake.requests
+
+        manager = thinking_manager.ThinkingManager(message=PROMPT, limits=ThinkingLimits(max_nodes=4))
+
+        self.assertEqual(manager.node_count, 4)
+        self.assertFalse(any(node.cancelled for node in manager.engine.store))
+        self.assertEqual(len(manager._rendered), 4)
+        self.assertEqual(self.fake.requests - requests, 8)  # An analysis and a summary per node.
+
+    def test_deadline_stops_the_search(self):
+        self.fake.latency_ms = 150
+        self.addCleanup(setattr, self.fake, "latency_ms", 0)
+        # Killed thinkers leave the fake server writing to closed sockets.
+        self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+
+        started = time.monotonic()
+        response = self.deepthink(deadline_seconds=0.5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stop_reason"], "deadline of 0.5s reached")
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_bad_options_are_rejected(self):
+        requests = self.fake.requests
+        for data in ({"strategy": "depth_first"}, {"max_nodes": 0}, {"deadline_seconds": "soon"}):
+            with self.subTest(data=data):
+                response = self.deepthink(**data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+        self.assertEqual(self.fake.requests, requests)
+
+    def test_stream_sends_nodes_then_the_answer(self):
+        response = self.deepthink(stream=True, max_nodes=3)
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = _sse_events(response)
+        names = [event for event, _ in events]
+        self.assertEqual(names, ["node"] * 3 + ["stopped", "chunk", "done"])
+        root = events[0][1]
+        self.assertIsNone(root["parent_id"])
+        self.assertEqual(root["status"], "evaluated")
+        self.assertEqual({data["parent_id"] for _, data in events[1:3]}, {root["id"]})
+        self.assertEqual(events[3][1], {"reason": "node budget of 3 reached"})
+        self.assertEqual(events[-1][1], {"truncated": False})
+
+    def test_closed_stream_stops_the_search(self):
+        self.fake.latency_ms = 100
+        self.addCleanup(setattr, self.fake, "latency_ms", 0)
+        self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+        requests = self.fake.requests
+        response = self.deepthink(stream=True)
+        stream = iter(response.streaming_content)
+
+        self.assertTrue(next(stream).startswith(b"event: node"))  # The root.
+        response.close()
+        time.sleep(0.5)
+        spent = self.fake.requests - requests
+        time.sleep(1.0)
+
+        self.assertEqual(self.fake.requests - requests, spent)
+        # A full tree takes 14 thinker calls; the children were cut short.
+        self.assertLess(spent, 14)
+
+    async def test_async_view_matches_the_sync_view(self):
+        response = await self.async_client.post(
+            "/speech/deepthink/async/", {"prompt": PROMPT, "max_nodes": 3}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stop_reason"], "node budget of 3 reached")
+        self.assertEqual(response.json()["response"], "I weighed the branches and settled on the plan. ")
+
+    async def test_async_view_rejects_a_bad_strategy(self):
+        response = await self.async_client.post(
+            "/speech/deepthink/async/", {"prompt": PROMPT, "strategy": "nope"}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class GeminiClientTests(FakeGeminiMixin, TestCase):
+    """One pooled Gemini client per process, and one async client per event loop."""
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(gemini_agent, "_client", None))
+        self.builds = self.enterContext(
+            mock.patch.object(gemini_agent, "_build_client", wraps=gemini_agent._build_client)
+        )
+
+    def test_threads_share_one_client(self):
+        start = threading.Barrier(8)
+        clients = []
+
+        def build():
+            start.wait()
+            clients.append(gemini_agent.get_client())
+
+        threads = [threading.Thread(target=build) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(client) for client in clients}), 1)
+        self.assertIs(gemini_agent.GeminiAgent().client, clients[0])
+        self.assertEqual(self.builds.call_count, 1)
+
+    def test_agents_answer_through_the_shared_client(self):
+        first = gemini_agent.GeminiAgent().generate_response("gemini-test", PROMPT)
+        second = gemini_agent.GeminiAgent().generate_response("gemini-test", PROMPT)
+
+        self.assertEqual(first.text, second.text)
+        self.assertEqual(self.builds.call_count, 1)
+
+    def test_pool_settings_come_from_the_environment(self):
+        self.enterContext(mock.patch.object(gemini_agent, "GEMINI_HTTP2", False))
+        self.enterContext(mock.patch.object(gemini_agent, "GEMINI_MAX_CONNECTIONS", 3))
+
+        options = gemini_agent._httpx_kwargs()
+
+        self.assertFalse(options["http2"])
+        self.assertEqual(options["limits"].max_connections, 3)
+
+    async def test_each_event_loop_gets_its_own_async_client(self):
+        client = gemini_agent.get_async_client()
+        response = await gemini_agent.GeminiAgent().agenerate_response("gemini-test", PROMPT)
+
+        async def other_loop_client():
+            return gemini_agent.get_async_client()
+
+        other = await asyncio.to_thread(asyncio.run, other_loop_client())
+
+        self.assertIs(gemini_agent.get_async_client(), client)
+        self.assertIsNot(other, client)
+        self.assertEqual(response.text, "I weighed the branches and settled on the plan. ")
+
+
+class ThoughtGraphViewTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.store = graph_store.GraphStore(Path(directory), output_format="json")
+        self.enterContext(mock.patch.object(graph_store, "_store", self.store))
+        self.enterContext(mock.patch.object(render_queue, "RENDER_WORKERS", 1))
+        self.enterContext(mock.patch.object(render_queue, "_executor", None))
+        self.enterContext(mock.patch.object(render_queue, "_jobs", {}))
+        self.addCleanup(render_queue._reset_executor)
+
+    def poll(self, graph_id: str, timeout: float = 60.0) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.client.get(f"/speech/graphs/{graph_id}/").json()
+            if job["status"] != render_queue.PENDING or time.monotonic() > deadline:
+                return job
+            time.sleep(0.1)
+
+    def test_graph_is_polled_then_downloaded(self):
+        graph_id = self.deepthink(max_nodes=3).json()["graph_id"]
+        self.assertIsNotNone(graph_id)
+
+        self.assertEqual(self.poll(graph_id), {"graph_id": graph_id, "status": render_queue.READY})
+        response = self.client.get(f"/speech/graphs/{graph_id}/", {"download": "1"})
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        layout = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(layout["nodes"]), 3)
+        self.assertTrue(self.store.path_for(graph_id).exists())
+
+    def test_unknown_graph_is_not_found(self):
+        self.assertEqual(self.client.get(f"/speech/graphs/{'0' * 32}/").status_code, 404)
+        self.assertEqual(self.client.get("/speech/graphs/not-a-key/").status_code, 404)
+
+
+class ScriptedExecutor(NodeExecutor):
+    """Evaluates nodes with canned ``(probability, potential)`` scores keyed by branch label."""
+
+    def __init__(self, scores=None, done=()):
+        self.scores = scores or {}
+        self.done = set(done)
+        self.evaluated = []
+
+    def run_round(self, engine, nodes):
+        for node in nodes:
+            probability, potential = self.scores.get(node.branch_label, (0.5, 0.0))
+            self.evaluated.append(node.branch_label)
+            engine.absorb_analysis(node, {
+                "probability_of_success": probability,
+                "potential_score": potential,
+                "is_done_thinking": node.branch_label in self.done,
+                "regrets_choice": False,
+            })
+            engine.complete(node, f"Summary of {node.branch_label}.", 10)
+
+
+class TreeEngineTests(SimpleTestCase):
+    SCORES = {"Primary-A": (0.4, -0.5), "Primary-B": (0.8, 0.5)}
+
+    def setUp(self):
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.enterContext(mock.patch.object(telemetry.logger, "disabled", True))
+
+    def search(self, strategy=None, limits=None, executor=None):
+        executor = executor or ScriptedExecutor(self.SCORES)
+        engine = TreeEngine(PROMPT, executor, strategy=strategy, limits=limits).run()
+        return engine, executor.evaluated
+
+    def test_breadth_first_evaluates_every_level(self):
+        engine, evaluated = self.search()
+
+        self.assertEqual(evaluated[:3], ["Primary", "Primary-A", "Primary-B"])
+        self.assertEqual(len(evaluated), 7)
+        self.assertEqual(engine.node_count, 7)
+        self.assertIsNone(engine.stop_reason)
+        self.assertTrue(engine.whole)
+
+    def test_best_first_expands_the_best_branch_first(self):
+        _, evaluated = self.search(get_strategy("best_first"))
+
+        self.assertEqual(evaluated[3:5], ["Primary-B-A", "Primary-B-B"])
+        self.assertEqual(len(evaluated), 7)
+
+    def test_beam_prunes_below_its_width(self):
+        _, evaluated = self.search(get_strategy("beam", beam_width=1))
+
+        self.assertEqual(evaluated, ["Primary", "Primary-A", "Primary-B", "Primary-B-A", "Primary-B-B"])
+
+    def test_node_budget(self):
+        engine, evaluated = self.search(limits=ThinkingLimits(max_nodes=3))
+
+        self.assertEqual(len(evaluated), 3)
+        self.assertEqual(engine.stop_reason, "node budget of 3 reached")
+        self.assertTrue(engine.whole)  # A budget trims the tree without spoiling it.
+
+    def test_node_budget_mid_round_lets_the_built_children_finish(self):
+        interrupted = []
+
+        class WatchedExecutor(ScriptedExecutor):
+            def run_round(self, engine, nodes):
+                interrupted.append(engine.interrupt.triggered())
+                super().run_round(engine, nodes)
+
+        engine, evaluated = self.search(limits=ThinkingLimits(max_nodes=4), executor=WatchedExecutor(self.SCORES))
+
+        self.assertEqual(evaluated, ["Primary", "Primary-A", "Primary-B", "Primary-A-A"])
+        self.assertEqual(engine.node_count, 4)
+        self.assertEqual(interrupted, [False, False, False])
+        self.assertFalse(any(node.cancelled for node in engine.store))
+        self.assertEqual(engine.stop_reason, "node budget of 4 reached")
+
+    def test_token_budget(self):
+        engine, evaluated = self.search(limits=ThinkingLimits(max_tokens=30))
+
+        self.assertEqual(engine.stop_reason, "token budget of 30 reached")
+        self.assertEqual(engine.tokens_used, 30)
+
+    def test_good_enough_branch_stops_the_search(self):
+        executor = ScriptedExecutor(self.SCORES, done={"Primary-B"})
+        engine, _ = self.search(limits=ThinkingLimits(good_enough_probability=0.75), executor=executor)
+
+        self.assertEqual(engine.stop_reason, "branch 'Primary-B' reached probability 0.80")
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            get_strategy("depth_first")
+        with self.assertRaises(ValueError):
+            get_strategy("beam", beam_width=0)
+
+
+def _payload_frame(status: int, context: bytes, summary: bytes = b"", metadata: bytes = b"") -> bytes:
+    return b"".join((
+        struct.pack(">BI", status, len(context)), context,
+        struct.pack(">I", len(summary)), summary,
+        struct.pack(">I", len(metadata)), metadata,
+    ))
+
+
+class PayloadFramingTests(SimpleTestCase):
+    CONTEXT = {"user_enquiry": "hi", "thought_summary": "inline"}
+
+    def test_partial_payload_precedes_the_complete_one(self):
+        partials = []
+        stream = io.BytesIO(
+            _payload_frame(2, b'{"user_enquiry": "hi"}')
+            + _payload_frame(0, json.dumps(self.CONTEXT).encode(), b"", b'{"usage": {"total_tokens": 7}}')
+        )
+
+        frame = thinking_manager._read_payload_frame(stream, on_partial=partials.append)
+        result = thinking_manager._parse_payload(*frame)
+
+        self.assertEqual(partials, [{"user_enquiry": "hi"}])
+        self.assertEqual(result.context, {"user_enquiry": "hi"})
+        self.assertEqual(result.summary, "inline")  # Inline summary mode.
+        self.assertEqual(result.metadata, {"usage": {"total_tokens": 7}})
+
+    def test_truncated_payload_is_a_process_error(self):
+        frame = _payload_frame(0, json.dumps(self.CONTEXT).encode(), b"summary")
+
+        with self.assertRaises(thinking_manager.ThinkingProcessError):
+            thinking_manager._read_payload_frame(io.BytesIO(frame[:-3]))
+
+    def test_bad_json_is_an_output_error(self):
+        with self.assertRaises(thinking_manager.ThinkingOutputError):
+            thinking_manager._parse_payload(0, b"{not json", b"", b"")
+        with self.assertRaisesMessage(thinking_manager.ThinkingProcessError, "quota exceeded"):
+            thinking_manager._parse_payload(1, b"quota exceeded", b"", b"")
+
+    def test_request_frame_is_length_prefixed(self):
+        frame = thinking_manager._encode_request_frame("hi", 3, "", "Primary")
+
+        self.assertEqual(frame, b"".join((
+            struct.pack(">I", 2), b"hi", struct.pack(">I", 0),
+            struct.pack(">I", 7), b"Primary", struct.pack(">I", 0), struct.pack(">I", 3),
+        )))
+
+
+class ThinkerCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = thinker_cache.ThinkerCache(max_entries=2)
+        cache.set("a", {"n": 1}, "one")
+        cache.set("b", {"n": 2}, "two")
+        cache.get("a")
+        cache.set("c", {"n": 3}, "three")
+
+        self.assertEqual(cache.get("a"), ({"n": 1}, "one"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), ({"n": 3}, "three"))
+
+    def test_expired_entry_is_a_miss(self):
+        cache = thinker_cache.ThinkerCache(ttl=-1)
+        cache.set("a", {"n": 1}, "one")
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_size_zero_disables_the_cache(self):
+        cache = thinker_cache.ThinkerCache(max_entries=0)
+        cache.set("a", {"n": 1}, "one")
+
+        self.assertFalse(cache.enabled)
+        self.assertIsNone(cache.get("a"))
+
+
+class CachedThinkerTests(FakeGeminiMixin, TestCase):
+    def test_repeated_request_is_answered_from_the_cache(self):
+        self.enterContext(mock.patch.object(thinker_cache, "_cache", thinker_cache.ThinkerCache()))
+        self.assertEqual(self.deepthink(max_nodes=3).status_code, 200)
+        first = self.fake.requests
+
+        self.assertEqual(self.deepthink(max_nodes=3).status_code, 200)
+
+        # Only the final answer goes back to Gemini.
+        self.assertEqual(self.fake.requests - first, 1)
+
+
+class InterruptTests(SimpleTestCase):
+    def test_cancel_runs_the_callbacks_once(self):
+        interrupt = Interrupt()
+        calls = []
+        interrupt.add_callback(lambda: calls.append("kept"))
+        remove = interrupt.add_callback(lambda: calls.append("removed"))
+        remove()
+
+        interrupt.cancel()
+        interrupt.cancel()
+
+        self.assertEqual(calls, ["kept"])
+
+    def test_deadline_fires_the_callbacks(self):
+        interrupt = Interrupt(time.monotonic() + 0.1)
+        fired = threading.Event()
+        interrupt.add_callback(fired.set)
+
+        self.assertTrue(fired.wait(5))
+        self.assertTrue(interrupt.triggered())
+
+    def test_late_callback_runs_at_once(self):
+        interrupt = Interrupt(time.monotonic() - 1)
+        calls = []
+
+        interrupt.add_callback(lambda: calls.append(True))
+
+        self.assertEqual(calls, [True])
+
+    def test_last_removal_stops_the_deadline_timer(self):
+        interrupt = Interrupt(time.monotonic() + 60)
+        remove = interrupt.add_callback(lambda: None)
+        timer = interrupt._timer
+        remove()
+
+        timer.join(5)
+        self.assertFalse(timer.is_alive())
+        self.assertFalse(interrupt.triggered())
+
+
+class ThinkerInterruptTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.fake.latency_ms = 5000
+        self.addCleanup(setattr, self.fake, "latency_ms", 0)
+        # Killed thinkers leave the fake server writing to closed sockets.
+        self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+
+    def run_thinker(self, interrupt):
+        return thinking_manager._arun_cpp_thinker(PROMPT, 1, "", "Primary", thinking_manager.THINKER_MODEL, interrupt)
+
+    async def test_cancel_kills_an_async_run_without_polling(self):
+        interrupt = Interrupt()
+        asyncio.get_running_loop().call_later(0.3, interrupt.cancel)
+        started = time.monotonic()
+
+        with self.assertRaises(thinking_manager.ThinkingCancelled):
+            await self.run_thinker(interrupt)
+
+        self.assertLess(time.monotonic() - started, 2)
+
+    async def test_cancelled_task_interrupts_a_pool_run(self):
+        pool = thinking_manager._ThinkerPool(1)
+        self.addCleanup(pool.close)
+        self.enterContext(mock.patch.object(thinking_manager, "THINKER_POOL_SIZE", 1))
+        self.enterContext(mock.patch.object(thinking_manager, "_thinker_pool", pool))
+        interrupt = Interrupt()
+        task = asyncio.ensure_future(self.run_thinker(interrupt))
+        await asyncio.sleep(0.3)
+        started = time.monotonic()
+
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertTrue(interrupt.triggered())
+        # The worker thread sees its worker killed instead of waiting on Gemini.
+        await asyncio.to_thread(pool._acquire, Interrupt(time.monotonic() + 5))
+        pool._release()
+        self.assertLess(time.monotonic() - started, 2)
+
+
+class SummaryModeTests(FakeGeminiMixin, TestCase):
+    """``KIEVAN_RUS_SUMMARY_MODE``: how the thinker produces each node's summary."""
+
+    def build(self, mode, **options):
+        self.enterContext(mock.patch.object(thinking_manager, "SUMMARY_MODE", mode))
+        requests = self.fake.requests
+        manager = thinking_manager.ThinkingManager(message=PROMPT, limits=ThinkingLimits(max_nodes=3), **options)
+        return manager, self.fake.requests - requests
+
+    def test_separate_mode_makes_a_summary_call_per_node(self):
+        manager, requests = self.build("separate")
+
+        self.assertEqual(requests, 6)
+        [child, _] = manager.root.children
+        self.assertEqual(child.summary_text, "I weighed the branches and settled on the plan. ")
+
+    def test_inline_mode_takes_the_summary_from_the_analysis(self):
+        manager, requests = self.build("inline")
+
+        self.assertEqual(requests, 3)
+        [child, _] = manager.root.children
+        self.assertEqual(child.summary_text, "I split the problem and kept the most promising branch.")
+        self.assertNotIn("thought_summary", manager.root.context)
+
+    def test_pipelined_mode_reports_the_analysis_before_the_summary(self):
+        reported = {}
+        manager, requests = self.build(
+            "pipelined", on_node=lambda node: reported.setdefault(node.id, (dict(node.context), node.summary_text))
+        )
+
+        self.assertEqual(requests, 6)
+        context, summary = reported[manager.root.id]
+        self.assertIn("steps_for_completion", context)
+        self.assertEqual(summary, "")  # Still the root's input summary.
+        self.assertEqual(manager.root.summary_text, "I weighed the branches and settled on the plan. ")
+
+
+class RequestPolicyTests(FakeGeminiMixin, TestCase):
+    """Retries and hedging of the thinker's Gemini calls (``KIEVAN_RUS_RETRIES`` and friends)."""
+
+    def setUp(self):
+        super().setUp()
+        for name in ("error_rate", "latency_ms"):
+            self.addCleanup(setattr, self.fake, name, getattr(self.fake, name))
+        # Cancelled hedges leave the fake server writing to closed sockets.
+        self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+
+    def use_policy(self, *arguments):
+        self.enterContext(mock.patch.object(thinking_manager, "REQUEST_POLICY_ARGS", list(arguments)))
+
+    def run_thinker(self):
+        return thinking_manager._run_cpp_thinker(PROMPT, 1, "", "Primary", thinking_manager.THINKER_MODEL)
+
+    def test_failed_calls_are_retried(self):
+        self.use_policy("--retries", "8", "--backoff-ms", "1", "--backoff-max-ms", "5")
+        self.fake.error_rate = 0.3
+        errors = self.fake.errors
+
+        manager = thinking_manager.ThinkingManager(message=PROMPT)
+
+        self.assertGreater(self.fake.errors, errors)
+        self.assertTrue(manager.engine.whole)
+        self.assertEqual(len(_evaluated(manager)), 7)
+
+    def test_without_retries_a_failed_call_fails_the_node(self):
+        self.use_policy("--retries", "0")
+        self.fake.error_rate = 1.0
+        requests = self.fake.requests
+
+        with self.assertRaises(thinking_manager.ThinkingProcessError):
+            self.run_thinker()
+
+        self.assertEqual(self.fake.requests - requests, 1)
+
+    def test_slow_calls_are_hedged(self):
+        self.use_policy("--hedge-after-ms", "50")
+        self.fake.latency_ms = 300
+        requests = self.fake.requests
+
+        result = self.run_thinker()
+
+        # The analysis and the summary call each got a duplicate.
+        self.assertEqual(self.fake.requests - requests, 4)
+        self.assertIn("user_enquiry", result.context)
+
+
+class SchemaRepairTests(FakeGeminiMixin, TestCase):
+    """
+    The thinker checks each analysis against the response schema and asks
+    Gemini to repair a rejected one (``KIEVAN_RUS_SCHEMA_RETRIES``); Python
+    re-runs a node whose output still fails ContextStruct validation.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.sloppy = 1  # How many analyses to answer with a string probability.
+        reply_text = self.fake.reply_text
+
+        def sloppy_reply(request):
+            text = reply_text(request)
+            analysis = (request.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+            if not analysis or "[REJECTED REPLY]" in json.dumps(request["contents"]) or self.sloppy <= 0:
+                return text
+            self.sloppy -= 1
+            return json.dumps({**json.loads(text), "probability_of_success": "likely"})
+
+        self.enterContext(mock.patch.object(self.fake, "reply_text", sloppy_reply))
+        self.enterContext(contextlib.redirect_stderr(io.StringIO()))
+
+    def use_policy(self, *arguments):
+        self.enterContext(mock.patch.object(thinking_manager, "REQUEST_POLICY_ARGS", list(arguments)))
+
+    def run_thinker(self, branch_label="Primary"):
+        return thinking_manager._run_validated(PROMPT, 1, "", branch_label, thinking_manager.THINKER_MODEL)
+
+    def test_rejected_analysis_is_repaired(self):
+        requests = self.fake.requests
+
+        result = self.run_thinker()
+
+        self.assertEqual([call["stage"] for call in result.metadata["calls"]], ["analysis", "repair", "summary"])
+        self.assertEqual(self.fake.requests - requests, 3)
+        self.assertIsInstance(result.command.probability_of_success, float)
+
+    def test_batch_jobs_are_repaired(self):
+        self.sloppy = 2
+        jobs = [thinking_manager.ThinkerJob(PROMPT, 1, "", label) for label in ("Primary-A", "Primary-B")]
+        requests = self.fake.requests
+
+        outcomes = list(thinking_manager._invoke_cpp_thinker_batch(jobs))
+
+        self.assertTrue(all(isinstance(outcome, thinking_manager.ThinkerResult) for outcome in outcomes))
+        self.assertEqual(self.fake.requests - requests, 6)
+
+    def test_unrepaired_analysis_fails_the_run(self):
+        self.use_policy("--schema-retries", "0")
+        requests = self.fake.requests
+
+        with self.assertRaises(thinking_manager.ThinkingProcessError):
+            self.run_thinker()
+
+        self.assertEqual(self.fake.requests - requests, 1)
+
+    def test_invalid_output_without_a_schema_is_run_again(self):
+        self.enterContext(mock.patch.object(thinking_manager, "RESPONSE_SCHEMA", False))
+        requests = self.fake.requests
+
+        result = self.run_thinker()
+
+        # The thinker accepts the reply; ContextStruct rejects it and the node runs again.
+        self.assertEqual(self.fake.requests - requests, 4)
+        self.assertIsInstance(result.command.probability_of_success, float)
+
+
+def _evaluated(manager) -> list:
+    return sorted(
+        (node.branch_label, node.summary_text, node.probability_of_success)
+        for node in manager.engine.store
+        if node.context is not None
+    )
+
+
+class BatchThinkerTests(FakeGeminiMixin, TestCase):
+    """``KIEVAN_RUS_BATCH``: each round after the root runs in one ``--batch`` thinker process."""
+
+    def setUp(self):
+        super().setUp()
+        self.expected = _evaluated(thinking_manager.ThinkingManager(message=PROMPT))
+        self.enterContext(mock.patch.object(thinking_manager, "THINKER_BATCH", True))
+
+    def test_each_round_runs_in_one_process(self):
+        batches = self.enterContext(
+            mock.patch.object(
+                thinking_manager, "_run_cpp_thinker_batch", wraps=thinking_manager._run_cpp_thinker_batch
+            )
+        )
+
+        manager = thinking_manager.ThinkingManager(message=PROMPT)
+
+        self.assertEqual([len(call.args[0]) for call in batches.call_args_list], [2, 4])
+        self.assertEqual(_evaluated(manager), self.expected)
+        self.assertTrue(manager.engine.whole)
+
+    async def test_async_rounds_match_the_threaded_tree(self):
+        batches = self.enterContext(
+            mock.patch.object(
+                thinking_manager, "_arun_cpp_thinker_batch", wraps=thinking_manager._arun_cpp_thinker_batch
+            )
+        )
+
+        manager = await thinking_manager.ThinkingManager.abuild(message=PROMPT)
+
+        self.assertEqual(batches.call_count, 2)
+        self.assertEqual(_evaluated(manager), self.expected)
+        self.assertTrue(manager.engine.whole)
+
+    def test_failed_batch_fails_its_nodes(self):
+        self.enterContext(mock.patch.object(thinking_manager, "_batch_command", return_value=["false"]))
+
+        manager = thinking_manager.ThinkingManager(message=PROMPT)
+
+        # The root runs on its own; both children of the failed batch are lost.
+        self.assertEqual(manager.engine.failures, 2)
+        self.assertEqual(len(_evaluated(manager)), 1)
+        self.assertFalse(manager.engine.whole)
+
+
+class BatchRetryTests(FakeGeminiMixin, TestCase):
+    """A batch job whose output is rejected is re-run on its own, unless the tree was cancelled meanwhile."""
+
+    def setUp(self):
+        super().setUp()
+        self.job = thinking_manager.ThinkerJob(PROMPT, 1, "", "Primary")
+        self.interrupt = Interrupt()
+
+    def rejected(self, *args):
+        self.interrupt.cancel()  # The tree is cancelled while the batch runs.
+        yield thinking_manager.ThinkingOutputError("not a ContextStruct")
+
+    async def arejected(self, *args):
+        for outcome in self.rejected():
+            yield outcome
+
+    def test_cancelled_tree_is_not_retried(self):
+        self.enterContext(mock.patch.object(thinking_manager, "_run_cpp_thinker_batch", self.rejected))
+        rerun = self.enterContext(mock.patch.object(thinking_manager, "_run_cpp_thinker"))
+
+        [outcome] = thinking_manager._invoke_cpp_thinker_batch([self.job], self.interrupt)
+
+        self.assertIsInstance(outcome, thinking_manager.ThinkingCancelled)
+        rerun.assert_not_called()
+
+    async def test_cancelled_tree_is_not_retried_async(self):
+        self.enterContext(mock.patch.object(thinking_manager, "_arun_cpp_thinker_batch", self.arejected))
+        rerun = self.enterContext(mock.patch.object(thinking_manager, "_arun_cpp_thinker"))
+
+        outcomes = [outcome async for outcome in thinking_manager._ainvoke_cpp_thinker_batch([self.job], self.interrupt)]
+
+        self.assertIsInstance(outcomes[0], thinking_manager.ThinkingCancelled)
+        rerun.assert_not_called()
+
+    async def test_cancelled_tree_starts_no_batch(self):
+        self.interrupt.cancel()
+        requests = self.fake.requests
+
+        with self.assertRaises(thinking_manager.ThinkingCancelled):
+            async for _ in thinking_manager._ainvoke_cpp_thinker_batch([self.job, self.job], self.interrupt):
+                pass
+
+        self.assertEqual(self.fake.requests, requests)
+
+
+class ThinkerPoolTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = thinking_manager._ThinkerPool(1)
+        self.addCleanup(self.pool.close)
+        self.frame = thinking_manager._encode_request_frame(PROMPT, 1, "", "Primary", thinking_manager.THINKER_MODEL)
+
+    def request(self, interrupt=None):
+        return thinking_manager._decode_payload(*self.pool.request(self.frame, interrupt))
+
+    def worker(self):
+        [worker] = self.pool._workers
+        return worker
+
+    def test_worker_is_reused(self):
+        self.request()
+        worker = self.worker()
+
+        result = self.request()
+
+        self.assertIs(self.worker(), worker)
+        self.assertTrue(worker.alive)
+        self.assertIn("user_enquiry", result.context)
+
+    def test_crashed_worker_is_replaced(self):
+        self.request()
+        crashed = self.worker()
+        crashed.process.kill()
+        crashed.process.wait()
+
+        self.request()
+
+        self.assertIsNot(self.worker(), crashed)
+        self.assertTrue(self.worker().alive)
+
+    def test_cancel_while_waiting_for_a_slot(self):
+        self.request()
+        worker = self.worker()
+        self.fake.latency_ms = 500
+        self.addCleanup(setattr, self.fake, "latency_ms", 0)
+        busy = {}
+        holder = threading.Thread(target=lambda: busy.update(result=self.request()))
+        holder.start()
+        time.sleep(0.1)
+        interrupt = Interrupt()
+        threading.Timer(0.1, interrupt.cancel).start()
+        started = time.monotonic()
+
+        with self.assertRaises(thinking_manager.ThinkingCancelled):
+            self.request(interrupt)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        holder.join(10)
+        # The busy worker finished its own request and stays in the pool.
+        self.assertIn("user_enquiry", busy["result"].context)
+        self.assertIs(self.worker(), worker)
+        self.assertTrue(worker.alive)
+
+    def test_cancelled_request_never_reaches_a_worker(self):
+        interrupt = Interrupt()
+        interrupt.cancel()
+        requests = self.fake.requests
+
+        with self.assertRaises(thinking_manager.ThinkingCancelled):
+            self.request(interrupt)
+        with self.assertRaises(thinking_manager.ThinkingCancelled):
+            thinking_manager._run_cpp_thinker(PROMPT, 1, "", "Primary", thinking_manager.THINKER_MODEL, interrupt)
+
+        self.assertEqual(self.pool._workers, set())
+        self.assertEqual(self.fake.requests, requests)
@@ -6,4 +6,7 @@ app_name = 'speech'
 urlpatterns = [
     path('deepthink/', views.deep_think, name='deep_think'),
     path('answer/', views.simple_response, name='simple_response'),
+    path('deepthink/async/', views.deep_think_async, name='deep_think_async'),
+    path('answer/async/', views.simple_response_async, name='simple_response_async'),
+    path('graphs/<slug:graph_id>/', views.thought_graph, name='thought_graph'),
 ]
\ No newline at end of file
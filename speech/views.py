@@ -1,38 +1,269 @@
+import asyncio
 import json
 import os
+import queue
+import threading
+import time
 
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
 from .context_manager.ThinkingManager import ThinkingManager
+from .context_manager.engine import Node
+from .context_manager.limits import ThinkingLimits
+from .context_manager.search import get_strategy
 from .gemini import agent as gemini_agent
+from plotting import render_queue
+from plotting.graph_store import get_graph_store
+from providentia_network import telemetry
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 
 MAX_CHARS = 4080
 
+GRAPH_CONTENT_TYPES = {
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+    ".json": "application/json",
+}
+
+
+def _truncate(response: str) -> str:
+    if len(response) > MAX_CHARS:
+        response = response[:MAX_CHARS - 12] + "\n\n[truncated]"
+    return response
+
+
+def _deep_instructions(manager: ThinkingManager) -> str:
+    return (
+        "Answer directly. You are in a chat environment.\n"
+        f"{manager.generate_self_prompt()}"
+    )
+
+
+def _simple_instructions(prompt: str) -> str:
+    return (
+        "Your name is Clairemont. You are the emperor's assistant. Answer the user's prompt directly and concisely.\n"
+        f"User prompt: {prompt}\n"
+        "Provide only the answer text, no extra metadata."
+    )
+
+
+def _wants_stream(data) -> bool:
+    value = data.get('stream', False)
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes"}
+    return bool(value)
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _event_stream(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _stream_text(chunks):
+    """
+    Relay Gemini text chunks as SSE ``chunk`` events. Once MAX_CHARS is reached
+    the upstream stream is closed instead of draining tokens we would discard.
+    """
+    # Text already sent cannot be cut back, so truncate at the same point the
+    # buffered views cut to and the stream never exceeds their output length.
+    limit = MAX_CHARS - 12
+    sent = 0
+    try:
+        for text in chunks:
+            if sent + len(text) > limit:
+                yield _sse("chunk", {"text": text[:limit - sent] + "\n\n[truncated]"})
+                yield _sse("done", {"truncated": True})
+                return
+            sent += len(text)
+            yield _sse("chunk", {"text": text})
+        yield _sse("done", {"truncated": False})
+    except Exception as error:
+        yield _sse("error", {"error": str(error)})
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _node_event(node: Node) -> dict:
+    context = node.context or {}
+    return {
+        "id": node.id,
+        "parent_id": node.previous.id if node.previous is not None else None,
+        "branch_label": node.branch_label,
+        "status": "evaluated" if node.context is not None else "failed",
+        "probability": node.probability_of_success,
+        "potential_increment": node.potential_increment,
+        "cumulative_potential": node.cumulative_potential,
+        "is_final": bool(context.get("is_done_thinking")),
+        "regrets": bool(context.get("regrets_choice")),
+    }
+
+
+def _optional_int(data, key: str):
+    value = data.get(key)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be an integer.")
+
+
+def _optional_float(data, key: str):
+    value = data.get(key)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be a number.")
+
+
+def _request_limits(data) -> ThinkingLimits:
+    """
+    Limits asked for by the request (``max_nodes``, ``deadline_seconds``,
+    ``max_tokens``, ``good_enough_probability``), capped by ``settings.DEEPTHINK_LIMITS``.
+    """
+    max_nodes = _optional_int(data, 'max_nodes')
+    if max_nodes is not None and max_nodes < 1:
+        raise ValueError("'max_nodes' must be at least 1.")
+    deadline_seconds = _optional_float(data, 'deadline_seconds')
+    if deadline_seconds is not None and deadline_seconds <= 0:
+        raise ValueError("'deadline_seconds' must be positive.")
+    max_tokens = _optional_int(data, 'max_tokens')
+    if max_tokens is not None and max_tokens < 1:
+        raise ValueError("'max_tokens' must be at least 1.")
+    good_enough = _optional_float(data, 'good_enough_probability')
+    if good_enough is not None and not 0.0 <= good_enough <= 1.0:
+        raise ValueError("'good_enough_probability' must be between 0 and 1.")
+
+    requested = ThinkingLimits(
+        max_nodes=max_nodes,
+        deadline_seconds=deadline_seconds,
+        max_tokens=max_tokens,
+        good_enough_probability=good_enough,
+    )
+    return requested.capped(ThinkingLimits(**getattr(settings, 'DEEPTHINK_LIMITS', {})))
+
+
+def _search_options(data) -> dict:
+    """
+    Per-request search settings: ``strategy`` (bfs, best_first, beam),
+    ``beam_width`` and the tree's limits. Raises ``ValueError`` on bad input.
+    """
+    strategy = get_strategy(data.get('strategy'), beam_width=_optional_int(data, 'beam_width'))
+    return {"strategy": strategy, "limits": _request_limits(data)}
+
+
+def _deep_think_events(prompt: str, options: dict):
+    """Emit a ``node`` event per evaluated branch, then stream the final answer."""
+    nodes: "queue.Queue[Node | None]" = queue.Queue()
+    outcome = {}
+    manager = ThinkingManager.prepare(message=prompt, on_node=nodes.put, **options)
+
+    def build_tree():
+        try:
+            manager.build()
+        except Exception as error:
+            outcome["error"] = error
+        finally:
+            # The tree store may have opened a connection for this thread.
+            connections.close_all()
+            nodes.put(None)
+
+    threading.Thread(target=build_tree, name="deepthink-stream", daemon=True).start()
+
+    built = False
+    try:
+        while (node := nodes.get()) is not None:
+            yield _sse("node", _node_event(node))
+        built = True
+    finally:
+        # A client that disconnects closes this generator: stop spending
+        # thinker runs and Gemini calls on a tree nobody will read.
+        if not built:
+            manager.cancel("client disconnected")
+
+    if "error" in outcome:
+        yield _sse("error", {"error": str(outcome["error"])})
+        return
+
+    if manager.stop_reason:
+        yield _sse("stopped", {"reason": manager.stop_reason})
+
+    agent = gemini_agent.GeminiAgent()
+    instructions = _deep_instructions(manager)
+    if manager.graph_id:
+        yield _sse("graph", {"graph_id": manager.graph_id})
+    # A streaming response may be iterated from several threads, so the call is
+    # timed by hand instead of holding a span open across yields.
+    started = time.monotonic()
+    try:
+        yield from _stream_text(agent.stream_response("gemini-2.5-flash", instructions))
+    finally:
+        telemetry.record("final_answer", time.monotonic() - started, tree_id=manager.id, stream=True)
+
+
+def _read_data(request):
+    """Parse the body of a plain Django request (JSON or form encoded)."""
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except json.JSONDecodeError:
+            data = {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
 @api_view(['POST'])
 def deep_think(request):
     """
     Deep thinking view: runs the ThinkingManager (heavy) to produce a final response.
+    With ``"stream": true`` the reply is an SSE stream of per-branch ``node``
+    events followed by the answer ``chunk`` events.
     """
     prompt = str(request.data.get('prompt', '')).strip()
+    try:
+        options = _search_options(request.data)
+    except ValueError as error:
+        return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if _wants_stream(request.data):
+        return _event_stream(_deep_think_events(prompt, options))
+
     agent = gemini_agent.GeminiAgent()
 
-    instructions = (
-        "Answer directly. You are in a chat environment.\n"
-        f"{ThinkingManager(message=prompt).generate_self_prompt()}"
-    )
+    manager = ThinkingManager(message=prompt, **options)
+    instructions = _deep_instructions(manager)
 
     try:
-        response = agent.generate_response("gemini-2.5-flash", instructions).text
+        with telemetry.span("final_answer", tree_id=manager.id):
+            response = agent.generate_response("gemini-2.5-flash", instructions).text
     except Exception as error:
         return Response({"error": str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    if len(response) > MAX_CHARS:
-        response = response[:MAX_CHARS - 12] + "\n\n[truncated]"
-
-    return Response({"response": response}, status=status.HTTP_200_OK)
+    return Response(
+        {
+            "response": _truncate(response),
+            "stop_reason": manager.stop_reason,
+            "graph_id": manager.graph_id,
+        },
+        status=status.HTTP_200_OK,
+    )
 
 
 @api_view(['POST'])
@@ -40,6 +271,7 @@ def simple_response(request):
     """
     Lightweight simple response view: directly queries Gemini with the provided prompt
     and returns the text without invoking the ThinkingManager.
+    With ``"stream": true`` the answer is sent as SSE ``chunk`` events.
     """
     prompt = str(request.data.get('prompt', '')).strip()
     if not prompt:
@@ -47,18 +279,90 @@ def simple_response(request):
 
     agent = gemini_agent.GeminiAgent()
 
-    instructions = (
-        "Your name is Clairemont. You are the emperor's assistant. Answer the user's prompt directly and concisely.\n"
-        f"User prompt: {prompt}\n"
-        "Provide only the answer text, no extra metadata."
-    )
+    instructions = _simple_instructions(prompt)
+    if _wants_stream(request.data):
+        return _event_stream(_stream_text(agent.stream_response("gemini-2.5-flash-lite", instructions)))
 
     try:
         response = agent.generate_response("gemini-2.5-flash-lite", instructions).text
     except Exception as error:
         return Response({"error": str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    if len(response) > MAX_CHARS:
-        response = response[:MAX_CHARS - 12] + "\n\n[truncated]"
+    return Response({"response": _truncate(response)}, status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def deep_think_async(request):
+    """
+    Async deep thinking view: builds the thought tree with asyncio subprocess I/O
+    and awaits Gemini, so the ASGI worker is free while the chain is in flight.
+    """
+    data = _read_data(request)
+    prompt = str(data.get('prompt', '')).strip()
+    try:
+        options = _search_options(data)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    agent = gemini_agent.GeminiAgent()
+
+    manager = await ThinkingManager.abuild(message=prompt, **options)
+    instructions = await asyncio.to_thread(_deep_instructions, manager)
+
+    try:
+        with telemetry.span("final_answer", tree_id=manager.id):
+            response = (await agent.agenerate_response("gemini-2.5-flash", instructions)).text
+    except Exception as error:
+        return JsonResponse({"error": str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return JsonResponse(
+        {
+            "response": _truncate(response),
+            "stop_reason": manager.stop_reason,
+            "graph_id": manager.graph_id,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@csrf_exempt
+@require_POST
+async def simple_response_async(request):
+    """
+    Async lightweight view: same contract as ``simple_response`` without holding
+    a worker thread while Gemini answers.
+    """
+    prompt = str(_read_data(request).get('prompt', '')).strip()
+    if not prompt:
+        return JsonResponse({"error": "No prompt provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+    agent = gemini_agent.GeminiAgent()
+
+    try:
+        response = (await agent.agenerate_response("gemini-2.5-flash-lite", _simple_instructions(prompt))).text
+    except Exception as error:
+        return JsonResponse({"error": str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return JsonResponse({"response": _truncate(response)}, status=status.HTTP_200_OK)
+
+
+@require_GET
+def thought_graph(request, graph_id):
+    """
+    Poll a thought graph queued by deepthink. Returns the job status as JSON,
+    or the rendered file itself with ``?download=1`` once it is ready.
+    """
+    store = get_graph_store()
+    try:
+        path = store.path_for(graph_id)
+    except ValueError:
+        return JsonResponse({"error": "Unknown graph."}, status=status.HTTP_404_NOT_FOUND)
+    job = render_queue.status(store, graph_id)
+    if job["status"] == render_queue.UNKNOWN:
+        return JsonResponse({"error": "Unknown graph."}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.GET.get('download') and job["status"] == render_queue.READY:
+        content_type = GRAPH_CONTENT_TYPES.get(path.suffix, "application/octet-stream")
+        return FileResponse(path.open("rb"), content_type=content_type)
 
-    return Response({"response": response}, status=status.HTTP_200_OK)
+    return JsonResponse({"graph_id": graph_id, **job}, status=status.HTTP_200_OK)